@@ -0,0 +1,162 @@
+/*
+ * New data points pushed by server (server-sent events of /stream route) are applied to shown figures
+ * without callbacks. Figures are resynced by callback (click of hidden stream-resync button) if browser missed
+ * events or new response code appeared; without events figures are polled with the same button.
+ */
+(function () {
+    'use strict';
+
+    var state = {source: null, poller: null};
+
+    function pathPrefix() {
+        var config = document.getElementById('_dash-config');
+        return (config && JSON.parse(config.textContent).requests_pathname_prefix) || '/';
+    }
+
+    // the same as chosen_time_interval of webapp.py
+    function chosenHours(value) {
+        return value ? 24 * parseInt(value, 10) : 48;
+    }
+
+    function resync() {
+        var button = document.getElementById('stream-resync');
+        if (button) {
+            button.click();
+        }
+    }
+
+    function shownSnapshot() {
+        var element = document.getElementById('stream-snapshot');
+        try {
+            return element && element.textContent ? JSON.parse(element.textContent) : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function timeKey(value) {
+        return String(value).replace(' ', 'T').slice(0, 19);
+    }
+
+    function serverGraph(server) {
+        // id of pattern-matching component is json with sorted keys
+        var container = document.getElementById(JSON.stringify({index: server, type: 'calls-plot'}));
+        return container && container.querySelector('.js-plotly-plot');
+    }
+
+    function applyServer(graph, update, start, okHidden) {
+        var points = {};
+        update.codes.forEach(function (code) {
+            points[code[1]] = code;  // [code, label, times, calls]
+        });
+        var xs = [], ys = [], indices = [];
+        graph.data.forEach(function (trace, index) {
+            // expired points and provisional tail of previous data are removed
+            var x = [], y = [];
+            for (var i = 0; i < trace.x.length; i++) {
+                var key = timeKey(trace.x[i]);
+                if (key >= start && key < update.since) {
+                    x.push(trace.x[i]);
+                    y.push(trace.y[i]);
+                }
+            }
+            var code = points[trace.name];
+            if (code) {
+                x = x.concat(code[2]);
+                y = y.concat(code[3]);
+                delete points[trace.name];
+            }
+            xs.push(x);
+            ys.push(y);
+            indices.push(index);
+        });
+        window.Plotly.restyle(graph, {x: xs, y: ys}, indices);
+        // response code without trace (200 code has no trace if it is hidden by button)
+        return Object.keys(points).some(function (label) {
+            return points[label][2].length && !(okHidden && points[label][0] === '200');
+        });
+    }
+
+    function applyEvent(event) {
+        var shown = shownSnapshot();
+        if (!shown || shown.id >= event.id || !window.Plotly) {
+            return;
+        }
+        if (shown.id !== event.previous) {
+            resync();  // events were missed
+            return;
+        }
+        var newCodes = false;
+        Object.keys(event.servers).forEach(function (server) {
+            var graph = serverGraph(server);
+            if (graph && graph.data) {
+                newCodes = applyServer(graph, event.servers[server], event.start, shown.ok_hidden) || newCodes;
+            }
+        });
+        document.getElementById('stream-snapshot').textContent = JSON.stringify({id: event.id,
+                                                                                 ok_hidden: shown.ok_hidden});
+        var status = document.getElementById('data-status');
+        if (status) {
+            status.textContent = event.status;
+        }
+        if (newCodes) {
+            resync();
+        }
+    }
+
+    function stop() {
+        if (state.source) {
+            state.source.close();
+            state.source = null;
+        }
+        if (state.poller) {
+            clearInterval(state.poller);
+            state.poller = null;
+        }
+    }
+
+    function poll(interval) {
+        if (!state.poller) {
+            state.poller = setInterval(resync, interval);
+        }
+    }
+
+    function subscribe(hours, interval) {
+        var source = new EventSource(pathPrefix() + 'stream?hours=' + hours);
+        source.addEventListener('points', function (message) {
+            applyEvent(JSON.parse(message.data));
+        });
+        source.onopen = function () {
+            if (state.poller) {
+                clearInterval(state.poller);
+                state.poller = null;
+                resync();
+            }
+        };
+        source.onerror = function () {
+            // browser reconnects by itself unless server refused stream
+            if (source.readyState === EventSource.CLOSED) {
+                poll(interval);
+            }
+        };
+        state.source = source;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        stream: {
+            connect: function (intervalValue, disabled, interval) {
+                stop();
+                if (disabled) {
+                    return null;
+                }
+                var hours = chosenHours(intervalValue);
+                if (window.EventSource) {
+                    subscribe(hours, interval);
+                } else {
+                    poll(interval);
+                }
+                return hours;
+            }
+        }
+    });
+})();
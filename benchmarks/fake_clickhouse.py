@@ -0,0 +1,150 @@
+"""
+Fake clickhouse HTTP endpoint which answers queries of dashboard (library.queries) with synthetic data
+
+Usage (from project directory): python -m benchmarks.fake_clickhouse --port 8123 --servers 10
+(set clickhouse_url: http://127.0.0.1:8123 in application.yml to run dashboard against it)
+"""
+import argparse
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import CODES, DATETIME_FORMAT, pairs_chunks, server_name, wide_lines
+
+
+class FakeClickHouse:
+    """
+    Threaded HTTP server with clickhouse interface: answers are streamed with chunked transfer encoding
+    over keep-alive connections, calls data is generated for requested interval and time bucket
+    """
+
+    def __init__(self, servers=10, codes=len(CODES), seed=0, latency=0.0, now=None, table='calls',
+                 host='127.0.0.1', port=0, chunk_size=64 * 1024):
+        """
+        :param servers: number of servers
+        :param codes: number of response codes
+        :param seed: random seed of data
+        :param latency: delay before answer (seconds)
+        :param now: function without arguments which returns NOW() of database (current time by default)
+        :param table: name of calls table
+        :param host: address to listen
+        :param port: port to listen (0 to choose free port)
+        :param chunk_size: size of answer chunks (bytes)
+        """
+        self.servers = servers
+        self.codes = codes
+        self.seed = seed
+        self.latency = latency
+        self.now = now or (lambda: datetime.now().replace(microsecond=0))
+        self.table = table
+        self.chunk_size = chunk_size
+        self.queries = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def answer(self, sql_query):
+        """
+        Answer of query
+        :param sql_query: SQL query
+        :return: generator of bytes chunks or None if query is not supported
+        """
+        now = self.now()
+        if 'information_schema' in sql_query:
+            return iter([f'{self.table}\n'.encode()])
+        if 'SELECT DISTINCT' in sql_query:
+            return iter([''.join(f'{server_name(server)}\n' for server in range(self.servers)).encode()])
+
+        bucket = re.search(r'INTERVAL (\d+) MINUTE\) AS bucket', sql_query)
+        if bucket is None:
+            return None
+        since = re.search(r"toDateTime\('([^']+)'\)", sql_query)
+        if since is not None:
+            since = datetime.strptime(since.group(1), DATETIME_FORMAT)
+        else:
+            minutes = int(re.search(r'NOW\(\) - INTERVAL (\d+) MINUTE', sql_query).group(1))
+            since = now - timedelta(minutes=minutes)
+        parameters = dict(hours=None, servers=self.servers, codes=self.codes, bucket=int(bucket.group(1)),
+                          seed=self.seed, end=now, since=since)
+        if 'arrayStringConcat' in sql_query:
+            lines = wide_lines(**parameters)
+            return iter(['\n'.join(lines + ['']).encode()]) if lines else iter([])
+        return pairs_chunks(**parameters, chunk_size=self.chunk_size)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                sql_query = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                fake.queries.append(sql_query)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                chunks = fake.answer(sql_query)
+                if chunks is None:
+                    message = b'Code: 62. DB::Exception: Syntax error (query is not supported by fake database)'
+                    self.send_response(400)
+                    self.send_header('Content-Length', str(len(message)))
+                    self.end_headers()
+                    self.wfile.write(message)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/tab-separated-values; charset=UTF-8')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in chunks:
+                    if chunk:
+                        self.wfile.write(f'{len(chunk):X}\r\n'.encode() + chunk + b'\r\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-clickhouse', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8123)
+    parser.add_argument('--servers', type=int, default=10)
+    parser.add_argument('--codes', type=int, default=len(CODES))
+    parser.add_argument('--latency', type=float, default=0.0, help='delay before every answer (seconds)')
+    arguments = parser.parse_args()
+
+    fake = FakeClickHouse(servers=arguments.servers, codes=arguments.codes, latency=arguments.latency,
+                          host=arguments.host, port=arguments.port).start()
+    print(f'fake clickhouse is listening on {fake.url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Latency of servers figures construction against number of servers
+(previous plotly.express constructor, new constructor serially and in threads pool: construction of plotly objects
+holds GIL, so dashboard builds figures serially)
+
+Usage (from project directory): python -m benchmarks.figures_benchmark --servers 1 5 10 15 20 30
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from plotly.express import scatter
+
+from benchmarks.synthetic import synthetic_calls_data
+from dashboard.methods import figure_constructor, figures_constructor
+from library.methods import responses_info
+from library.parsing import parse_calls_from_db
+from library.store import CallsStore
+
+
+def server_frame(data) -> pd.DataFrame:
+    """
+    Calls data of ServerView in format of parse_calls_from_db (columns: codes, 'server', 'time')
+    which legacy_figure_constructor takes
+    """
+    calls_df = pd.DataFrame({code: data.series(code) for code in data.codes})
+    calls_df['server'] = data.server
+    calls_df['time'] = data.datetimes().astype('datetime64[ns]')
+    return calls_df
+
+
+def legacy_figure_constructor(data=None, bucket=1):
+    """
+    plotly.express constructor which was used before figure_constructor built traces from columns
+    """
+    server = list(data['server'].unique())[0]
+    codes = sorted(data.columns[:-2])
+
+    code_labels = {}
+    for code in codes:
+        try:
+            code_labels[code] = f'{code} <{responses_info()[int(code)][0]}>'
+        except (ValueError, KeyError):
+            code_labels[code] = code
+
+    figure = scatter(data, x='time', y=codes,
+                     labels={
+                         'time': 'Datetime MSK (UTC +03)',
+                         'value': 'Calls per minute' if bucket == 1 else f'Calls per {bucket} minutes',
+                         'variable': 'Response code'
+                     })
+    figure.for_each_trace(lambda t: t.update(name=code_labels[t.name],
+                                             legendgroup=code_labels[t.name],
+                                             hovertemplate=t.hovertemplate.replace(t.name, code_labels[t.name])))
+    figure.update_layout(title=dict(text=server, font=dict(size=20), automargin=True), font=dict(size=15))
+    return figure
+
+
+def pooled_figures_constructor(servers_data, executor):
+    """
+    Figures of servers built in threads pool
+    """
+    return list(executor.map(figure_constructor, servers_data))
+
+
+def measure(method, repeats=3) -> float:
+    """
+    Best time of method execution (seconds)
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        method()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, nargs='+', default=[1, 5, 10, 15, 20, 30])
+    parser.add_argument('--hours', type=int, default=48, help='window length (per-minute data)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4, help='threads of pool')
+    arguments = parser.parse_args()
+
+    executor = ThreadPoolExecutor(max_workers=arguments.workers)
+    print(f'{"servers":>8} {"plotly.express, s":>18} {"serial, s":>10} {"pool, s":>8}')
+    for servers in arguments.servers:
+        calls_data = synthetic_calls_data(rows=arguments.hours * 60 * servers, servers=servers)
+        servers_data = CallsStore.from_frame(parse_calls_from_db(calls_data)).views()
+        servers_frames = [server_frame(data) for data in servers_data]
+
+        legacy_time = measure(lambda: [legacy_figure_constructor(df) for df in servers_frames], arguments.repeats)
+        serial_time = measure(lambda: figures_constructor(servers_data), arguments.repeats)
+        pool_time = measure(lambda: pooled_figures_constructor(servers_data, executor), arguments.repeats)
+        print(f'{servers:>8} {legacy_time:>18.3f} {serial_time:>10.3f} {pool_time:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
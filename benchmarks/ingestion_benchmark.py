@@ -0,0 +1,46 @@
+"""
+Peak memory and time of calls data ingestion against window length:
+answer as list of lines parsed by parse_calls_from_db and streamed answer in long format parsed by parse_calls_stream
+
+Usage (from project directory): python -m benchmarks.ingestion_benchmark --hours 24 168 720
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synthetic import pairs_chunks, wide_lines
+from library.parsing import parse_calls_from_db, parse_calls_stream
+from library.store import CallsStore
+
+
+def measure(method) -> tuple:
+    """
+    Time (seconds) and peak of memory allocations (MB) of method execution
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = method()
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return duration, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=int, nargs='+', default=[24, 168, 720])
+    parser.add_argument('--servers', type=int, default=10)
+    arguments = parser.parse_args()
+
+    print(f'{"hours":>6} {"store, MB":>10} {"lines: s":>9} {"peak MB":>8} {"stream: s":>10} {"peak MB":>8}')
+    for hours in arguments.hours:
+        lines_time, lines_peak, _ = measure(
+            lambda: CallsStore.from_frame(parse_calls_from_db(wide_lines(hours, arguments.servers))))
+        stream_time, stream_peak, calls = measure(
+            lambda: parse_calls_stream(pairs_chunks(hours, arguments.servers)))
+        print(f'{hours:>6} {calls.nbytes / 1024 ** 2:>10.1f} {lines_time:>9.2f} {lines_peak:>8.1f} '
+              f'{stream_time:>10.2f} {stream_peak:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
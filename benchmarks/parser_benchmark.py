@@ -0,0 +1,82 @@
+"""
+Comparison of vectorized parse_calls_from_db with the previous row-by-row parser
+
+Usage (from project directory): python -m benchmarks.parser_benchmark --rows 1000000
+"""
+import argparse
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_calls_data
+from library.parsing import parse_calls_from_db
+
+
+def legacy_parse_calls_from_db(calls_data, datetime_format='%Y-%m-%d %H:%M:%S') -> pd.DataFrame:
+    """
+    Row-by-row parser which was used before vectorized parse_calls_from_db
+    """
+    calls_times, calls_servers, calls_codes = [], [], []
+    for call in calls_data:
+        call = call.split('\t')
+
+        try:
+            time_point, server, codes = call
+        except ValueError:
+            continue
+
+        time_point = datetime.strptime(time_point, datetime_format)
+        codes_dict = {}
+        for code in codes.split(';'):
+            codes_dict.update({code.split()[0][:-1]: float(code.split()[1])})
+
+        calls_times.append(time_point)
+        calls_servers.append(server)
+        calls_codes.append(codes_dict)
+
+    unique_codes = list(set(code for codes_dict in calls_codes for code in codes_dict))
+    for call in calls_codes:
+        for code in unique_codes:
+            if code not in list(call.keys()):
+                call.update({code: None})
+    calls = {key: [i[key] for i in calls_codes] for key in list(calls_codes[0].keys())}
+    calls.update({'server': calls_servers, 'time': calls_times})
+    return pd.DataFrame(data=calls).sort_values(by=['time'])
+
+
+def measure(method, calls_data, repeats=1) -> float:
+    """
+    Best time of method execution (seconds)
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        method(calls_data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--servers', type=int, default=15)
+    parser.add_argument('--repeats', type=int, default=1)
+    arguments = parser.parse_args()
+
+    calls_data = synthetic_calls_data(rows=arguments.rows, servers=arguments.servers)
+
+    vectorized = parse_calls_from_db(calls_data)
+    legacy = legacy_parse_calls_from_db(calls_data)
+    pd.testing.assert_frame_equal(vectorized.sort_index(axis=1), legacy.sort_index(axis=1),
+                                  check_like=True, check_dtype=False)
+
+    legacy_time = measure(legacy_parse_calls_from_db, calls_data, arguments.repeats)
+    vectorized_time = measure(parse_calls_from_db, calls_data, arguments.repeats)
+    print(f'rows: {arguments.rows}, servers: {arguments.servers}')
+    print(f'row-by-row parser: {legacy_time:.2f} s')
+    print(f'vectorized parser: {vectorized_time:.2f} s ({legacy_time / vectorized_time:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark suite of data pipeline: parsing, splitting by servers, statistics, figures and dashboard callback
+end to end (fake clickhouse endpoint with synthetic data, callback is requested through Dash HTTP interface).
+Results are written as json to compare them across commits.
+
+Usage (from project directory):
+    python -m benchmarks.run --servers 10 --hours 48 --output results.json
+    python -m benchmarks.run --output new.json --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from benchmarks.fake_clickhouse import FakeClickHouse
+from benchmarks.synthetic import CODES, pairs_chunks, wide_lines
+
+RESULTS_VERSION = 1
+
+
+def measure(method, repeats=3, setup=None) -> dict:
+    """
+    Time of method execution
+    :param method: function without arguments
+    :param repeats: number of runs
+    :param setup: function without arguments which is called before every run (not measured)
+    :return: {'min': seconds, 'median': seconds, 'repeats': number of runs}
+    """
+    timings = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        method()
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'repeats': repeats}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pipeline_benchmarks(arguments) -> dict:
+    """
+    Benchmarks of library functions on synthetic data
+    """
+    from library.parsing import parse_calls_from_db, parse_calls_stream, split_dataframe_by_servers
+    from library.statistics import calls_statistics_table
+    from library.store import CallsStore
+    from dashboard.methods import figure_constructor, figures_constructor
+
+    lines = wide_lines(arguments.hours, arguments.servers, arguments.codes)
+    chunks = list(pairs_chunks(arguments.hours, arguments.servers, arguments.codes))
+    calls_dataframe = parse_calls_from_db(lines)
+    calls = CallsStore.from_frame(calls_dataframe)
+    servers_data = calls.views()
+    repeats = arguments.repeats
+
+    results = {
+        'parse_calls_from_db': measure(lambda: parse_calls_from_db(lines), repeats),
+        'split_dataframe_by_servers': measure(lambda: split_dataframe_by_servers(calls_dataframe), repeats),
+        'parse_calls_stream': measure(lambda: parse_calls_stream(iter(chunks)), repeats),
+        'calls_statistics_table': measure(lambda: calls_statistics_table(calls), repeats),
+        'figure_constructor': measure(lambda: [figure_constructor(data) for data in servers_data], repeats),
+        'figures_constructor': measure(lambda: figures_constructor(servers_data), repeats),
+    }
+    results['parse_calls_from_db']['rows'] = len(lines)
+    results['parse_calls_stream']['bytes'] = sum(len(chunk) for chunk in chunks)
+    return results
+
+
+def callback_request(app, hours, servers, trigger, plots_state=None) -> dict:
+    """
+    Body of Dash request of plots_and_response_code_button callback
+    :param trigger: 'refresh' (partial update of figures, see refresh_input of webapp) or id of other input
+    """
+    output = next(key for key in app.callback_map if 'plots-state.data' in key)
+    refresh = next(item for item in app.callback_map[output]['inputs']
+                   if item['id'] in ('stream-resync', 'interval-component'))
+    if trigger == 'refresh':
+        trigger = f"{refresh['id']}.{refresh['property']}"
+    plots_ids = [{'type': 'calls-plot', 'index': server} for server in servers]
+    return {
+        'output': output,
+        'outputs': [[{'id': plot_id, 'property': 'figure'} for plot_id in plots_ids],
+                    {'id': 'response-code-button', 'property': 'outline'},
+                    {'id': 'response-code-button', 'property': 'children'},
+                    {'id': 'response-code-button', 'property': 'color'},
+                    {'id': 'data-status', 'property': 'children'},
+                    {'id': 'data-status', 'property': 'color'},
+                    {'id': 'plots-state', 'property': 'data'},
+                    {'id': 'stream-snapshot', 'property': 'children'}],
+        'inputs': [{'id': 'response-code-button', 'property': 'n_clicks', 'value': 0},
+                   {'id': 'time-interval-dropdown-menu', 'property': 'value', 'value': f'{hours // 24}d'},
+                   dict(refresh, value=1),
+                   {'id': 'servers-list', 'property': 'data', 'value': servers}],
+        'state': [[{'id': plot_id, 'property': 'id', 'value': plot_id} for plot_id in plots_ids],
+                  {'id': 'plots-state', 'property': 'data', 'value': plots_state}],
+        'changedPropIds': [trigger],
+    }
+
+
+def end_to_end_benchmarks(arguments, fake) -> dict:
+    """
+    Benchmarks of dashboard against fake clickhouse: the first load of time interval,
+    background refresh of data, callback with full figures and callback with partial update of figures
+    """
+    import webapp
+    import dashboard.methods as dashboard_methods
+
+    client = webapp.app.server.test_client()
+    client.get('/')  # callbacks are registered in Dash application at the first request
+    hours = arguments.hours
+    servers = dashboard_methods.get_servers(hours)
+    results = {}
+
+    def post(trigger, plots_state=None):
+        response = client.post('/_dash-update-component',
+                               json=callback_request(webapp.app, hours, servers, trigger, plots_state))
+        if response.status_code != 200:
+            raise RuntimeError(f'callback answered {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        return response
+
+    def age_tiers():
+        # the next update fetches the tail of data instead of skipping it as too frequent
+        for tiers in dashboard_methods.calls_tiers.values():
+            tiers.updated_at = -float('inf')
+
+    queries_before = len(fake.queries)
+    results['first_load'] = measure(lambda: dashboard_methods.get_snapshot(hours), repeats=1)
+    results['first_load']['queries'] = len(fake.queries) - queries_before
+
+    refresh = lambda: dashboard_methods.data_refresher.refresh(hours)
+    results['refresh'] = measure(refresh, arguments.repeats, setup=age_tiers)
+
+    responses = []
+    results['callback_full'] = measure(lambda: responses.append(post('time-interval-dropdown-menu.value')),
+                                       arguments.repeats)
+    results['callback_full']['response_bytes'] = len(responses[-1].get_data())
+
+    state = {}
+
+    def patch_setup():
+        # browser shows figures of the previous snapshot, a new snapshot is published by refresher
+        response = post('time-interval-dropdown-menu.value')
+        state['plots'] = json.loads(response.get_data())['response']['plots-state']['data']
+        age_tiers()
+        refresh()
+
+    results['callback_patch'] = measure(
+        lambda: responses.append(post('refresh', state['plots'])),
+        arguments.repeats, setup=patch_setup)
+    results['callback_patch']['response_bytes'] = len(responses[-1].get_data())
+    return results
+
+
+def benchmark_parameters(fake, directory) -> str:
+    """
+    Parameters file of dashboard which uses fake clickhouse (other parameters are taken from project)
+    :return: path of parameters file
+    """
+    # parameters module is not imported here: it reads path of parameters file from environment at import
+    project_parameters = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parameters',
+                                      'application.yml')
+    with open(project_parameters) as f:
+        parameters = yaml.safe_load(f)
+    parameters['clickhouse'] = {'clickhouse_url': fake.url, 'clickhouse_database': fake.table,
+                                'clickhouse_user': 'benchmark', 'clickhouse_password': None}
+    parameters.pop('sources', None)
+    parameters['cache'] = {'backend': 'memory'}
+    parameters['alerts'] = {'enabled': False}
+    path = os.path.join(directory, 'application.yml')
+    with open(path, 'w') as f:
+        yaml.safe_dump(parameters, f)
+    return path
+
+
+def compare(results, baseline) -> str:
+    """
+    Table of changes of median times against baseline results
+    """
+    lines = [f'{"benchmark":<28} {"baseline, s":>12} {"current, s":>11} {"change":>8}']
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            lines.append(f'{name:<28} {"-":>12} {result["median"]:>11.4f}')
+            continue
+        change = result['median'] / previous['median'] - 1 if previous['median'] else float('nan')
+        lines.append(f'{name:<28} {previous["median"]:>12.4f} {result["median"]:>11.4f} {change:>+8.1%}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, default=10)
+    parser.add_argument('--codes', type=int, default=len(CODES), help='number of response codes')
+    parser.add_argument('--hours', type=int, default=48, help='window length (multiple of 24)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of fake clickhouse answers (seconds)')
+    parser.add_argument('--skip-end-to-end', action='store_true', help='benchmark only library functions')
+    parser.add_argument('--output', help='json file for results (printed if not set)')
+    parser.add_argument('--compare', help='json file with results of other commit')
+    arguments = parser.parse_args()
+
+    with FakeClickHouse(servers=arguments.servers, codes=arguments.codes, latency=arguments.latency) as fake, \
+            tempfile.TemporaryDirectory() as directory:
+        # dashboard modules read parameters file at import
+        os.environ['CALLS_VISUALIZER_CONFIG'] = benchmark_parameters(fake, directory)
+        results = pipeline_benchmarks(arguments)
+        if not arguments.skip_end_to_end:
+            results.update(end_to_end_benchmarks(arguments, fake))
+
+    report = {
+        'version': RESULTS_VERSION,
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                        'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'parameters': {key: value for key, value in vars(arguments).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
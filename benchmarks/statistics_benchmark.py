@@ -0,0 +1,72 @@
+"""
+Comparison of grouped statistics engine with the previous per-server and per-code calls_statistics
+
+Usage (from project directory): python -m benchmarks.statistics_benchmark --rows 300000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_calls_data
+from library.parsing import parse_calls_from_db, split_dataframe_by_servers
+from library.statistics import calls_statistics_table
+from library.store import CallsStore
+
+
+def legacy_calls_statistics(dataframe, code) -> tuple:
+    """
+    calls_statistics which was called for every server and code before calls_statistics_table
+    """
+    calls_max = int(dataframe[code].max())
+    calls_median = int(dataframe[code].median())
+    calls_mean = int(dataframe[code].mean())
+    calls_events = dataframe[code].astype(bool).sum(axis=0)
+    calls_timedelta = (dataframe[[code, 'time']]['time'].max() - dataframe[[code, 'time']][
+        'time'].min()) / pd.Timedelta('1h')
+    calls_sum = round(dataframe[code].sum() / calls_timedelta, 2)
+    return calls_max, calls_median, calls_mean, calls_events, calls_sum
+
+
+def legacy_statistics(calls_dataframe) -> list:
+    """
+    Statistics of all servers and codes with legacy_calls_statistics (data is split by servers first)
+    """
+    statistics = []
+    for server_df in split_dataframe_by_servers(calls_dataframe):
+        for code in server_df.columns[:-2]:
+            statistics.append(legacy_calls_statistics(server_df, code))
+    return statistics
+
+
+def measure(method, argument, repeats=3) -> float:
+    """
+    Best time of method execution (seconds)
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        method(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--servers', type=int, default=15)
+    parser.add_argument('--repeats', type=int, default=3)
+    arguments = parser.parse_args()
+
+    calls_dataframe = parse_calls_from_db(synthetic_calls_data(rows=arguments.rows, servers=arguments.servers))
+    calls = CallsStore.from_frame(calls_dataframe)
+
+    legacy_time = measure(legacy_statistics, calls_dataframe, arguments.repeats)
+    grouped_time = measure(calls_statistics_table, calls, arguments.repeats)
+    print(f'rows: {arguments.rows}, servers: {arguments.servers}')
+    print(f'per-code statistics: {legacy_time:.3f} s')
+    print(f'grouped statistics:  {grouped_time:.3f} s ({legacy_time / grouped_time:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
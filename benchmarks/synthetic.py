@@ -0,0 +1,148 @@
+"""
+Synthetic calls data in formats of clickhouse answers (calls_query and calls_pairs_query)
+
+Calls numbers are a deterministic function of server, time and response code:
+answers for overlapping time intervals agree with each other (as answers of a real database do).
+200 code follows daily profile of server load, other codes appear sporadically with smaller numbers.
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+CODES = ['200', '180', '183', '401', '403', '404', '407', '480', '486', '487', '500', '503', '603']
+SIP_CODES = CODES + ['408', '481', '488', '502', '504', '600', '604']
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+END = datetime(2024, 1, 31)  # end of generated intervals (exclusive)
+
+
+def response_codes(cardinality=len(CODES)) -> list:
+    """
+    Response codes of data: 200 and the most frequent SIP codes (numbered codes if cardinality is larger)
+    :param cardinality: number of codes
+    :return: list of codes
+    """
+    codes = SIP_CODES[:cardinality]
+    codes += [str(700 + number) for number in range(cardinality - len(codes))]
+    return codes
+
+
+def server_name(number) -> str:
+    return f'sip-server-{number:02d}'
+
+
+def _uniform(*keys) -> np.ndarray:
+    """
+    Pseudo-random numbers in [0, 1) from integer keys (splitmix64 hash, vectorized)
+    """
+    value = np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over='ignore'):
+        for key in keys:
+            value = (value ^ np.asarray(key).astype(np.uint64)) * np.uint64(0xBF58476D1CE4E5B9)
+            value ^= value >> np.uint64(31)
+            value *= np.uint64(0x94D049BB133111EB)
+            value ^= value >> np.uint64(29)
+    return (value >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def synthetic_counts(epochs, server, codes, bucket=1, seed=0) -> np.ndarray:
+    """
+    Calls numbers of server in time buckets
+    :param epochs: starts of buckets (epoch seconds)
+    :param server: number of server
+    :param codes: response codes (see response_codes)
+    :param bucket: size of bucket (in minutes), numbers are sums of calls per minute
+    :param seed: random seed
+    :return: int64 array (buckets x codes), 0 if code has no calls in bucket
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    load = 50 + 450 * _uniform(seed, server, 1)  # 200 calls per minute at peak hour
+    daily = 0.3 + 0.7 * (1 - np.cos(2 * math.pi * (epochs % 86400) / 86400)) / 2
+    counts = np.zeros((len(epochs), len(codes)), dtype=np.int64)
+    for column, code in enumerate(codes):
+        noise = _uniform(seed, server, int(code), epochs // 60)
+        if code == '200':
+            counts[:, column] = np.rint(load * daily * bucket * (0.8 + 0.4 * noise))
+            continue
+        # rare codes appear in fewer buckets, probability of code grows with bucket size
+        rank = SIP_CODES.index(code) if code in SIP_CODES else len(SIP_CODES)
+        probability = 1 - (1 - 0.5 / (1 + rank)) ** bucket
+        present = _uniform(seed, server, int(code), epochs // 60, 2) < probability
+        counts[:, column] = np.where(present, 1 + np.floor(noise * load * daily * bucket * 0.05 / (1 + rank)), 0)
+    return counts
+
+
+def interval_epochs(hours, bucket=1, end=END, since=None) -> np.ndarray:
+    """
+    Starts of buckets of time interval which ends at end (buckets are aligned to bucket size)
+    :param hours: length of interval (in hours)
+    :param bucket: size of bucket (in minutes)
+    :param end: end of interval (exclusive)
+    :param since: start of interval (instead of end - hours)
+    :return: int64 array of epoch seconds
+    """
+    end_seconds = int((end - datetime(1970, 1, 1)).total_seconds())
+    start = since if since is not None else end - timedelta(hours=hours)
+    start_seconds = int((start - datetime(1970, 1, 1)).total_seconds())
+    step = bucket * 60
+    return np.arange(start_seconds - start_seconds % step, end_seconds, step, dtype=np.int64)
+
+
+def synthetic_buckets(hours, servers, codes=len(CODES), bucket=1, seed=0, end=END, since=None):
+    """
+    Calls numbers of every server and time bucket in order of time
+    :param hours: length of interval (in hours)
+    :param servers: number of servers
+    :param codes: number of response codes (see response_codes)
+    :param bucket: size of bucket (in minutes)
+    :param seed: random seed
+    :param end: end of interval (exclusive)
+    :param since: start of interval (instead of end - hours)
+    :return: generator of (datetime text, server name, {code: calls})
+    """
+    codes = response_codes(codes)
+    epochs = interval_epochs(hours, bucket, end, since)
+    times = [text.replace('T', ' ') for text in np.datetime_as_string(epochs.astype('datetime64[s]')).tolist()]
+    servers_counts = [synthetic_counts(epochs, server, codes, bucket, seed).tolist() for server in range(servers)]
+    names = [server_name(server) for server in range(servers)]
+    for row, time_point in enumerate(times):
+        for name, counts in zip(names, servers_counts):
+            yield time_point, name, {code: calls for code, calls in zip(codes, counts[row]) if calls}
+
+
+def wide_lines(hours, servers, codes=len(CODES), bucket=1, seed=0, end=END, since=None) -> list:
+    """
+    Answer of calls_query: 'datetime\tserver\tcode_1: calls;code_2: calls...' lines ordered by time and server
+    """
+    return [f'{time_point}\t{server}\t' + ';'.join(f'{code}: {calls}' for code, calls in calls.items())
+            for time_point, server, calls in synthetic_buckets(hours, servers, codes, bucket, seed, end, since)]
+
+
+def pairs_chunks(hours, servers, codes=len(CODES), bucket=1, seed=0, end=END, since=None, chunk_size=64 * 1024):
+    """
+    Answer of calls_pairs_query ('datetime\tserver\tcode\tcalls' lines) as stream of chunks
+    """
+    buffer, size = [], 0
+    for time_point, server, calls in synthetic_buckets(hours, servers, codes, bucket, seed, end, since):
+        for code, number in calls.items():
+            line = f'{time_point}\t{server}\t{code}\t{number}\n'
+            buffer.append(line)
+            size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def synthetic_calls_data(rows=1_000_000, servers=15, codes=len(CODES), seed=0) -> list:
+    """
+    Lines in the format of clickhouse answer: 'datetime\tserver\tcode_1: calls;code_2: calls...'
+    :param rows: number of lines (per-minute data of all servers)
+    :param servers: number of servers
+    :param codes: number of response codes
+    :param seed: random seed
+    :return: list of lines
+    """
+    minutes = -(-rows // servers)
+    return wide_lines(minutes / 60, servers, codes, seed=seed)[:rows]
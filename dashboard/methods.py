@@ -1,170 +1,912 @@
-from library.parsing import parse_calls_from_db, get_from_clickhouse, split_dataframe_by_servers, \
-    check_database_connection
-from library.methods import system_is_linux, responses_info
-from parameters.dashboard_parameters import replace_plots, config_file_path
+from library.parsing import get_from_clickhouse, stream_from_clickhouse, parse_calls_stream
+from library.methods import responses_info
+from library.codes import CodesRegistry
+from library.queries import calls_pairs_query, servers_query, bucket_minutes, DEFAULT_QUERY_PARAMETERS
+from library.downsampling import downsample, max_points_for_interval, DEFAULT_DOWNSAMPLING_PARAMETERS
+from library.cache import TTLCache
+from library.backends import SharedCache, make_backend, DEFAULT_CACHE_PARAMETERS
+from library.metrics import timed
+from library.clickhouse import ClickHouseError
+from library.rollup import RollupTiers, rollup
+from library.store import CallsStore, save_store, load_store
+from library.statistics import calls_statistics_table, servers_hours
+from library.broadcast import Broadcaster, DEFAULT_STREAM_PARAMETERS
+from library.health import HealthMonitor, clickhouse_probe, DEFAULT_HEALTH_PARAMETERS
+from library.alerts import AlertsEngine, MemorySink, FileSink, WebhookSink, make_rule, DEFAULT_ALERTS_PARAMETERS
+from dashboard.refresher import DataRefresher, make_snapshot
+from parameters.dashboard_parameters import replace_plots, config_file_path, refresh_period, cache_max_entries, \
+    cache_max_bytes, refresher_idle_timeout, window_cache_dir, window_persist_period, source_timeout, \
+    time_intervals, default_time_interval
 
-from dash import dcc, dash_table
+from dash import dcc, html, dash_table, Patch, no_update
 from dash_bootstrap_templates import load_figure_template
 import dash_bootstrap_components as dbc
 
-from plotly.express import scatter
+from plotly.graph_objects import Figure, Scatter
 
+import numpy as np
 import pandas as pd
 import yaml
 
+import contextvars
+import json
 import logging
+import os
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor, wait
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 load_figure_template("darkly")
 
+CODE_LABELS = {str(code): f'{code} <{description[0]}>' for code, description in responses_info().items()}
+DEFAULT_SOURCE = 'default'  # name of data source set by 'clickhouse' block of parameters file
 
-def get_clickhouse_connection_parameters(parameters_file=config_file_path) -> dict:
+# response codes met by dashboard (new codes are logged and can be requested with codes_registry.new_since)
+codes_registry = CodesRegistry()
+
+
+def snapshot_size(snapshot) -> int:
     """
-    Get data for connection from file
+    Memory used by servers data of snapshot
+    :param snapshot: Snapshot
+    :return: size in bytes
+    """
+    return int(sum(data.nbytes for data in snapshot.servers_data))
+
+
+# calls data of every source in rollup tiers
+# (the finest tier is updated with the tail of new data, coarser ones are aggregated)
+calls_tiers = {}  # source name -> RollupTiers
+calls_tiers_lock = threading.Lock()
+sources_updates = {}  # source name -> Future of running update of its tiers
+sources_updates_lock = threading.Lock()
+windows_persisted = {}  # (source name, tier bucket in minutes) -> time of the last save of tier data
+windows_persist_lock = threading.Lock()
+
+
+def read_parameters_file(parameters_file=config_file_path) -> dict:
+    """
+    Read all parameters from file
     :param parameters_file: filepath
-    :return: dictionary with parameters
+    :return: dictionary with sections of parameters (empty if file is not found)
     """
     try:
         with open(parameters_file) as f:
-            parameters = yaml.safe_load(f)['clickhouse']
+            return yaml.safe_load(f) or {}
     except FileNotFoundError:
-        logging.error('parameters file not found')
-        parameters = None
-    return parameters
+        logging.error('Parameters file not found')
+        return {}
+
+
+def get_section_parameters(section, defaults, parameters_file=config_file_path) -> dict:
+    """
+    Get parameters of section from file (defaults are used for absent ones)
+    :param section: name of section (e.g. 'query')
+    :param defaults: default parameters of section (e.g. DEFAULT_QUERY_PARAMETERS)
+    :param parameters_file: filepath
+    :return: dictionary with parameters
+    """
+    return {**defaults, **(read_parameters_file(parameters_file).get(section) or {})}
+
+
+def get_clickhouse_connection_parameters(parameters_file=config_file_path) -> dict:
+    """
+    Get data for connection from file
+    :param parameters_file: filepath
+    :return: dictionary with parameters
+    """
+    return read_parameters_file(parameters_file).get('clickhouse')
+
+
+def get_sources_parameters(parameters_file=config_file_path) -> list:
+    """
+    Get connection parameters of all clickhouse instances with calls data (e.g. one per region) from file:
+    'sources' list or the single 'clickhouse' block (its source is named DEFAULT_SOURCE)
+    :param parameters_file: filepath
+    :return: list of connection parameters with 'name' of source (empty if parameters file is not found)
+    """
+    parameters = read_parameters_file(parameters_file)
+    sources = parameters.get('sources') or []
+    if not sources and parameters.get('clickhouse'):
+        sources = [{**parameters['clickhouse'], 'name': DEFAULT_SOURCE}]
+    return [{**source, 'name': str(source.get('name') or f'source_{number}')}
+            for number, source in enumerate(sources)]
 
 
 def get_webapp_connection_parameters(parameters_file=config_file_path) -> dict:
-    try:
-        with open(parameters_file) as f:
-            parameters = yaml.safe_load(f)['webapp']
-    except FileNotFoundError:
-        logging.error('Parameters file not found')
-        parameters = None
-    return parameters
+    return read_parameters_file(parameters_file).get('webapp')
+
+
+# connection parameters of sources are read once: health monitors and executor of queries are created for them
+sources_parameters = get_sources_parameters()
+
+
+# backend shared by worker processes of production server: only the leader process queries database
+cache_parameters = get_section_parameters('cache', DEFAULT_CACHE_PARAMETERS)
+cache_backend = make_backend(cache_parameters, base_directory=os.path.dirname(config_file_path))
+
+# snapshots of servers data shared by all callbacks and browser sessions (key is time interval in hours)
+data_cache = SharedCache('snapshot', cache_backend,
+                         TTLCache(ttl=refresh_period, max_entries=cache_max_entries, max_bytes=cache_max_bytes,
+                                  size_of=snapshot_size),
+                         wait_seconds=cache_parameters['wait_seconds'])
 
 
-def get_data(hours_of_calls_data=None, should_replace=True) -> list:
+def query_bucket_minutes(hours_of_calls_data=None) -> int:
     """
-    Method to get data from clickhouse and store data as list (element is dataframe by each server)
+    Size of time bucket (in minutes) which is used to aggregate calls data for chosen interval
     :param hours_of_calls_data: time to get data (in hours)
-    :param should_replace: additional parameter to change position of plots
-    :return: (list of dataframes, response codes that are present)
+    :return: bucket size in minutes
     """
-    connection_params = get_clickhouse_connection_parameters()
+    return bucket_minutes(hours_of_calls_data, query_parameters['buckets'], query_parameters['min_points'])
+
+
+# parameters of queries and plots are read once: they are used by every data refresh and callback
+query_parameters = get_section_parameters('query', DEFAULT_QUERY_PARAMETERS)
+downsampling_parameters = get_section_parameters('downsampling', DEFAULT_DOWNSAMPLING_PARAMETERS)
+
+
+def health_monitors_from_parameters(parameters=None, sources=None) -> dict:
+    """
+    Health monitors of data sources (should be started by application)
+    :param parameters: health parameters (see DEFAULT_HEALTH_PARAMETERS)
+    :param sources: connection parameters of sources (see get_sources_parameters)
+    :return: {source name: HealthMonitor} (empty if monitor is disabled)
+    """
+    if not parameters or not parameters.get('enabled'):
+        return {}
+    monitors = {}
+    for connection_params in sources or []:
+        try:
+            probe = clickhouse_probe(connection_params['clickhouse_url'],
+                                     db_usr=connection_params['clickhouse_user'],
+                                     passwd=connection_params['clickhouse_password'],
+                                     database=connection_params['clickhouse_database'],
+                                     timeout=parameters['probe_timeout'])
+        except ClickHouseError as error:
+            logging.error(f"Health monitor of {connection_params['name']} source is not created: {error}")
+            continue
+        monitors[connection_params['name']] = HealthMonitor(probe, probe_period=parameters['probe_period'],
+                                                            failure_threshold=parameters['failure_threshold'],
+                                                            open_seconds=parameters['open_seconds'],
+                                                            slow_seconds=parameters['slow_seconds'],
+                                                            latency_window=parameters['latency_window'])
+    return monitors
+
 
-    if connection_params:
-        connection = check_database_connection(db_usr=connection_params['clickhouse_user'],
-                                               passwd=connection_params['clickhouse_password'],
-                                               clickhouse_url=connection_params['clickhouse_url'],
-                                               database=connection_params['clickhouse_database'])
+# availability of every source is checked in background, queries are not sent to source while it is down
+health_monitors = health_monitors_from_parameters(get_section_parameters('health', DEFAULT_HEALTH_PARAMETERS),
+                                                  sources_parameters)
+
+
+def database_available(source=DEFAULT_SOURCE) -> bool:
+    """
+    Queries can be sent to source (circuit of its health monitor is not open)
+    :param source: source name
+    """
+    monitor = health_monitors.get(source)
+    return monitor is None or monitor.allow()
+
+
+def register_query(source=DEFAULT_SOURCE, error=None):
+    """
+    Pass result of source query to its health monitor
+    :param source: source name
+    :param error: ClickHouseError if query failed
+    """
+    monitor = health_monitors.get(source)
+    if monitor is None:
+        return
+    if error is None:
+        monitor.record_success()
     else:
-        connection = False
+        monitor.record_failure(error)
+
+
+# queries of sources are sent concurrently (total time is about the time of the slowest source)
+sources_executor = ThreadPoolExecutor(max_workers=2 * max(1, len(sources_parameters)),
+                                      thread_name_prefix='sources')
+
+
+def alerts_engine_from_parameters(parameters=None):
+    """
+    Alerts engine with rules and sinks from parameters (alerts are always kept in alerts_memory for dashboard)
+    :param parameters: alerts parameters (see DEFAULT_ALERTS_PARAMETERS)
+    :return: AlertsEngine or None if alerts are disabled
+    """
+    if not parameters or not parameters.get('enabled'):
+        return None
+    sinks = [alerts_memory]
+    if parameters.get('file'):
+        sinks.append(FileSink(os.path.join(os.path.dirname(config_file_path), parameters['file'])))
+    if parameters.get('webhook_url'):
+        sinks.append(WebhookSink(parameters['webhook_url']))
+    return AlertsEngine([make_rule(rule) for rule in parameters['rules'] or []], sinks=sinks,
+                        history_points=parameters['history_points'])
+
 
-    if not connection:
-        servers_data = None
+# alerts are evaluated on every update of the finest rollup tier
+alerts_memory = MemorySink()
+alerts_engine = alerts_engine_from_parameters(get_section_parameters('alerts', DEFAULT_ALERTS_PARAMETERS))
+
+
+def window_directory(bucket=1, source=DEFAULT_SOURCE) -> str:
+    """
+    Directory where calls data of rollup tier is saved for warm restarts
+    :param bucket: time bucket of tier (in minutes)
+    :param source: source name
+    :return: directory path
+    """
+    if source == DEFAULT_SOURCE:
+        return os.path.join(window_cache_dir, f'tier_{bucket}m')
+    return os.path.join(window_cache_dir, source, f'tier_{bucket}m')
+
+
+def restore_window(window, bucket=1, fingerprint=None, source=DEFAULT_SOURCE):
+    """
+    Fill empty window with data saved before restart (data of other query parameters is not used)
+    :param window: RollingWindow
+    :param bucket: time bucket of tier (in minutes)
+    :param fingerprint: parameters of current query
+    :param source: source name
+    """
+    calls, description = load_store(window_directory(bucket, source))
+    if calls is None or description['metadata'].get('fingerprint') != json.loads(json.dumps(fingerprint)):
+        return
+    window.restore(calls, fingerprint=fingerprint, age=time.time() - description['saved_at'])
+    # data is already on disk, it is saved again after persist period
+    windows_persisted[(source, bucket)] = time.monotonic()
+    logging.info(f'{bucket}m calls data of {source} source restored from disk ({len(calls)} rows)')
+
+
+def persist_window(calls, bucket=1, fingerprint=None, source=DEFAULT_SOURCE):
+    """
+    Save window data to disk (not more often than once per window_persist_period)
+    :param calls: CallsStore of window
+    :param bucket: time bucket of tier (in minutes)
+    :param fingerprint: parameters of query which produced data
+    :param source: source name
+    """
+    if not windows_persist_lock.acquire(blocking=False):
+        return  # data is being saved by other thread
+    try:
+        now = time.monotonic()
+        if now - windows_persisted.get((source, bucket), -float('inf')) >= window_persist_period:
+            windows_persisted[(source, bucket)] = now
+            save_store(calls, window_directory(bucket, source), metadata={'fingerprint': fingerprint})
+    finally:
+        windows_persist_lock.release()
+
+
+@timed('fetch')
+def fetch_calls(connection_params, query_parameters, hours_of_calls_data=None, bucket=1, since=None):
+    """
+    Get calls data aggregated by time buckets from clickhouse
+    :param connection_params: clickhouse connection parameters
+    :param query_parameters: query parameters (see DEFAULT_QUERY_PARAMETERS)
+    :param hours_of_calls_data: time to get data (in hours)
+    :param bucket: size of time bucket (in minutes)
+    :param since: datetime to get only data starting from it
+    :return: CallsStore (ClickHouseError is raised if data was not received)
+    """
+    # SQL-QUERY TO GET CALLS DATA (AGGREGATED BY TIME BUCKETS ON CLICKHOUSE SIDE, ONE LINE PER RESPONSE CODE)
+    sql_query = calls_pairs_query(database=connection_params['clickhouse_user'],
+                                  table=connection_params['clickhouse_database'],
+                                  hours_of_calls_data=hours_of_calls_data,
+                                  bucket=bucket,
+                                  parameters=query_parameters,
+                                  since=since)
+    # answer is parsed by batches while it is received
+    calls_chunks = stream_from_clickhouse(db_usr=connection_params['clickhouse_user'],
+                                          passwd=connection_params['clickhouse_password'],
+                                          clickhouse_url=connection_params['clickhouse_url'],
+                                          sql_query=sql_query)
+    return parse_calls_stream(calls_chunks, codes_registry=codes_registry)
+
+
+def source_tiers(source=DEFAULT_SOURCE) -> RollupTiers:
+    """
+    Rollup tiers with calls data of source (tiers of query parameters)
+    :param source: source name
+    :return: RollupTiers
+    """
+    with calls_tiers_lock:
+        tiers = calls_tiers.get(source)
+        if tiers is None:
+            tiers = calls_tiers[source] = RollupTiers(query_parameters['buckets'],
+                                                      query_parameters['overlap_minutes'])
+        return tiers
+
+
+def tiers_data(tiers) -> dict:
+    """
+    Calls data of all tiers
+    :param tiers: RollupTiers
+    :return: {tier bucket: CallsStore} or None if some tier has no data yet
+    """
+    tiers_calls = {tier_bucket: window.calls for tier_bucket, window in tiers.windows.items()}
+    return tiers_calls if tiers_calls and all(calls is not None for calls in tiers_calls.values()) else None
+
+
+def update_source(connection_params, query_parameters) -> dict:
+    """
+    Update rollup tiers of source (only the tail of the finest tier is requested if tiers are consistent)
+    :param connection_params: clickhouse connection parameters of source (see get_sources_parameters)
+    :param query_parameters: query parameters (see DEFAULT_QUERY_PARAMETERS)
+    :return: {tier bucket: CallsStore} (ClickHouseError is raised if data was not received)
+    """
+    source = connection_params['name']
+    tiers = source_tiers(source)
+    columns = tuple((key, str(value)) for key, value in sorted(query_parameters.items())
+                    if key not in ('overlap_minutes', 'min_points', 'buckets'))
+
+    def fingerprint(tier_bucket):
+        return (connection_params['clickhouse_url'], connection_params['clickhouse_user'],
+                connection_params['clickhouse_database'], tier_bucket, columns)
+
+    with tiers.lock:
+        tiers.configure(query_parameters['buckets'], query_parameters['overlap_minutes'])
+        if window_cache_dir:
+            for tier_bucket, window in tiers.windows.items():
+                if window.calls is None:
+                    restore_window(window, tier_bucket, fingerprint(tier_bucket), source)
+
+        codes_version = codes_registry.version
+        with timed('tiers_update'):
+            tiers.update(lambda hours, tier_bucket, since: fetch_calls(connection_params, query_parameters,
+                                                                       hours, tier_bucket, since),
+                         fingerprint, min_interval=refresh_period / 2)
+        new_codes = codes_registry.new_since(codes_version)
+        if new_codes and codes_version:
+            logging.info(f"New response codes appeared: {', '.join(new_codes)}")
+        tiers_calls = tiers_data(tiers)
+
+    # data of follower worker (loaded while leader had not published it) is not saved
+    if window_cache_dir and cache_backend.is_leader():
+        with timed('persist'):
+            for tier_bucket, calls in tiers_calls.items():
+                persist_window(calls, tier_bucket, fingerprint(tier_bucket), source)
+    return tiers_calls
+
+
+def update_sources(sources, query_parameters) -> list:
+    """
+    Update tiers of all sources concurrently: sources which do not answer in source_timeout are represented
+    by their previous data (their update continues in background and is not repeated until it finishes)
+    :param sources: connection parameters of sources (see get_sources_parameters)
+    :param query_parameters: query parameters (see DEFAULT_QUERY_PARAMETERS)
+    :return: list of {tier bucket: CallsStore} of sources or None if no source returned new data
+    """
+    futures = {}
+    for connection_params in sources:
+        source = connection_params['name']
+        if not database_available(source):
+            continue  # fail fast: previous data of source is shown until it is available again
+        with sources_updates_lock:
+            future = sources_updates.get(source)
+            if future is None or future.done():
+                # stages of update are measured for request which waits for it (see library.metrics.timed)
+                future = sources_updates[source] = sources_executor.submit(contextvars.copy_context().run,
+                                                                           update_source, connection_params,
+                                                                           query_parameters)
+        futures[source] = future
+    done, _ = wait(futures.values(), timeout=source_timeout)
+
+    sources_calls, updated = [], False
+    for connection_params in sources:
+        source = connection_params['name']
+        future = futures.get(source)
+        if future in done:
+            try:
+                sources_calls.append(future.result())
+                register_query(source)
+                updated = True
+                continue
+            except ClickHouseError as error:
+                register_query(source, error)
+        elif future is not None:
+            logging.warning(f'{source} source did not answer in {source_timeout} s, its previous data is shown')
+        previous = tiers_data(source_tiers(source))
+        if previous is not None:
+            sources_calls.append(previous)
+    return sources_calls if updated else None
+
+
+def merge_sources(sources_calls, buckets) -> dict:
+    """
+    Calls data of all sources (numbers of server which is present in several sources are summed)
+    :param sources_calls: list of {tier bucket: CallsStore} of sources
+    :param buckets: tiers to merge
+    :return: {tier bucket: CallsStore}
+    """
+    if len(sources_calls) == 1:
+        return sources_calls[0]
+    return {tier_bucket: rollup(CallsStore.concat([calls.get(tier_bucket) for calls in sources_calls]), tier_bucket)
+            for tier_bucket in buckets}
+
+
+def get_data(hours_of_calls_data=None) -> list:
+    """
+    Method to get data from clickhouse sources and store data as list (element is data of each server)
+    :param hours_of_calls_data: time to get data (in hours)
+    :return: list of ServerView (slices of rollup tier) sorted by server or None if no source returned data
+    """
+    sources = sources_parameters
+    if not sources:
         logging.error('No connection with database')
+        return None
 
-    else:
-        # SQL-QUERY TO GET CALLS DATA
-        sql_query = (f"SELECT * FROM "
-                     f"{connection_params['clickhouse_user']}.{connection_params['clickhouse_database']} "
-                     f"WHERE datetime > NOW() - INTERVAL {int(hours_of_calls_data * 60)} MINUTE AND datetime < NOW()")
-        if not system_is_linux():
-            sql_query = (f"SELECT * FROM "
-                         f"{connection_params['clickhouse_user']}.{connection_params['clickhouse_database']} "
-                         f"ORDER by datetime DESC LIMIT {int(hours_of_calls_data * 3 * 60)}")
-            # query for windows-systems is not accurate. datetime interval part of query should be corrected
+    bucket = bucket_minutes(hours_of_calls_data, query_parameters['buckets'], query_parameters['min_points'])
+    sources_calls = update_sources(sources, query_parameters)
+    if sources_calls is None:
+        return None
+    finest = min(sources_calls[0])
+    tiers_calls = merge_sources(sources_calls, {bucket, finest})
+
+    # data of follower worker is not alerted
+    if alerts_engine is not None and cache_backend.is_leader():
+        with timed('alerts'):
+            alerts_engine.process(tiers_calls[finest], bucket=finest)
+        if cache_backend.shared:
+            cache_backend.set('alerts_firing', alerts_engine.firing(), ttl=2 * refresh_period)
+
+    calls_store = tiers_calls[bucket]
+    if not len(calls_store):
+        return []
+    since = calls_store.last_time - pd.Timedelta(hours=hours_of_calls_data) + pd.Timedelta(minutes=bucket)
+    return calls_store.views(since=since)
 
-        calls_data = get_from_clickhouse(db_usr=connection_params['clickhouse_user'],
-                                         passwd=connection_params['clickhouse_password'],
-                                         clickhouse_url=connection_params['clickhouse_url'],
-                                         sql_query=sql_query)
 
-        calls_dataframe = parse_calls_from_db(calls_data)
+def load_snapshot(hours_of_calls_data=None):
+    """
+    Get data from clickhouse as snapshot
+    :param hours_of_calls_data: time to get data (in hours)
+    :return: Snapshot or None if data was not received
+    """
+    return make_snapshot(hours_of_calls_data, get_data(hours_of_calls_data=hours_of_calls_data))
+
+
+def snapshot_id(snapshot) -> int:
+    """
+    Id of snapshot for browsers (milliseconds of refresh time)
+    """
+    return int(snapshot.refreshed_at.timestamp() * 1000)
+
+
+def stream_event(previous=None, snapshot=None) -> dict:
+    """
+    New data points of snapshot for browsers which show previous snapshot: for every server points since
+    provisional part of previous data replace shown points since that time, points older than start of interval
+    are removed (see assets/stream.js)
+    :param previous: Snapshot shown by browsers
+    :param snapshot: new Snapshot of the same time interval
+    :return: json-serializable dictionary or None if browsers should not be updated
+    """
+    if previous is None or pd.isna(previous.data_until) or pd.isna(snapshot.data_until):
+        return None
+    bucket = query_bucket_minutes(snapshot.hours)
+    overlap_minutes = query_parameters['overlap_minutes']
+    provisional = pd.Timedelta(minutes=bucket * max(1, -(-overlap_minutes // bucket)))
+    previous_last = {data.server: data.last_time for data in previous.servers_data if len(data)}
 
-        servers_data = split_dataframe_by_servers(calls_dataframe)
+    servers = {}
+    for data in snapshot.servers_data:
+        if data.server not in previous_last:
+            continue  # plot of new server is created by servers list callback
+        since = previous_last[data.server] - provisional
+        start = int(np.searchsorted(data.times, int(since.timestamp())))
+        codes = []
+        for code in sorted(data.codes):
+            values = data.values(code)[start:]
+            present = values > 0
+            times = np.datetime_as_string(data.times[start:][present].view('datetime64[s]'), unit='s')
+            codes.append([code, code_label(code), times.tolist(), values[present].astype(float).tolist()])
+        servers[data.server] = {'since': f'{since:%Y-%m-%dT%H:%M:%S}', 'codes': codes}
 
-        if should_replace:
-            servers_data[1], servers_data[2] = servers_data[2], servers_data[1]
+    start = snapshot.data_until - pd.Timedelta(hours=snapshot.hours) + pd.Timedelta(minutes=bucket)
+    return {'hours': snapshot.hours, 'id': snapshot_id(snapshot), 'previous': snapshot_id(previous),
+            'start': f'{start:%Y-%m-%dT%H:%M:%S}', 'status': data_status(snapshot)[0], 'servers': servers}
 
-    return servers_data
+
+# new data points are pushed to opened dashboards
+stream_parameters = get_section_parameters('stream', DEFAULT_STREAM_PARAMETERS)
+broadcaster = Broadcaster(cache_backend, max_subscribers=stream_parameters['max_subscribers'],
+                          queue_size=stream_parameters['queue_size'], keepalive=stream_parameters['keepalive'],
+                          retry_ms=stream_parameters['retry_ms'], ttl=2 * refresh_period) \
+    if stream_parameters['enabled'] else None
+
+
+def publish_snapshot(hours_of_calls_data, snapshot):
+    """
+    Store new snapshot of time interval and send its new points to dashboards which show previous one
+    (event is prepared once for all dashboards)
+    :param hours_of_calls_data: time interval (in hours)
+    :param snapshot: Snapshot
+    """
+    previous = data_cache.get(hours_of_calls_data, allow_stale=True)
+    data_cache.set(hours_of_calls_data, snapshot)
+    if broadcaster is None:
+        return
+    with timed('stream_event'):
+        event = stream_event(previous, snapshot)
+    if event is not None:
+        broadcaster.publish(str(hours_of_calls_data), 'points', event, event_id=event['id'])
+
+
+# background refresh of requested time intervals (should be started by application)
+data_refresher = DataRefresher(loader=load_snapshot, publish=publish_snapshot,
+                               period=refresh_period, idle_timeout=refresher_idle_timeout, backend=cache_backend)
+if alerts_engine is not None:
+    # data is refreshed for alerts even if dashboard is not opened
+    data_refresher.watch(min(bucket['max_hours'] for bucket in query_parameters['buckets']), pinned=True)
+
+
+@timed('snapshot')
+def get_snapshot(hours_of_calls_data=None):
+    """
+    The latest snapshot of servers data (data is refreshed by data_refresher in background;
+    only the first request of time interval waits for data)
+    :param hours_of_calls_data: time to get data (in hours)
+    :return: Snapshot or None if data was never received
+    """
+    data_refresher.watch(hours_of_calls_data)
+    snapshot = data_cache.get(hours_of_calls_data, allow_stale=True)
+    if snapshot is None:
+        snapshot = data_cache.get_or_load(hours_of_calls_data, lambda: load_snapshot(hours_of_calls_data))
+    return snapshot
+
+
+def data_status(snapshot=None) -> tuple:
+    """
+    Text and color of data staleness badge
+    :param snapshot: Snapshot
+    :return: (text, color)
+    """
+    if snapshot is None:
+        return 'No data', 'danger'
+    text = f'Data as of {snapshot.data_until:%H:%M}' if not pd.isna(snapshot.data_until) else 'No calls'
+    if snapshot.age() > 2 * refresh_period:
+        return f'{text} (not updated since {snapshot.refreshed_at:%H:%M})', 'warning'
+    return text, 'secondary'
+
+
+def load_source_servers(connection_params, hours_of_calls_data=None, query_parameters=None) -> list:
+    """
+    Get list of servers of source which have calls data in time interval
+    :param connection_params: clickhouse connection parameters of source
+    :param hours_of_calls_data: time interval (in hours)
+    :param query_parameters: query parameters (see DEFAULT_QUERY_PARAMETERS)
+    :return: list of servers (ClickHouseError is raised if it was not received)
+    """
+    sql_query = servers_query(database=connection_params['clickhouse_user'],
+                              table=connection_params['clickhouse_database'],
+                              hours_of_calls_data=hours_of_calls_data,
+                              parameters=query_parameters)
+    return get_from_clickhouse(db_usr=connection_params['clickhouse_user'],
+                               passwd=connection_params['clickhouse_password'],
+                               clickhouse_url=connection_params['clickhouse_url'],
+                               sql_query=sql_query,
+                               strict=True)
+
+
+@timed('servers_query')
+def load_servers(hours_of_calls_data=None) -> list:
+    """
+    Get list of servers which have calls data in time interval (without calls data itself) from all sources
+    concurrently (sources which do not answer in source_timeout are skipped)
+    :param hours_of_calls_data: time interval (in hours)
+    :return: sorted list of servers or None if no source is available
+    """
+    futures = {connection_params['name']: sources_executor.submit(contextvars.copy_context().run, load_source_servers,
+                                                                  connection_params, hours_of_calls_data,
+                                                                  query_parameters)
+               for connection_params in sources_parameters if database_available(connection_params['name'])}
+    done, _ = wait(futures.values(), timeout=source_timeout)
+
+    servers, received = set(), False
+    for source, future in futures.items():
+        if future not in done:
+            logging.warning(f'{source} source did not answer in {source_timeout} s, its servers are not shown')
+            continue
+        try:
+            servers.update(future.result())
+            received = True
+        except ClickHouseError as error:
+            register_query(source, error)
+    return sorted(servers) if received else None
+
+
+# lists of servers (key is time interval in hours)
+servers_cache = SharedCache('servers', cache_backend, TTLCache(ttl=refresh_period, max_entries=cache_max_entries))
+
+
+def get_servers(hours_of_calls_data=None) -> list:
+    """
+    List of servers to show in order of plots (cached for refresh period)
+    :param hours_of_calls_data: time interval (in hours)
+    :return: list of servers or None if database is not available
+    """
+    servers = servers_cache.get_or_load(hours_of_calls_data, lambda: load_servers(hours_of_calls_data))
+    if servers is None:
+        return None
+
+    servers = sorted(servers)
+    if replace_plots and len(servers) > 2:
+        servers[1], servers[2] = servers[2], servers[1]
+    return servers
+
+
+def server_plot(server=None):
+    """
+    Plot canvas of server
+    :param server: server name
+    :return: dash Graph
+    """
+    return dcc.Graph(figure={}, id={'type': 'calls-plot', 'index': server},
+                     config={'displaylogo': False,
+                             'modeBarButtonsToRemove': ['autoscale', 'lasso2d',
+                                                        'select2d', 'zoomIn',
+                                                        'zoomOut']
+                             }
+                     )
 
 
 def plots_initialization():
     """
-    Get db info at initialization and create canvas
+    Create empty container for plots (plots are added by callback when list of servers is received)
     :return:
     """
-    graphs = []
-    initial_servers_data = get_data(hours_of_calls_data=12)
-    if initial_servers_data:
-        graphs = [dcc.Graph(figure={}, id=f'plot_{n}',
-                            config={'displaylogo': False,
-                                    'modeBarButtonsToRemove': ['autoscale', 'lasso2d',
-                                                               'select2d', 'zoomIn',
-                                                               'zoomOut']
-                                    }
-                            )
-                  for n in range(len(initial_servers_data))]
-    if not graphs:
-        logging.warning("Dashboard plots were not created")
-    return graphs
-
-
-def figure_constructor(data=None):
-    """
-    Make a figure for dashboard
-    :param data: dataframe
+    return [html.Div(id='plots-container', children=[]),
+            dcc.Store(id='servers-list', storage_type='memory')]
+
+
+def code_label(code) -> str:
+    """
+    Label of response code for plots legend
+    :param code: response code
+    :return: label in format 'code <short_description>'
+    """
+    return CODE_LABELS.get(code, code)
+
+
+@timed('figure_build')
+def figure_constructor(data=None, bucket=1, max_points=None, downsampling_method='lttb'):
+    """
+    Make a figure for dashboard (traces are built directly from store columns)
+    :param data: ServerView
+    :param bucket: size of time bucket of data (in minutes)
+    :param max_points: maximum number of points of one response code (series are downsampled to it)
+    :param downsampling_method: 'lttb' or 'min_max' (see library.downsampling)
     :return: one figure (statistics for server)
     """
 
-    server = list(data['server'].unique())[0]
-    codes = list(data.columns[:-2])
-    codes.sort()
+    server = data.server
+    codes = sorted(data.codes)
+
+    time_label = 'Datetime MSK (UTC +03)'
+    calls_label = 'Calls per minute' if bucket == 1 else f'Calls per {bucket} minutes'
+    times = data.datetimes()
 
-    code_labels = {}
+    traces = []
     for code in codes:
-        try:
-            code_labels[code] = f'{code} <{responses_info()[int(code)][0]}>'
-        except (ValueError, KeyError):
-            code_labels[code] = code
-
-    figure = scatter(data, x='time', y=codes,
-                     labels={
-                         'time': 'Datetime MSK (UTC +03)',
-                         'value': 'Calls per minute',
-                         'variable': 'Response code'
-                     })
-    figure.for_each_trace(lambda t: t.update(name=code_labels[t.name],
-                                             legendgroup=code_labels[t.name],
-                                             hovertemplate=t.hovertemplate.replace(t.name, code_labels[t.name])
-                                             )
-                          )
+        label = code_label(code)
+        code_times, code_calls = downsample(times, data.series(code), max_points, method=downsampling_method)
+        traces.append(Scatter(x=code_times, y=code_calls, mode='markers',
+                              name=label, legendgroup=label, showlegend=True,
+                              hovertemplate=f'Response code={label}<br>{time_label}=%{{x}}<br>'
+                                            f'{calls_label}=%{{y}}<extra></extra>'))
+
+    figure = Figure(data=traces)
     figure.update_layout(
         title=dict(text=server, font=dict(size=20), automargin=True),
-        font=dict(size=15)
+        font=dict(size=15),
+        xaxis_title_text=time_label,
+        yaxis_title_text=calls_label,
+        legend=dict(title_text='Response code', tracegroupgap=0),
+        margin=dict(t=60)
     )
 
     return figure
 
 
-def calls_statistics_tables(data=None):
+def figures_constructor(servers_data=None, bucket=1, max_points=None, downsampling_method='lttb') -> list:
+    """
+    Make figures for all servers (construction of plotly objects holds GIL, so threads do not speed it up,
+    see benchmarks/figures_benchmark.py)
+    :param servers_data: list of ServerView
+    :param bucket: size of time bucket of data (in minutes)
+    :param max_points: maximum number of points of one response code (series are downsampled to it)
+    :param downsampling_method: 'lttb' or 'min_max' (see library.downsampling)
+    :return: list of figures
+    """
+    return [figure_constructor(data, bucket=bucket, max_points=max_points, downsampling_method=downsampling_method)
+            for data in servers_data or []]
+
+
+def figures_for_interval(servers_data=None, hours_of_calls_data=None) -> list:
+    """
+    Make figures for all servers with bucket size and downsampling parameters of time interval
+    :param servers_data: list of ServerView
+    :param hours_of_calls_data: time interval of data (in hours)
+    :return: list of figures
+    """
+    return figures_constructor(servers_data,
+                               bucket=query_bucket_minutes(hours_of_calls_data),
+                               max_points=max_points_for_interval(hours_of_calls_data,
+                                                                  downsampling_parameters['max_points']),
+                               downsampling_method=downsampling_parameters['method'])
+
+
+def figure_state(data=None, figure=None, view=None, tail_from=None) -> dict:
+    """
+    Description of figure which was sent to browser (it is needed to update figure partially)
+    :param data: ServerView of figure
+    :param figure: figure
+    :param view: parameters of figure (time interval, hidden codes, snapshot time)
+    :param tail_from: start of provisional part of data (it can be changed by the next refresh)
+    :return: dictionary (json-serializable)
+    """
+    codes = sorted(data.codes)
+    counts = [len(trace.x) for trace in figure.data]
+    tail_seconds = int(tail_from.timestamp())
+    return {
+        'server': data.server,
+        'view': view,
+        'codes': codes,
+        'downsampled': any(count < int(np.count_nonzero(data.values(code))) for code, count in zip(codes, counts)),
+        'counts': counts,
+        'tail_from': str(tail_from),
+        'tails': [int(np.count_nonzero(data.times[data.values(code) > 0] >= tail_seconds)) for code in codes]
+    }
+
+
+@timed('figure_patch')
+def figure_patch(data=None, state=None, view=None, tail_from=None, max_points=None, max_operations=1000):
+    """
+    Partial update of figure which was sent to browser: expired points are removed from the beginning of traces,
+    provisional points (since state['tail_from']) are replaced with the new ones
+    :param data: ServerView of figure
+    :param state: figure state (see figure_state)
+    :param view: parameters of figure (time interval, hidden codes, snapshot time)
+    :param tail_from: start of provisional part of new data
+    :param max_points: maximum number of points of one response code (full figure is downsampled)
+    :param max_operations: maximum number of removed points (full figure is sent instead)
+    :return: (Patch, new state) or (None, None) if full figure should be sent
+    """
+    codes = sorted(data.codes)
+    if (state is None or state['downsampled'] or state['server'] != data.server
+            or state['codes'] != codes or state['view']['hours'] != view['hours']
+            or state['view']['ok_hidden'] != view['ok_hidden']):
+        return None, None
+
+    previous_tail_seconds = int(pd.Timestamp(state['tail_from']).timestamp())
+    tail_seconds = int(tail_from.timestamp())
+    patch = Patch()
+    counts, tails = [], []
+    operations = 0
+    for i, code in enumerate(codes):
+        values = data.values(code)
+        present = values > 0
+        code_times, code_values = data.times[present], values[present]
+        new_start = int(np.searchsorted(code_times, previous_tail_seconds))
+        expired = state['counts'][i] - state['tails'][i] - new_start
+        operations += expired + state['tails'][i]
+        if expired < 0 or operations > max_operations or (max_points and len(code_times) > max_points):
+            return None, None
+
+        for _ in range(expired):
+            del patch['data'][i]['x'][0]
+            del patch['data'][i]['y'][0]
+        for _ in range(state['tails'][i]):
+            del patch['data'][i]['x'][-1]
+            del patch['data'][i]['y'][-1]
+        patch['data'][i]['x'].extend(list(np.datetime_as_string(code_times[new_start:].view('datetime64[s]'),
+                                                                unit='s')))
+        patch['data'][i]['y'].extend(code_values[new_start:].astype(float).tolist())
+
+        counts.append(len(code_times))
+        tails.append(len(code_times) - int(np.searchsorted(code_times, tail_seconds)))
+
+    new_state = dict(state, view=view, counts=counts, tails=tails, tail_from=str(tail_from))
+    return patch, new_state
+
+
+@timed('figures')
+def figures_update(servers_data=None, view=None, plots_state=None) -> tuple:
+    """
+    Figures for all servers: partial updates (Patch) of figures which are already shown in browser
+    and full figures if set of servers or codes, time interval or hidden codes were changed
+    :param servers_data: list of ServerView
+    :param view: parameters of figures ({'hours': time interval, 'ok_hidden': 200 code is hidden,
+                 'refreshed_at': snapshot time})
+    :param plots_state: states of figures which are shown in browser (None to build full figures)
+    :return: (list of figures or patches, list of figures states)
+    """
+    hours_of_calls_data = view['hours']
+    bucket = query_bucket_minutes(hours_of_calls_data)
+    overlap_minutes = query_parameters['overlap_minutes']
+    provisional = pd.Timedelta(minutes=bucket * max(1, -(-overlap_minutes // bucket)))
+    max_points = max_points_for_interval(hours_of_calls_data, downsampling_parameters['max_points'])
+
+    plots_state = plots_state if plots_state and len(plots_state) == len(servers_data) else [None] * len(servers_data)
+    figures, states, rebuild = [], [], []
+    for data, state in zip(servers_data, plots_state):
+        tail_from = data.last_time - provisional
+        if state is not None and state['view'].get('refreshed_at') == view['refreshed_at']:
+            figures.append(no_update)
+            states.append(state)
+            continue
+        patch, new_state = figure_patch(data, state, view=view, tail_from=tail_from, max_points=max_points)
+        if patch is None:
+            rebuild.append(len(figures))
+        figures.append(patch)
+        states.append(new_state)
+
+    full_figures = figures_for_interval([servers_data[i] for i in rebuild], hours_of_calls_data=hours_of_calls_data)
+    for i, figure in zip(rebuild, full_figures):
+        data = servers_data[i]
+        figures[i] = figure
+        states[i] = figure_state(data, figure, view=view, tail_from=data.last_time - provisional)
+
+    return figures, states
+
+
+@timed('statistics')
+def get_statistics(hours_of_calls_data=None, servers_data=None):
+    """
+    Statistics of calls data of time interval: statistics maintained incrementally by rollup tier are used
+    if tier has the same length as interval, otherwise they are calculated from servers data
+    :param hours_of_calls_data: time interval (in hours)
+    :param servers_data: list of ServerView of time interval
+    :return: dataframe (see library.statistics.calls_statistics_table)
+    """
+    bucket = query_bucket_minutes(hours_of_calls_data)
+    if len(calls_tiers) == 1:
+        # statistics of several sources are not merged, they are calculated from data
+        tiers = next(iter(calls_tiers.values()))
+        with tiers.lock:
+            window = tiers.windows.get(bucket)
+            if window is not None and window.hours == hours_of_calls_data and window.calls is not None:
+                return window.statistics.table(hours=servers_hours(window.calls))
+    return calls_statistics_table(CallsStore.from_views(servers_data or []))
+
+
+def calls_statistics_tables(data=None, statistics=None):
     """
     Creates a table with stats by all servers
-    :param data: list of servers dataframes
+    :param data: list of ServerView
+    :param statistics: statistics of servers data (see get_statistics), calculated from data if not set
     :return: dash DataTable
     """
+    if statistics is None:
+        statistics = calls_statistics_table(CallsStore.from_views(data))
     output_layout = []
     for i, dat in enumerate(data):
-        server_name = list(dat['server'].unique())[0]
-        df = pd.DataFrame(dat.describe()).drop(['time'], axis=1)
-        output_layout.append(dbc.Label(server_name))
+        server_name = dat.server
+        df = statistics[statistics['server'] == server_name].drop(['server'], axis=1).round(2)
+        output_layout.append(dbc.Label(server_name, style={'margin-top': '10px'}))
         output_layout.append(
-            dash_table.DataTable(df.to_dict('records'), [{"name": i, "id": i} for i in df.columns], id=f'table_{i}'))
+            dash_table.DataTable(df.to_dict('records'), [{"name": i, "id": i} for i in df.columns], id=f'table_{i}',
+                                 style_header={'backgroundColor': '#303030', 'fontWeight': 'bold'},
+                                 style_cell={'backgroundColor': '#222222', 'color': 'white'}))
     return output_layout
 
 
+def statistics_panel_content(hours_of_calls_data=None) -> list:
+    """
+    Statistics tables of servers for statistics panel
+    :param hours_of_calls_data: time interval (in hours)
+    :return: list of dash components
+    """
+    snapshot = get_snapshot(hours_of_calls_data=hours_of_calls_data)
+    if snapshot is None or not snapshot.servers_data:
+        return [html.Small('No data')]
+    servers_data = list(snapshot.servers_data)
+    return calls_statistics_tables(servers_data, get_statistics(hours_of_calls_data, servers_data))
+
+
 def response_code_button():
     """
     Button to show and hide 200 response codes
@@ -179,6 +921,20 @@ def response_code_button():
     return button
 
 
+def statistics_button():
+    """
+    Button to show and hide statistics tables of servers
+    :return: dash button
+    """
+    button = dbc.Button('Statistics',
+                        outline=True,
+                        color='secondary',
+                        id='statistics-button',
+                        n_clicks=0,
+                        style={'height': '40px', 'width': '200px', "margin-left": "15px"})
+    return button
+
+
 def auto_refresh_button():
     """
     Button to enable and disable page auto-refresh
@@ -198,14 +954,10 @@ def time_interval_dropdown_menu():
     Dropdown menu to choose time interval to show
     :return:
     """
-    dropdown_menu = dcc.Dropdown(value='2d',
-                                 options=[
-                                     {'label': '1 day', 'value': '1d'},
-                                     {'label': '2 days', 'value': '2d'},
-                                     {'label': '1 week', 'value': '7d'},
-                                     {'label': '2 weeks', 'value': '14d'},
-                                     {'label': '1 month', 'value': '30d'}
-                                 ],
+    labels = {'1d': '1 day', '2d': '2 days', '7d': '1 week', '14d': '2 weeks', '30d': '1 month'}
+    dropdown_menu = dcc.Dropdown(value=default_time_interval,
+                                 options=[{'label': labels.get(value, value), 'value': value}
+                                          for value in time_intervals],
                                  clearable=False,
                                  id='time-interval-dropdown-menu',
                                  style={'height': '40px', 'width': '200px', 'color': 'black'})
@@ -214,13 +966,120 @@ def time_interval_dropdown_menu():
 
 def page_auto_refresh(seconds=None):
     """
-    Page auto-refresh functionality
+    Page auto-refresh functionality (with storage of figures states for partial updates of figures)
+    New points of figures are pushed by server-sent events (see assets/stream.js): browser resyncs figures
+    by click of hidden stream-resync button if it missed events (or polls with it if events are not available),
+    stream-snapshot keeps id of snapshot shown in figures
     :return:
     """
     return [dcc.Interval(id='interval-component',
                          interval=seconds * 1000,
                          n_intervals=0,
-                         disabled=False)]
+                         disabled=False),
+            dcc.Store(id='plots-state', storage_type='memory'),
+            html.Button(id='stream-resync', n_clicks=0, style={'display': 'none'}),
+            html.Div(id='stream-snapshot', style={'display': 'none'}),
+            dcc.Store(id='stream-connection', storage_type='memory')]
+
+
+def data_status_badge():
+    """
+    Badge with time of the latest data
+    :return: dash badge
+    """
+    badge = dbc.Badge('Loading...',
+                      color='secondary',
+                      id='data-status',
+                      style={'height': '40px', 'line-height': '30px', "margin-left": "15px", 'width': 'auto'})
+    return badge
+
+
+def database_health_badge():
+    """
+    Badge with state of database and latency of its health probes
+    :return: dbc Badge
+    """
+    badge = dbc.Badge('Database',
+                      color='secondary',
+                      id='database-health',
+                      style={'height': '40px', 'line-height': '30px', "margin-left": "15px", 'width': 'auto'})
+    return badge
+
+
+def format_seconds(seconds) -> str:
+    return f'{seconds * 1000:.0f} ms' if seconds < 1 else f'{seconds:.1f} s'
+
+
+def source_health_text(health) -> str:
+    """
+    State of source for database health badge
+    :param health: status of health monitor (see HealthMonitor.status)
+    :return: text
+    """
+    latency = health['latency']
+    if health['status'] == 'down':
+        checked = f", checked at {health['checked_at']:%H:%M:%S}" if health['checked_at'] else ''
+        return f'unavailable{checked}'
+    if health['status'] == 'unknown':
+        return 'not checked yet'
+    text = f'p50 {format_seconds(latency[0.5])}, p95 {format_seconds(latency[0.95])}'
+    return f'{text} (slow)' if health['status'] == 'slow' else text
+
+
+def database_health_content() -> tuple:
+    """
+    Text and color of database health badge (color of the worst source)
+    :return: (text, color)
+    """
+    if not health_monitors:
+        return 'Database is not monitored', 'secondary'
+    statuses = {source: monitor.status() for source, monitor in health_monitors.items()}
+    if len(statuses) == 1:
+        text = f'Database {source_health_text(next(iter(statuses.values())))}'
+    else:
+        text = '; '.join(f'{source}: {source_health_text(health)}' for source, health in statuses.items())
+    worst = min((health['status'] for health in statuses.values()), key=['down', 'slow', 'unknown', 'ok'].index)
+    return text, {'down': 'danger', 'slow': 'warning', 'unknown': 'secondary', 'ok': 'success'}[worst]
+
+
+def alerts_panel():
+    """
+    Panel with firing alerts
+    :return: dash Div
+    """
+    return html.Div(id='alerts-panel', children=[],
+                    style={'margin-top': '15px', 'margin-left': '20px', 'margin-right': '20px'})
+
+
+def statistics_panel():
+    """
+    Panel with statistics tables of servers (hidden until statistics button is clicked)
+    :return: dbc Collapse
+    """
+    return dbc.Collapse(id='statistics-panel', is_open=False, children=[],
+                        style={'margin-top': '15px', 'margin-left': '20px', 'margin-right': '20px'})
+
+
+def alerts_panel_content(max_alerts=10) -> list:
+    """
+    Firing alerts for alerts panel
+    :param max_alerts: maximum number of shown alerts
+    :return: list of dash components
+    """
+    if alerts_engine is None:
+        return []
+    if cache_backend.shared:
+        # alerts are evaluated by the leader worker
+        entry = cache_backend.get('alerts_firing')
+        firing = entry[0] if entry is not None else []
+    else:
+        firing = alerts_engine.firing()
+    content = [dbc.Alert(f'{alert.time[:16]} {alert.message}', color='danger',
+                         style={'padding': '5px 10px', 'margin-bottom': '5px'})
+               for alert in firing[:max_alerts]]
+    if len(firing) > max_alerts:
+        content.append(html.Small(f'and {len(firing) - max_alerts} more alerts'))
+    return content
 
 
 def user_interface():
@@ -233,8 +1092,13 @@ def user_interface():
             [
                 auto_refresh_button(),
                 response_code_button(),
-                time_interval_dropdown_menu()
+                statistics_button(),
+                time_interval_dropdown_menu(),
+                data_status_badge(),
+                database_health_badge()
             ], style={'margin-top': '15px', 'margin-left': '20px'}
-        )
+        ),
+        alerts_panel(),
+        statistics_panel()
     ]
     return interface_elements
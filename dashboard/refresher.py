@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+import pandas as pd
+
+
+class Snapshot(NamedTuple):
+    """
+    Immutable result of one data refresh (servers data should not be changed by consumers)
+    """
+    hours: int
+    servers_data: tuple
+    refreshed_at: datetime
+    data_until: pd.Timestamp
+
+    def age(self) -> float:
+        """
+        Seconds since refresh
+        """
+        return (datetime.now() - self.refreshed_at).total_seconds()
+
+
+def make_snapshot(hours, servers_data):
+    """
+    Wrap servers data to snapshot
+    :param hours: time interval of data (in hours)
+    :param servers_data: list of ServerView (None if data was not received)
+    :return: Snapshot or None
+    """
+    if servers_data is None:
+        return None
+    data_until = max((data.last_time for data in servers_data if len(data)), default=pd.NaT)
+    return Snapshot(hours=hours, servers_data=tuple(servers_data), refreshed_at=datetime.now(), data_until=data_until)
+
+
+class DataRefresher(threading.Thread):
+    """
+    Background thread which refreshes data of watched time intervals on a fixed cadence
+    and publishes snapshots (callbacks only read the latest published snapshot)
+    """
+
+    def __init__(self, loader, publish, period, idle_timeout, backend=None, poll_period=1.0):
+        """
+        :param loader: function (hours) -> Snapshot or None
+        :param publish: function (hours, snapshot) to store new snapshot
+        :param period: seconds between refreshes
+        :param idle_timeout: interval is not refreshed if it was not requested for this time (seconds)
+        :param backend: cache backend shared by worker processes (requests of intervals are shared through it,
+                        data is refreshed only by the leader process)
+        :param poll_period: seconds between checks of intervals requested by other workers
+        """
+        super().__init__(name='data-refresher', daemon=True)
+        self.loader = loader
+        self.publish = publish
+        self.period = period
+        self.idle_timeout = idle_timeout
+        self.backend = backend if backend is not None and backend.shared else None
+        self.poll_period = poll_period
+        self._watched = {}  # hours -> time of the last request
+        self._shared_marks = {}  # hours -> time of the last request mark in shared backend
+        self._lock = threading.Lock()
+
+    def watch(self, hours, pinned=False):
+        """
+        Mark time interval as requested by dashboard (it will be refreshed in background)
+        :param hours: time interval (in hours)
+        :param pinned: refresh interval even if it is not requested (e.g. for alerts)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._watched[hours] = float('inf') if pinned else max(now, self._watched.get(hours, 0.0))
+            mark = self.backend is not None and not pinned and \
+                now - self._shared_marks.get(hours, -float('inf')) > self.period / 2
+            if mark:
+                self._shared_marks[hours] = now
+        if mark:
+            self.backend.set(f'watch_{hours}', hours, ttl=self.idle_timeout)
+
+    def intervals(self) -> list:
+        """
+        Time intervals which should be refreshed (requested in this process or in other workers)
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [hours for hours, requested in self._watched.items() if now - requested > self.idle_timeout]
+            for hours in expired:
+                del self._watched[hours]
+            intervals = set(self._watched)
+        if self.backend is not None:
+            intervals.update(hours for hours, created_at in self.backend.items('watch_').values()
+                             if time.time() - created_at <= self.idle_timeout)
+        return sorted(intervals)
+
+    def leading(self) -> bool:
+        """
+        Data is refreshed by this process (the only process or the leader of worker processes)
+        """
+        return self.backend is None or self.backend.is_leader()
+
+    def refresh(self, hours):
+        """
+        Load and publish snapshot of time interval
+        :param hours: time interval (in hours)
+        :return: new snapshot or None if data was not received
+        """
+        start = time.monotonic()
+        try:
+            snapshot = self.loader(hours)
+        except Exception:
+            logging.exception(f'Refresh of {hours}h interval failed')
+            snapshot = None
+        if snapshot is not None:
+            self.publish(hours, snapshot)
+            logging.debug(f'{hours}h interval refreshed in {time.monotonic() - start:.2f} s')
+        return snapshot
+
+    def run(self):
+        while True:
+            started = time.monotonic()
+            refreshed = set()
+            if self.leading():
+                for hours in self.intervals():
+                    self.refresh(hours)
+                    refreshed.add(hours)
+
+            # intervals requested by other workers for the first time are refreshed without waiting for period
+            while (remaining := self.period - (time.monotonic() - started)) > 0:
+                time.sleep(min(self.poll_period, remaining) if self.backend is not None else remaining)
+                if self.backend is not None and self.leading():
+                    for hours in self.intervals():
+                        if hours not in refreshed:
+                            self.refresh(hours)
+                            refreshed.add(hours)
@@ -1,49 +1,102 @@
+import hashlib
 import os
-from flask import Flask
-from flaskapp.visualization import all_servers_plot, publish_plot
+
+import yaml
+from flask import Flask, Response, request
+
+from flaskapp.visualization import all_servers_plot, publish_plot, page_template, render_png, image_etag
+from library.cache import TTLCache
 from library.parsing import get_from_clickhouse, parse_calls_from_db
-from library.methods import system_is_linux
-from parameters import *
+from library.queries import calls_query
+from parameters.dashboard_parameters import config_file_path, refresh_period
 
 host = '0.0.0.0'
 port = 5004
 
-workdir = os.path.dirname(os.path.realpath(__file__))
+workdir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 html_page = os.path.join(workdir, 'assets', 'index.html')
 
+with open(config_file_path) as f:
+    connection_parameters = yaml.safe_load(f)['clickhouse']
+
 # SQL-QUERY TO GET CALLS DATA
 hours_of_calls_data = 48  # hours
-sql_query = f"YOUR SQL QUERY"
-if not system_is_linux():
-    sql_query = f"YOUR SQL QUERY FOR WINDOWS"
-    # query for windows-systems is not accurate. datetime interval part of query should be corrected
+sql_query = calls_query(database=connection_parameters['clickhouse_user'],
+                        table=connection_parameters['clickhouse_database'],
+                        hours_of_calls_data=hours_of_calls_data)
 
 app = Flask(__name__)
 
+# page is parsed once, only source of image is changed for every answer
+template = page_template(html_page)
+
+# the latest calls data: (version, dataframe), version is a hash of database answer
+data_cache = TTLCache(ttl=refresh_period, max_entries=1)
+# PNG images of plots: (data version, 200 code is removed) -> (image, etag)
+images_cache = TTLCache(ttl=float('inf'), max_entries=4)
+
+
+def load_calls_data():
+    calls_data = get_from_clickhouse(db_usr=connection_parameters['clickhouse_user'],
+                                     passwd=connection_parameters['clickhouse_password'],
+                                     clickhouse_url=connection_parameters['clickhouse_url'],
+                                     sql_query=sql_query)
+    version = hashlib.blake2b('\n'.join(calls_data).encode(), digest_size=16).hexdigest()
+    return version, parse_calls_from_db(calls_data)
+
 
 # Aggregator of all methods to create a static picture of calls statistics
 # Uses library methods
-def create_calls_statistics_plot(ok_code_should_be_removed):
-    calls_data = get_from_clickhouse(db_usr=db_usr,
-                                     passwd=passwd,
-                                     clickhouse_url=clickhouse_url,
-                                     sql_query=sql_query)
+def calls_statistics_image(ok_code_should_be_removed):
+    """
+    PNG image of plots: database is queried once per refresh period for both variants of image,
+    image is rendered only if data was changed
+    :param ok_code_should_be_removed: plot without 200 code
+    :return: (image, etag)
+    """
+    version, calls_dataframe = data_cache.get_or_load('calls', load_calls_data)
 
-    calls_dataframe = parse_calls_from_db(calls_data)
-    statistics_figure = all_servers_plot(calls_dataframe, remove_ok_code=ok_code_should_be_removed)
-    return statistics_figure
+    def render():
+        image = render_png(all_servers_plot(calls_dataframe, remove_ok_code=ok_code_should_be_removed))
+        return image, image_etag(image)
+
+    return images_cache.get_or_load((version, ok_code_should_be_removed), render)
+
+
+def plot_page(ok_code_should_be_removed, image_name):
+    _, etag = calls_statistics_image(ok_code_should_be_removed)
+    response = Response(publish_plot(f'{image_name}?v={etag}', template), mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def plot_image(ok_code_should_be_removed):
+    image, etag = calls_statistics_image(ok_code_should_be_removed)
+    response = Response(image, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/', methods=['GET'])
 def plot_all():
-    figure = create_calls_statistics_plot(ok_code_should_be_removed=False)
-    return publish_plot(figure, html_page)
+    return plot_page(ok_code_should_be_removed=False, image_name='plot.png')
 
 
 @app.route('/nook', methods=['GET'])
 def plot_without_ok():
-    figure = create_calls_statistics_plot(ok_code_should_be_removed=True)
-    return publish_plot(figure, html_page)
+    return plot_page(ok_code_should_be_removed=True, image_name='nook.png')
+
+
+@app.route('/plot.png', methods=['GET'])
+def image_all():
+    return plot_image(ok_code_should_be_removed=False)
+
+
+@app.route('/nook.png', methods=['GET'])
+def image_without_ok():
+    return plot_image(ok_code_should_be_removed=True)
 
 
 if __name__ == '__main__':
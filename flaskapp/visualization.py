@@ -1,19 +1,38 @@
+import hashlib
 import numpy as np
-import base64
+from functools import lru_cache
 from io import BytesIO
-from library.methods import calls_statistics, responses_info
+from library.methods import responses_info
+from library.statistics import calls_statistics_table
+from library.store import CallsStore
 from bs4 import BeautifulSoup as bs
 
 import matplotlib
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.ticker import MaxNLocator
 
 matplotlib.use('Agg')
 
+IMAGE_PLACEHOLDER = '__plot_image_source__'
+
+
+@lru_cache(maxsize=8)
+def codes_colors(colormap='RdYlGn_r') -> dict:
+    """
+    Colors of all known response codes (colormap is built once)
+    :param colormap: name of matplotlib colormap
+    :return: dictionary code -> (label, color)
+    """
+    responses_dict = responses_info()
+    cmap = matplotlib.colormaps[colormap].resampled(len(responses_dict))
+    return {str(code): (f'{code} <{description[0]}>', cmap(number))
+            for number, (code, description) in enumerate(responses_dict.items())}
+
 
 def one_server_plot(dataframe, axis, unique_codes, server, remove_ok_code=None,
-                    colormap='RdYlGn_r'):
+                    colormap='RdYlGn_r', statistics=None):
     """
     Plot calls of one server
     :param dataframe: full_dataframe
@@ -22,36 +41,37 @@ def one_server_plot(dataframe, axis, unique_codes, server, remove_ok_code=None,
     :param server: server name to plot
     :param remove_ok_code: should 200 code be removed
     :param colormap: to color different codes
+    :param statistics: statistics of server codes (see library.statistics.calls_statistics_table),
+                       calculated from dataframe if not set
     """
-    responses_dict = responses_info()
-    responses_codes = [str(code) for code in list(responses_dict.keys())]
+    colors = codes_colors(colormap)
 
-    cmap = plt.cm.get_cmap(colormap, len(responses_codes))
+    if statistics is None:
+        statistics = calls_statistics_table(CallsStore.from_frame(dataframe))
+    statistics = statistics[statistics['server'] == server].set_index('code')
 
     unique_codes_ = unique_codes.copy()
-    if remove_ok_code:
+    if remove_ok_code and '200' in unique_codes_:
         unique_codes_.remove('200')
 
     for code in sorted(unique_codes_):
-        if dataframe[code].max() < 1:
+        if code not in statistics.index:
             continue
 
-        try:
-            label_code = f'{code} <{responses_dict[int(code)][0]}>'
-            color = cmap(responses_codes.index(code))
-        except ValueError:
-            label_code = code
-            color = 'grey'
+        label_code, color = colors.get(code, (code, 'grey'))
 
-        calls_max, _, calls_mean, _, calls_sum = calls_statistics(dataframe, code)
+        calls_max = int(statistics.at[code, 'max'])
+        calls_mean = int(statistics.at[code, 'mean'])
+        calls_sum = round(statistics.at[code, 'hourly_rate'], 2)
 
         legend_additional_info = f' ({calls_sum} times per hour)' if code != '200' else f' | MEAN: {calls_mean}'
         plot_label = f'Response: {label_code} \nMAX: {calls_max}' + legend_additional_info
 
+        # markers of one line are drawn much faster than scatter collection of the same points
         axis.plot(dataframe['time'], dataframe[code], alpha=0.15, color=color)
-        axis.scatter(dataframe['time'], dataframe[code],
-                     marker='.', s=15, edgecolor=color, color='white',
-                     label=plot_label)
+        axis.plot(dataframe['time'], dataframe[code], linestyle='none',
+                  marker='.', markersize=np.sqrt(15), markeredgecolor=color, markerfacecolor='white',
+                  label=plot_label)
 
     if unique_codes and not remove_ok_code:
         axis.set_ylim(ymin=1)
@@ -83,7 +103,10 @@ def all_servers_plot(calls_dataframe, remove_ok_code=False):
 
     n_servers = len(servers)
     n_cols = 1
-    figure, axes = plt.subplots(ncols=n_cols, nrows=n_servers, figsize=(18, 8))
+    # figure is not registered in pyplot: figures can be rendered in parallel requests and are freed with objects
+    figure = Figure(figsize=(18, 8))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(ncols=n_cols, nrows=max(n_servers, 1))
 
     try:
         axes = axes.flatten()
@@ -91,38 +114,56 @@ def all_servers_plot(calls_dataframe, remove_ok_code=False):
         axes = np.array([axes])
 
     servers = sorted(servers)
+    # statistics of all servers and codes are calculated at once
+    statistics = calls_statistics_table(CallsStore.from_frame(calls_dataframe))
 
     for i, server in enumerate(servers):
         server_df = calls_dataframe[calls_dataframe['server'] == server]
-        one_server_plot(server_df, axes[i], codes, server, remove_ok_code=remove_ok_code)
+        one_server_plot(server_df, axes[i], codes, server, remove_ok_code=remove_ok_code, statistics=statistics)
 
     figure.tight_layout()
 
     return figure
 
 
-def publish_plot(fig, html_page) -> str:
+def render_png(figure) -> bytes:
     """
-    Add plot to html-parsed page
-    :param fig: figure of plots
-    :param html_page:
-    :return: html-page in string format
+    Render figure to PNG image
+    :param figure: matplotlib figure
+    :return: PNG data
     """
     buf = BytesIO()
+    figure.savefig(buf, format="png")
+    return buf.getvalue()
 
-    fig.savefig(buf, format="png")
-    plt.clf()
-    plt.close()
 
-    plot_data = base64.b64encode(buf.getbuffer()).decode("ascii")
+def image_etag(image) -> str:
+    """
+    ETag of image (hash of its data)
+    """
+    return hashlib.blake2b(image, digest_size=16).hexdigest()
+
 
+def page_template(html_page) -> str:
+    """
+    Parse html page once: source of its images is replaced with placeholder (see publish_plot)
+    :param html_page: path to html page
+    :return: html-page in string format
+    """
     with open(html_page, 'r') as page:
-        html_doc = page.read()
-    page.close()
-
-    modified_data = bs(html_doc, 'html.parser')
+        modified_data = bs(page.read(), 'html.parser')
 
-    for tag in modified_data.findAll("img"):
-        tag['src'] = f"data:image/png;base64,{plot_data}"  # f"<img src='data:image/png;base64,{plot_data}'/>"
+    for tag in modified_data.find_all("img"):
+        tag['src'] = IMAGE_PLACEHOLDER
 
     return str(modified_data)
+
+
+def publish_plot(image_url, template) -> str:
+    """
+    Add plot to html page
+    :param image_url: url of PNG image of plots
+    :param template: page template (see page_template)
+    :return: html-page in string format
+    """
+    return template.replace(IMAGE_PLACEHOLDER, image_url)
@@ -0,0 +1,29 @@
+"""
+Parameters of gunicorn server (host, port and number of workers are taken from parameters/application.yml)
+"""
+import yaml
+
+from parameters.dashboard_parameters import config_file_path
+
+with open(config_file_path) as f:
+    _parameters = yaml.safe_load(f)
+_webapp = _parameters.get('webapp') or {}
+
+bind = f"{_webapp.get('app_host') or '0.0.0.0'}:{_webapp.get('app_port') or 8050}"
+workers = int(_webapp.get('workers') or 4)
+threads = int(_webapp.get('threads') or 4)
+_stream = _parameters.get('stream') or {}
+if _stream.get('enabled', True):
+    # every subscriber of server-sent events keeps its connection (and thread of worker) open
+    threads += int(_stream.get('max_subscribers') or 64)
+worker_class = 'gthread'
+timeout = 120  # the first request of long time interval waits for data
+graceful_timeout = 30
+# application is imported by every worker: each one has its own data refresher thread
+preload_app = False
+
+
+def on_starting(server):
+    if workers > 1 and ((_parameters.get('cache') or {}).get('backend') or 'memory') == 'memory':
+        server.log.warning('In-memory cache is not shared, every gunicorn worker queries database '
+                           '(set cache backend to filesystem or redis)')
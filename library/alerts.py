@@ -0,0 +1,309 @@
+import json
+import logging
+import math
+import queue
+import threading
+import urllib.request
+from collections import deque
+from typing import NamedTuple
+
+import pandas as pd
+
+DEFAULT_ALERTS_PARAMETERS = {
+    'enabled': False,
+    'file': None,
+    'webhook_url': None,
+    'history_points': 120,
+    'rules': [
+        {'name': '5xx spike', 'type': 'zscore', 'codes': ['5xx'], 'z': 4, 'alpha': 0.05, 'min_calls': 5},
+        {'name': '503 rate', 'type': 'threshold', 'codes': ['503'], 'max_calls': 50},
+        {'name': '4xx/5xx ratio', 'type': 'error_ratio', 'codes': ['4xx', '5xx'], 'max_ratio': 0.5,
+         'min_calls': 20},
+    ]
+}
+
+
+class Alert(NamedTuple):
+    """
+    Change of alert state of rule for server and response code
+    """
+    rule: str
+    server: str
+    code: str
+    time: str
+    state: str  # 'firing' or 'resolved'
+    value: float
+    message: str
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def code_matches(code, pattern) -> bool:
+    """
+    Checks if response code matches pattern: exact code ('503') or class of codes ('5xx')
+    """
+    pattern = str(pattern)
+    if pattern.endswith('xx') and len(pattern) == 3:
+        return len(code) == 3 and code[0] == pattern[0]
+    return code == pattern
+
+
+class StreamingStatistics:
+    """
+    Exponentially weighted mean and variance (O(1) time and memory per point)
+    """
+
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+
+    def zscore(self, value) -> float:
+        """
+        Deviation of value from current mean in standard deviations (0 if variance is unknown)
+        """
+        if self.count < 2 or self.variance <= 0:
+            return 0.0
+        return (value - self.mean) / math.sqrt(self.variance)
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = float(value)
+        else:
+            difference = value - self.mean
+            increment = self.alpha * difference
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + difference * increment)
+        self.count += 1
+
+
+class ThresholdRule:
+    """
+    Calls of response code per minute are above max_calls
+    """
+
+    def __init__(self, name, codes, max_calls, severity='warning'):
+        self.name = name
+        self.codes = [str(code) for code in codes]
+        self.max_calls = float(max_calls)
+        self.severity = severity
+
+    def evaluate(self, key, value, ok_value) -> tuple:
+        """
+        :param key: (server, code)
+        :param value: calls of code per minute
+        :param ok_value: calls of 200 code per minute
+        :return: (condition is met, value to report, description)
+        """
+        return value > self.max_calls, value, f'{value:.0f} calls/min > {self.max_calls:.0f}'
+
+
+class ZScoreRule:
+    """
+    Calls of response code per minute deviate from exponentially weighted mean by more than z standard deviations
+    """
+
+    def __init__(self, name, codes, z=4.0, alpha=0.05, min_calls=0, warmup=30, severity='warning'):
+        self.name = name
+        self.codes = [str(code) for code in codes]
+        self.z = float(z)
+        self.alpha = float(alpha)
+        self.min_calls = float(min_calls)
+        self.warmup = int(warmup)
+        self.severity = severity
+        self._statistics = {}
+
+    def evaluate(self, key, value, ok_value) -> tuple:
+        statistics = self._statistics.get(key)
+        if statistics is None:
+            statistics = self._statistics[key] = StreamingStatistics(self.alpha)
+        zscore = statistics.zscore(value)
+        firing = statistics.count >= self.warmup and value >= self.min_calls and zscore > self.z
+        description = f'{value:.0f} calls/min, {zscore:.1f} sigma above mean {statistics.mean:.1f}'
+        statistics.update(value)
+        return firing, value, description
+
+
+class ErrorRatioRule:
+    """
+    Ratio of calls of response code to calls of 200 code is above max_ratio
+    """
+
+    def __init__(self, name, codes, max_ratio=0.5, min_calls=0, severity='warning'):
+        self.name = name
+        self.codes = [str(code) for code in codes]
+        self.max_ratio = float(max_ratio)
+        self.min_calls = float(min_calls)
+        self.severity = severity
+
+    def evaluate(self, key, value, ok_value) -> tuple:
+        ratio = value / ok_value if ok_value > 0 else math.inf
+        firing = value >= self.min_calls and ratio > self.max_ratio
+        return firing, ratio, f'{value:.0f} calls/min, {ratio:.2f} of 200 calls > {self.max_ratio:.2f}'
+
+
+RULES = {'threshold': ThresholdRule, 'zscore': ZScoreRule, 'error_ratio': ErrorRatioRule}
+
+
+def make_rule(parameters):
+    """
+    Rule from parameters ({'type': 'threshold' | 'zscore' | 'error_ratio', 'name': ..., 'codes': [...], ...})
+    :return: rule or None if parameters are wrong
+    """
+    parameters = dict(parameters)
+    rule_type = parameters.pop('type', None)
+    try:
+        return RULES[rule_type](**parameters)
+    except (KeyError, TypeError, ValueError) as error:
+        logging.error(f"Alert rule {parameters.get('name')} is ignored: wrong parameters ({error})")
+        return None
+
+
+class MemorySink:
+    """
+    Keeps recent alerts in memory (for dashboard and tests)
+    """
+
+    def __init__(self, max_alerts=100):
+        self.alerts = deque(maxlen=max_alerts)
+
+    def emit(self, alerts):
+        self.alerts.extend(alerts)
+
+
+class FileSink:
+    """
+    Appends alerts to file (one json per line)
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, alerts):
+        try:
+            with open(self.path, 'a') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert.to_dict()) + '\n')
+        except OSError as error:
+            logging.error(f'Alerts were not written to {self.path}: {error}')
+
+
+class WebhookSink:
+    """
+    Sends alerts to webhook (json POST request with list of alerts) from background thread
+    """
+
+    def __init__(self, url, timeout=5.0, max_queue=100):
+        self.url = url
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._send_forever, name='alerts-webhook', daemon=True).start()
+
+    def emit(self, alerts):
+        try:
+            self._queue.put_nowait([alert.to_dict() for alert in alerts])
+        except queue.Full:
+            logging.error(f'Alerts were not sent to {self.url}: queue is full')
+
+    def _send_forever(self):
+        while True:
+            alerts = self._queue.get()
+            request = urllib.request.Request(self.url, data=json.dumps(alerts).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'}, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    response.read()
+            except OSError as error:
+                logging.error(f'Alerts were not sent to {self.url}: {error}')
+
+
+class AlertsEngine:
+    """
+    Evaluates alert rules for every server and response code on new points of calls data
+    and sends changes of alerts states to sinks
+    """
+
+    def __init__(self, rules, sinks=(), history_points=120):
+        """
+        :param rules: list of rules (see make_rule)
+        :param sinks: list of objects with emit(alerts) method
+        :param history_points: number of points which are used to warm up rules when server appears
+                               (alerts are not sent for them)
+        """
+        self.rules = [rule for rule in rules if rule is not None]
+        self.sinks = list(sinks)
+        self.history_points = history_points
+        self.active = {}  # (rule, server, code) -> firing Alert
+        self._last_time = {}  # server -> the last evaluated time (epoch seconds)
+        self._lock = threading.Lock()
+
+    def process(self, calls, bucket=1) -> list:
+        """
+        Evaluate rules on points which were not evaluated yet (the newest incomplete bucket of server is skipped)
+        :param calls: CallsStore
+        :param bucket: size of time bucket of data (in minutes), calls are compared per minute
+        :return: list of Alert (changes of states)
+        """
+        alerts = []
+        with self._lock:
+            rules_columns = [(rule, [(code, calls.code_index[code]) for code in calls.codes
+                                     if any(code_matches(code, pattern) for pattern in rule.codes)])
+                             for rule in self.rules]
+            ok_column = calls.code_index.get('200')
+
+            for server, (start, stop) in calls.offsets.items():
+                end = stop - 1
+                last_time = self._last_time.get(server)
+                if last_time is None:
+                    begin, replay = max(start, end - self.history_points), True
+                else:
+                    begin = start + int(calls.times[start:end].searchsorted(last_time, side='right'))
+                    replay = False
+                if begin >= end:
+                    continue
+
+                for row in range(begin, end):
+                    time_point = calls.times[row]
+                    ok_value = calls.counts[row, ok_column] / bucket if ok_column is not None else 0.0
+                    for rule, columns in rules_columns:
+                        for code, column in columns:
+                            value = calls.counts[row, column] / bucket
+                            firing, reported, description = rule.evaluate((server, code), value, ok_value)
+                            alert = self._transition(rule, server, code, time_point, firing, reported, description)
+                            if alert is not None and not replay:
+                                alerts.append(alert)
+                self._last_time[server] = int(calls.times[end - 1])
+
+        if alerts:
+            for sink in self.sinks:
+                sink.emit(alerts)
+        return alerts
+
+    def _transition(self, rule, server, code, time_point, firing, value, description):
+        """
+        Update alert state
+        :return: Alert if state was changed
+        """
+        key = (rule.name, server, code)
+        if firing == (key in self.active):
+            return None
+
+        alert = Alert(rule=rule.name, server=server, code=code,
+                      time=str(pd.Timestamp(int(time_point), unit='s')),
+                      state='firing' if firing else 'resolved', value=float(value),
+                      message=f'[{rule.severity}] {rule.name}: {server} {code} - {description}')
+        if firing:
+            self.active[key] = alert
+            logging.warning(alert.message)
+        else:
+            del self.active[key]
+        return alert
+
+    def firing(self) -> list:
+        """
+        Alerts which are firing now
+        """
+        with self._lock:
+            return sorted(self.active.values(), key=lambda alert: alert.time, reverse=True)
@@ -0,0 +1,328 @@
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on windows: every process is a leader
+    fcntl = None
+
+DEFAULT_CACHE_PARAMETERS = {
+    'backend': 'memory',
+    'directory': 'cache/shared',
+    'redis_url': 'redis://127.0.0.1:6379/0',
+    'wait_seconds': 15,
+}
+
+
+class MemoryBackend:
+    """
+    Backend of one process (data is not shared between workers, every process is a leader)
+    """
+    shared = False
+
+    def __init__(self):
+        self._entries = {}  # key -> (value, created_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: (value, created_at as epoch seconds) or None if absent
+        """
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self, prefix) -> dict:
+        """
+        Entries which keys start with prefix
+        :return: dictionary key -> (value, created_at)
+        """
+        with self._lock:
+            return {key: entry for key, entry in self._entries.items() if key.startswith(prefix)}
+
+    def is_leader(self) -> bool:
+        return True
+
+
+class FilesystemBackend:
+    """
+    Backend shared by processes of one host: entries are pickled to files of directory,
+    leader holds exclusive lock of leader file (lock is released by system when leader process exits)
+    """
+    shared = True
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._leader_file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key.replace(os.sep, '_') + '.pickle')
+
+    def get(self, key):
+        """
+        :return: (value, created_at as epoch seconds) or None if absent or expired
+        """
+        try:
+            with open(self._path(key), 'rb') as f:
+                value, created_at, expires_at = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as error:
+            logging.error(f'Cache entry {key} was not read: {error}')
+            return None
+        if expires_at is not None and time.time() > expires_at:
+            return None
+        return value, created_at
+
+    def set(self, key, value, ttl=None):
+        """
+        Write entry atomically (readers get either previous or new value)
+        :param ttl: seconds to keep entry (None to keep forever)
+        """
+        now = time.time()
+        try:
+            file, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(file, 'wb') as f:
+                pickle.dump((value, now, now + ttl if ttl else None), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self._path(key))
+        except OSError as error:
+            logging.error(f'Cache entry {key} was not written: {error}')
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def items(self, prefix) -> dict:
+        entries = {}
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix) and filename.endswith('.pickle'):
+                key = filename[:-len('.pickle')]
+                entry = self.get(key)
+                if entry is not None:
+                    entries[key] = entry
+        return entries
+
+    def is_leader(self) -> bool:
+        """
+        Try to become a leader (non-blocking)
+        """
+        if fcntl is None:
+            return True
+        with self._lock:
+            if self._leader_file is not None:
+                return True
+            leader_file = open(os.path.join(self.directory, 'leader.lock'), 'a')
+            try:
+                fcntl.flock(leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                leader_file.close()
+                return False
+            self._leader_file = leader_file
+            logging.info(f'Process {os.getpid()} is a leader of shared cache (it refreshes data)')
+            return True
+
+
+class RedisBackend:
+    """
+    Backend shared by processes and hosts through Redis (or Redis-compatible server, e.g. KeyDB or Valkey),
+    leader holds key with expiration which it prolongs
+    """
+    shared = True
+
+    def __init__(self, url, namespace='calls_visualizer', leader_ttl=180):
+        """
+        :param url: server url (redis://host:port/db)
+        :param namespace: prefix of keys
+        :param leader_ttl: seconds to keep leadership of process which stopped prolonging it
+        """
+        import redis  # optional dependency: required only for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.leader_ttl = leader_ttl
+        self._identity = f'{os.getpid()}-{uuid.uuid4().hex}'
+        self._errors = (redis.RedisError, pickle.UnpicklingError, EOFError)
+
+    def _key(self, key) -> str:
+        return f'{self.namespace}:{key}'
+
+    def get(self, key):
+        try:
+            data = self.client.get(self._key(key))
+            return pickle.loads(data) if data is not None else None
+        except self._errors as error:
+            logging.error(f'Cache entry {key} was not read: {error}')
+            return None
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(self._key(key), pickle.dumps((value, time.time()), protocol=pickle.HIGHEST_PROTOCOL),
+                            ex=int(ttl) if ttl else None)
+        except self._errors as error:
+            logging.error(f'Cache entry {key} was not written: {error}')
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key))
+        except self._errors as error:
+            logging.error(f'Cache entry {key} was not deleted: {error}')
+
+    def items(self, prefix) -> dict:
+        entries = {}
+        try:
+            keys = list(self.client.scan_iter(match=self._key(prefix) + '*'))
+        except self._errors as error:
+            logging.error(f'Cache entries were not listed: {error}')
+            return entries
+        for full_key in keys:
+            key = full_key.decode()[len(self.namespace) + 1:]
+            entry = self.get(key)
+            if entry is not None:
+                entries[key] = entry
+        return entries
+
+    def is_leader(self) -> bool:
+        key = self._key('leader')
+        try:
+            if self.client.set(key, self._identity, nx=True, ex=self.leader_ttl):
+                logging.info(f'Process {os.getpid()} is a leader of shared cache (it refreshes data)')
+                return True
+            if self.client.get(key) == self._identity.encode():
+                self.client.expire(key, self.leader_ttl)
+                return True
+        except self._errors as error:
+            logging.error(f'Leadership was not checked: {error}')
+        return False
+
+
+def make_backend(parameters, base_directory='.'):
+    """
+    Cache backend from parameters (in-memory backend is used if other one can not be created)
+    :param parameters: {'backend': 'memory' | 'filesystem' | 'redis', 'directory': ..., 'redis_url': ...}
+    :param base_directory: directory of relative path of filesystem backend
+    :return: backend
+    """
+    backend = parameters.get('backend') or 'memory'
+    try:
+        if backend == 'filesystem':
+            return FilesystemBackend(os.path.join(base_directory, parameters['directory']))
+        if backend == 'redis':
+            return RedisBackend(parameters['redis_url'])
+    except ImportError:
+        logging.error('Redis cache backend requires redis package (pip install redis), in-memory cache is used')
+        return MemoryBackend()
+    except OSError as error:
+        logging.error(f'Cache backend {backend} is not available ({error}), in-memory cache is used')
+        return MemoryBackend()
+    if backend != 'memory':
+        logging.error(f'Unknown cache backend {backend}, in-memory cache is used')
+    return MemoryBackend()
+
+
+class SharedCache:
+    """
+    TTLCache of process in front of backend shared by worker processes:
+    values set by one worker (the leader which refreshes data) are read by others without loading
+    """
+
+    def __init__(self, namespace, backend, local, wait_seconds=0.0):
+        """
+        :param namespace: prefix of keys in backend
+        :param backend: cache backend (see make_backend)
+        :param local: TTLCache of process
+        :param wait_seconds: time a follower process waits for value to appear in shared backend
+                             before it loads value itself
+        """
+        self.namespace = namespace
+        self.backend = backend
+        self.local = local
+        self.wait_seconds = wait_seconds
+
+    def _key(self, key) -> str:
+        return f'{self.namespace}_{key}'
+
+    def _from_backend(self, key, allow_stale):
+        entry = self.backend.get(self._key(key))
+        if entry is None:
+            return None
+        value, created_at = entry
+        age = time.time() - created_at
+        if not allow_stale and age >= self.local.ttl:
+            return None
+        self.local.set(key, value, age=age)
+        return value
+
+    def get(self, key, allow_stale=False):
+        """
+        Value from cache of process or (if it is expired there) from shared backend
+        :param key: entry key
+        :param allow_stale: return value even if it is expired
+        :return: value or None
+        """
+        value = self.local.get(key)
+        if value is None and self.backend.shared:
+            value = self._from_backend(key, allow_stale=False)
+        if value is None and allow_stale:
+            value = self.local.get(key, allow_stale=True)
+            if value is None and self.backend.shared:
+                value = self._from_backend(key, allow_stale=True)
+        return value
+
+    def set(self, key, value):
+        """
+        Put value to cache of process and to shared backend (None values are not stored)
+        """
+        if value is None:
+            return
+        self.local.set(key, value)
+        if self.backend.shared:
+            self.backend.set(self._key(key), value)
+
+    def get_or_load(self, key, loader, allow_stale=False):
+        """
+        Value from cache; on miss follower process waits for leader to publish value, then loads it itself
+        :param key: entry key
+        :param loader: function without arguments to get value
+        :param allow_stale: return expired value instead of loading
+        :return: value
+        """
+        def load():
+            value = self.get(key, allow_stale=allow_stale)
+            if value is None and self.backend.shared and not self.backend.is_leader():
+                deadline = time.monotonic() + self.wait_seconds
+                while value is None and time.monotonic() < deadline:
+                    time.sleep(0.5)
+                    value = self.get(key, allow_stale=allow_stale)
+            if value is None:
+                value = loader()
+                if value is not None and self.backend.shared:
+                    self.backend.set(self._key(key), value)
+            return value
+
+        value = self.local.get(key, allow_stale=allow_stale)
+        return value if value is not None else self.local.get_or_load(key, load, allow_stale=allow_stale)
+
+    def clear(self):
+        """
+        Remove all entries (from shared backend too)
+        """
+        self.local.clear()
+        if self.backend.shared:
+            for key in self.backend.items(f'{self.namespace}_'):
+                self.backend.delete(key)
@@ -0,0 +1,176 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from .metrics import stream_messages, stream_dropped_subscribers
+
+DEFAULT_STREAM_PARAMETERS = {
+    'enabled': True,
+    'max_subscribers': 64,
+    'queue_size': 8,
+    'keepalive': 15.0,
+    'retry_ms': 5000,
+}
+
+
+def encode_event(event, data, event_id=None) -> bytes:
+    """
+    Server-sent event in wire format
+    :param event: name of event
+    :param data: json-serializable data
+    :param event_id: id of event (sent back by browser in Last-Event-ID header after reconnect)
+    :return: message bytes
+    """
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class Broadcaster:
+    """
+    Server-sent events for subscribers of topics: message is encoded once and the same bytes are put to queues
+    of all subscribers (work of publication depends on data, not on number of subscribers);
+    subscriber which does not read its queue in time is disconnected (browser reconnects and resyncs).
+    With shared cache backend messages are published through it to subscribers of all worker processes.
+    """
+
+    def __init__(self, backend=None, max_subscribers=64, queue_size=8, keepalive=15.0, retry_ms=5000,
+                 ttl=120.0, poll_period=1.0):
+        """
+        :param backend: cache backend shared by worker processes (see library.backends)
+        :param max_subscribers: maximum number of subscribers of process
+        :param queue_size: messages waiting to be sent to subscriber
+        :param keepalive: seconds between comments sent to idle connections (to keep them through proxies)
+        :param retry_ms: reconnection delay of browser (milliseconds)
+        :param ttl: time to live of message in shared backend (seconds)
+        :param poll_period: seconds between checks of messages published by other workers
+        """
+        self.backend = backend if backend is not None and backend.shared else None
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.retry_ms = retry_ms
+        self.ttl = ttl
+        self.poll_period = poll_period
+        self._subscribers = {}  # topic -> set of queues
+        self._last_ids = {}  # topic -> id of the last delivered message
+        self._lock = threading.Lock()
+        self._relay = None
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, topic, event, data, event_id) -> bytes:
+        """
+        Send event to subscribers of topic (of all worker processes if backend is shared)
+        :param topic: topic name
+        :param event: name of event
+        :param data: json-serializable data
+        :param event_id: increasing id of event (messages with older ids are not delivered)
+        :return: message bytes
+        """
+        message = encode_event(event, data, event_id)
+        self.deliver(topic, event_id, message)
+        if self.backend is not None:
+            self.backend.set(f'stream_{topic}', (event_id, message), ttl=self.ttl)
+        return message
+
+    def deliver(self, topic, event_id, message):
+        """
+        Put encoded message to queues of subscribers of process
+        """
+        with self._lock:
+            if event_id is not None and event_id <= self._last_ids.get(topic, -float('inf')):
+                return
+            self._last_ids[topic] = event_id
+            queues = list(self._subscribers.get(topic, ()))
+        stream_messages.inc()
+        for subscriber in queues:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._drop(topic, subscriber)
+
+    def _drop(self, topic, subscriber):
+        with self._lock:
+            self._subscribers.get(topic, set()).discard(subscriber)
+        stream_dropped_subscribers.inc()
+        try:
+            subscriber.put_nowait(None)  # generator of subscriber stops on None
+        except queue.Full:
+            try:
+                subscriber.get_nowait()
+                subscriber.put_nowait(None)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def subscribe(self, topic):
+        """
+        Register subscriber of topic
+        :param topic: topic name
+        :return: queue of messages or None if there are too many subscribers
+        """
+        with self._lock:
+            if sum(len(queues) for queues in self._subscribers.values()) >= self.max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+        self._start_relay()
+        return subscriber
+
+    def unsubscribe(self, topic, subscriber):
+        with self._lock:
+            queues = self._subscribers.get(topic)
+            if queues is not None:
+                queues.discard(subscriber)
+                if not queues:
+                    del self._subscribers[topic]
+
+    def stream(self, topic, subscriber):
+        """
+        Messages of subscriber for HTTP response (comments are sent to idle connection)
+        :param topic: topic name
+        :param subscriber: queue returned by subscribe
+        :return: generator of bytes
+        """
+        try:
+            yield f'retry: {int(self.retry_ms)}\n\n'.encode()
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(topic, subscriber)
+
+    def _start_relay(self):
+        if self.backend is None:
+            return
+        with self._lock:
+            if self._relay is not None:
+                return
+            self._relay = threading.Thread(target=self._run_relay, name='stream-relay', daemon=True)
+        self._relay.start()
+
+    def _run_relay(self):
+        # messages published by the leader worker are delivered to subscribers of this process
+        while True:
+            time.sleep(self.poll_period)
+            with self._lock:
+                topics = list(self._subscribers)
+            for topic in topics:
+                try:
+                    entry = self.backend.get(f'stream_{topic}')
+                except Exception:
+                    logging.exception('Stream messages were not read from cache backend')
+                    continue
+                if entry is not None:
+                    self.deliver(topic, *entry[0])
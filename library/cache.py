@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe process-wide cache with time-to-live of entries
+    - concurrent misses of one key are deduplicated (single-flight): only one loader runs, others wait for it;
+    - least recently used entries are evicted when number of entries or their summary size exceeds the limits.
+    """
+
+    def __init__(self, ttl, max_entries=16, max_bytes=None, size_of=None):
+        """
+        :param ttl: time to live of entry (seconds)
+        :param max_entries: maximum number of entries
+        :param max_bytes: maximum summary size of entries (requires size_of)
+        :param size_of: function to estimate size of value (bytes)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self._entries = OrderedDict()  # key -> (value, created_at, size)
+        self._in_flight = {}  # key -> {'done': threading.Event, 'value': loaded value}
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry) -> bool:
+        return time.monotonic() - entry[1] < self.ttl
+
+    def get(self, key, allow_stale=False):
+        """
+        Value from cache
+        :param key: entry key
+        :param allow_stale: return value even if it is expired
+        :return: value or None if absent (or expired)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not (allow_stale or self._fresh(entry)):
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, age=0.0):
+        """
+        Put value to cache (None values are not stored)
+        :param key: entry key
+        :param value: value
+        :param age: seconds since value was created (value expires earlier)
+        """
+        if value is None:
+            return
+        size = self.size_of(value) if self.size_of else 0
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() - age, size)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.max_bytes is not None:
+            while len(self._entries) > 1 and sum(entry[2] for entry in self._entries.values()) > self.max_bytes:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, allow_stale=False):
+        """
+        Value from cache; on miss value is loaded once for all concurrent callers
+        :param key: entry key
+        :param loader: function without arguments to get value
+        :param allow_stale: return expired value instead of loading
+        :return: value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (allow_stale or self._fresh(entry)):
+                self._entries.move_to_end(key)
+                return entry[0]
+            load = self._in_flight.get(key)
+            loading = load is None
+            if loading:
+                load = self._in_flight[key] = {'done': threading.Event(), 'value': None}
+
+        if not loading:
+            load['done'].wait()
+            return load['value']
+
+        try:
+            load['value'] = loader()
+            self.set(key, load['value'])
+            return load['value']
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            load['done'].set()
+
+    def clear(self):
+        """
+        Remove all entries
+        """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,197 @@
+import http.client
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .metrics import clickhouse_latency_seconds, clickhouse_received_bytes, clickhouse_errors
+
+POOL_SIZE = 4
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 60.0
+RETRIES = 2
+RETRY_DELAY = 0.5
+CHUNK_SIZE = 64 * 1024
+
+
+class ClickHouseError(Exception):
+    """
+    Query could not be executed by clickhouse (network failure or error answer of the database)
+    """
+
+
+class ClickHouseClient:
+    """
+    In-process client for clickhouse HTTP interface with pool of keep-alive connections
+    """
+
+    def __init__(self, clickhouse_url, db_usr=None, passwd=None, database=None,
+                 pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRIES, retry_delay=RETRY_DELAY, chunk_size=CHUNK_SIZE):
+        """
+        :param clickhouse_url: url to database if following format: http://db-address:db-port
+        :param db_usr: database user
+        :param passwd: database password
+        :param database: default database for queries
+        :param pool_size: maximum number of idle connections kept open
+        :param connect_timeout: timeout (seconds) to establish connection
+        :param read_timeout: timeout (seconds) to wait for the next part of response
+        :param retries: number of repeated attempts after network failure
+        :param retry_delay: delay (seconds) before the first retry, doubled on every next one
+        :param chunk_size: size of response chunk (bytes)
+        """
+        if not clickhouse_url:
+            raise ClickHouseError('url of clickhouse is not set')
+        url = urlsplit(clickhouse_url if '://' in clickhouse_url else f'http://{clickhouse_url}')
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path or '/'
+
+        self.headers = {'Content-Type': 'text/plain; charset=utf-8'}
+        if db_usr:
+            self.headers['X-ClickHouse-User'] = str(db_usr)
+        if passwd:
+            self.headers['X-ClickHouse-Key'] = str(passwd)
+        if database:
+            self.headers['X-ClickHouse-Database'] = str(database)
+
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.chunk_size = chunk_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _new_connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.connect_timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _send(self, sql_query):
+        """
+        Send query with retries on network failures
+        :return: (connection, response) with status 200
+        """
+        body = sql_query.encode('utf-8')
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            connection = self._acquire()
+            start = time.perf_counter()
+            try:
+                connection.request('POST', self.path, body=body, headers=self.headers)
+                if connection.sock is not None:
+                    connection.sock.settimeout(self.read_timeout)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as error:
+                connection.close()
+                if attempt == self.retries:
+                    clickhouse_errors.inc()
+                    raise ClickHouseError(f'{self.host}:{self.port} is not available: {error}') from error
+                logging.warning(f'clickhouse request failed ({error}), retry {attempt + 1} of {self.retries}')
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            clickhouse_latency_seconds.observe(time.perf_counter() - start)
+            if response.status != 200:
+                message = response.read().decode('utf-8', errors='replace').strip()
+                connection.close()
+                clickhouse_errors.inc()
+                raise ClickHouseError(f'clickhouse answered {response.status}: {message}')
+            return connection, response
+
+    def stream(self, sql_query):
+        """
+        Execute query and yield response body by chunks
+        :param sql_query: SQL query
+        :return: generator of bytes chunks
+        """
+        connection, response = self._send(sql_query)
+        completed = False
+        try:
+            while True:
+                chunk = response.read1(self.chunk_size)
+                if not chunk:
+                    break
+                clickhouse_received_bytes.inc(len(chunk))
+                yield chunk
+            response.read()
+            completed = response.isclosed()
+        except (OSError, http.client.HTTPException) as error:
+            clickhouse_errors.inc()
+            raise ClickHouseError(f'response from {self.host}:{self.port} was interrupted: {error}') from error
+        finally:
+            if completed and not response.will_close:
+                self._release(connection)
+            else:
+                connection.close()
+
+    def lines(self, sql_query):
+        """
+        Execute query and yield response lines (without line breaks)
+        :param sql_query: SQL query
+        :return: generator of strings
+        """
+        tail = b''
+        for chunk in self.stream(sql_query):
+            chunk = tail + chunk
+            lines = chunk.split(b'\n')
+            tail = lines.pop()
+            for line in lines:
+                if line:
+                    yield line.decode('utf-8')
+        if tail:
+            yield tail.decode('utf-8')
+
+    def query(self, sql_query) -> list:
+        """
+        Execute query and return all response lines
+        :param sql_query: SQL query
+        :return: list of strings
+        """
+        return list(self.lines(sql_query))
+
+    def close(self):
+        """
+        Close all idle connections
+        """
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(clickhouse_url, db_usr=None, passwd=None, database=None) -> ClickHouseClient:
+    """
+    Shared client (and its connections pool) for given connection parameters
+    :param clickhouse_url: url to database if following format: http://db-address:db-port
+    :param db_usr: database user
+    :param passwd: database password
+    :param database: default database for queries
+    :return: ClickHouseClient
+    """
+    key = (clickhouse_url, db_usr, passwd, database)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = ClickHouseClient(clickhouse_url, db_usr=db_usr, passwd=passwd, database=database)
+            _clients[key] = client
+    return client
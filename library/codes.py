@@ -0,0 +1,63 @@
+import threading
+
+
+class CodesRegistry:
+    """
+    Registry of response codes which were met in calls data
+    Codes keep the order of their first appearance, so columns order is stable across refreshes
+    """
+
+    def __init__(self, codes=None):
+        """
+        :param codes: initially known codes
+        """
+        self._codes = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        if codes:
+            self.register(codes)
+
+    @property
+    def codes(self) -> list:
+        """
+        All known codes in the order of appearance
+        """
+        return list(self._codes)
+
+    def register(self, codes) -> list:
+        """
+        Add codes to registry
+        :param codes: iterable of response codes
+        :return: list of codes which were not known before
+        """
+        new_codes = []
+        with self._lock:
+            for code in codes:
+                if code not in self._codes:
+                    self.version += 1
+                    self._codes[code] = self.version
+                    new_codes.append(code)
+        return new_codes
+
+    def new_since(self, version) -> list:
+        """
+        Codes registered after given registry version
+        :param version: registry version seen by consumer
+        :return: list of codes
+        """
+        return [code for code, code_version in list(self._codes.items()) if code_version > version]
+
+    def order(self, codes) -> list:
+        """
+        Sort codes by registry order (unknown codes go to the end)
+        :param codes: iterable of response codes
+        :return: list of codes
+        """
+        position = self._codes
+        return sorted(codes, key=lambda code: position.get(code, len(position)))
+
+    def __contains__(self, code):
+        return code in self._codes
+
+    def __len__(self):
+        return len(self._codes)
@@ -0,0 +1,106 @@
+import numpy as np
+
+DEFAULT_DOWNSAMPLING_PARAMETERS = {
+    'method': 'lttb',
+    'max_points': [
+        {'max_hours': 48, 'points': 3000},
+        {'max_hours': 720, 'points': 2000},
+    ]
+}
+
+
+def max_points_for_interval(hours_of_calls_data, max_points=None) -> int:
+    """
+    Maximum number of points of one series for time interval
+    :param hours_of_calls_data: time interval (in hours)
+    :param max_points: list of {'max_hours': ..., 'points': ...} (the first one which covers interval is used)
+    :return: number of points
+    """
+    max_points = sorted(max_points or DEFAULT_DOWNSAMPLING_PARAMETERS['max_points'],
+                        key=lambda limit: limit['max_hours'])
+    for limit in max_points:
+        if hours_of_calls_data <= limit['max_hours']:
+            return int(limit['points'])
+    return int(max_points[-1]['points'])
+
+
+def lttb_indices(x, y, n_out) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of points which keep visual shape of series (peaks are kept)
+    :param x: numeric x values (sorted)
+    :param y: y values
+    :param n_out: number of points to keep
+    :return: sorted indices of kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        average_x = x[next_start:next_stop].mean()
+        average_y = y[next_start:next_stop].mean()
+        areas = np.abs((x[selected] - average_x) * (y[start:stop] - y[selected])
+                       - (x[selected] - x[start:stop]) * (average_y - y[selected]))
+        selected = start + int(areas.argmax())
+        indices[i + 1] = selected
+    return indices
+
+
+def min_max_indices(y, n_out) -> np.ndarray:
+    """
+    Indices of minimum and maximum of every bucket (n_out / 2 buckets)
+    :param y: y values
+    :param n_out: number of points to keep
+    :return: sorted indices of kept points
+    """
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, size)
+    rows = np.arange(n_buckets) * size
+    maximums = rows + np.nanargmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    minimums = rows + np.nanargmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    indices = np.unique(np.concatenate([[0, n - 1], maximums, minimums]))
+    return indices[indices < n]
+
+
+def downsample(x, y, max_points, method='lttb') -> tuple:
+    """
+    Reduce series to bounded number of points keeping spikes (NaN values are dropped)
+    :param x: x values (numbers or datetime64)
+    :param y: y values
+    :param max_points: maximum number of points
+    :param method: 'lttb' or 'min_max' (any other value disables downsampling)
+    :return: (x, y) of kept points
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    present = ~np.isnan(y)
+    if not present.all():
+        x, y = x[present], y[present]
+    if not max_points or len(y) <= max_points:
+        return x, y
+
+    if method == 'lttb':
+        numeric_x = x.astype('datetime64[ns]').astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+        indices = lttb_indices(numeric_x, y, max_points)
+    elif method == 'min_max':
+        indices = min_max_indices(y, max_points)
+    else:
+        return x, y
+    return x[indices], y[indices]
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .clickhouse import ClickHouseClient, ClickHouseError
+from .metrics import clickhouse_probe_seconds, clickhouse_probe_failures, clickhouse_circuit_opened
+from .queries import table_exists_query
+
+DEFAULT_HEALTH_PARAMETERS = {
+    'enabled': True,
+    'probe_period': 10,
+    'probe_timeout': 3.0,
+    'failure_threshold': 3,
+    'open_seconds': 30,
+    'slow_seconds': 1.0,
+    'latency_window': 60,
+}
+
+CLOSED = 'closed'  # queries are sent to database
+OPEN = 'open'  # database is unavailable: queries fail fast without request
+HALF_OPEN = 'half_open'  # open_seconds passed: queries are sent again, the first failure opens circuit
+
+
+def clickhouse_probe(clickhouse_url, db_usr=None, passwd=None, database=None, timeout=3.0):
+    """
+    Probe of clickhouse for HealthMonitor: table with calls data is requested by own client
+    (one connection, no retries, so probe is not delayed by queries of data and shows real latency)
+    :param clickhouse_url: url to database if following format: http://db-address:db-port
+    :param db_usr: database user
+    :param passwd: database password
+    :param database: table with calls data
+    :param timeout: timeout (seconds) of connection and answer
+    :return: function without arguments which raises ClickHouseError if database is not available
+    """
+    client = ClickHouseClient(clickhouse_url, db_usr=db_usr, passwd=passwd, database=db_usr, pool_size=1,
+                              connect_timeout=timeout, read_timeout=timeout, retries=0)
+    sql_query = table_exists_query(database)
+
+    def probe():
+        tables = client.query(sql_query)
+        if not tables or tables[0] != database:
+            raise ClickHouseError(f"table '{database}' does not exist")
+
+    return probe
+
+
+class HealthMonitor(threading.Thread):
+    """
+    Background thread which probes database on its own schedule and circuit breaker of database queries:
+    circuit is opened after failure_threshold failures in a row (of probes or queries), queries are not sent
+    while it is open; circuit is closed by successful probe or by successful query after open_seconds
+    """
+
+    def __init__(self, probe, probe_period=10, failure_threshold=3, open_seconds=30, slow_seconds=1.0,
+                 latency_window=60):
+        """
+        :param probe: function without arguments which raises exception if database is not available
+        :param probe_period: seconds between probes
+        :param failure_threshold: failures in a row to open circuit
+        :param open_seconds: seconds before queries are tried again without successful probe
+        :param slow_seconds: database is slow if 95th percentile of probes latency exceeds it
+        :param latency_window: number of the latest probes to calculate latency percentiles
+        """
+        super().__init__(name='health-monitor', daemon=True)
+        self.probe = probe
+        self.probe_period = probe_period
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_seconds = slow_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.checked_at = None
+        self._latencies = deque(maxlen=latency_window)
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Query can be sent to database (False means that it should fail fast)
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            return self.state != OPEN
+
+    def record_success(self, latency=None):
+        """
+        Register successful probe or query
+        :param latency: seconds of probe (latency of data queries depends on data, so it is not registered)
+        """
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info('Database is available again')
+            self.state = CLOSED
+            self.failures = 0
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def record_failure(self, error=None):
+        """
+        Register failed probe or query
+        :param error: reason of failure
+        """
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state != OPEN and (self.state == HALF_OPEN or self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                clickhouse_circuit_opened.inc()
+                logging.error(f'Database is unavailable, queries are stopped for {self.open_seconds} s: {error}')
+
+    def check(self) -> bool:
+        """
+        Probe database once
+        :return: database is available
+        """
+        start = time.monotonic()
+        try:
+            self.probe()
+        except Exception as error:
+            clickhouse_probe_failures.inc()
+            self.record_failure(error)
+            return False
+        finally:
+            self.checked_at = datetime.now()
+        latency = time.monotonic() - start
+        clickhouse_probe_seconds.observe(latency)
+        self.record_success(latency)
+        return True
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)) -> dict:
+        """
+        Latency of the latest successful probes
+        :param quantiles: quantiles to calculate
+        :return: {quantile: seconds} (empty if database was not probed)
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return {}
+        return {quantile: latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+                for quantile in quantiles}
+
+    def status(self) -> dict:
+        """
+        State of database for dashboard
+        :return: {'status': 'ok' | 'slow' | 'down' | 'unknown', 'state': circuit state, 'failures': ...,
+                  'latency': {quantile: seconds}, 'last_error': ..., 'checked_at': datetime of the last probe}
+        """
+        latency = self.percentiles()
+        if self.state == OPEN:
+            status = 'down'
+        elif not latency:
+            status = 'unknown'
+        elif latency[0.95] > self.slow_seconds:
+            status = 'slow'
+        else:
+            status = 'ok'
+        return {'status': status, 'state': self.state, 'failures': self.failures, 'latency': latency,
+                'last_error': self.last_error, 'checked_at': self.checked_at}
+
+    def run(self):
+        while True:
+            self.check()
+            time.sleep(self.probe_period)
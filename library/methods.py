@@ -1,5 +1,4 @@
-import pandas as pd
-import subprocess
+import platform
 from datetime import timedelta
 
 
@@ -79,24 +78,6 @@ def responses_info() -> dict:
     return responses_dict
 
 
-def calls_statistics(dataframe, code) -> tuple:
-    """
-    Calls statistics summarizer
-
-    :param dataframe: pandas dataframe of calls data (columns: ['datetime', 'server', 'code_1', 'code_2' ... 'code_N'])
-    :param code: response code calls to analyze
-    :return: max_value, median_value, average_value, number_of_events, all_calls_number
-    """
-    calls_max = int(dataframe[code].max())
-    calls_median = int(dataframe[code].median())
-    calls_mean = int(dataframe[code].mean())
-    calls_events = dataframe[code].astype(bool).sum(axis=0)
-    calls_timedelta = (dataframe[[code, 'time']]['time'].max() - dataframe[[code, 'time']][
-        'time'].min()) / pd.Timedelta('1h')
-    calls_sum = round(dataframe[code].sum() / calls_timedelta, 2)
-    return calls_max, calls_median, calls_mean, calls_events, calls_sum
-
-
 def time_converter(calls_times, delta_hours=4, negative=False):
     """
     Convert time to necessary timezone
@@ -115,6 +96,4 @@ def system_is_linux() -> bool:
     Checks if current system is Linux
     :return: True if Linux; False if else
     """
-    ps = subprocess.Popen(f"uname", shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-    system_string = str(ps.communicate()[0])
-    return True if 'linux' in system_string.lower() else False
+    return platform.system().lower() == 'linux'
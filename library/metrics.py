@@ -0,0 +1,233 @@
+import cProfile
+import contextvars
+import io
+import logging
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_PREFIX = 'calls_visualizer'
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(10))  # 1 KB ... 256 MB
+
+DEFAULT_METRICS_PARAMETERS = {
+    'enabled': True,
+    'profiling': False,
+    'profile_lines': 30,
+}
+
+
+def _labels_text(names, values) -> str:
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    """
+    Monotonic counter with labels
+    """
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {} if self.labels else {(): 0}  # labels values -> value
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [f'{self.name}{_labels_text(self.labels, key)} {value}'
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """
+    Histogram of observed values with labels (cumulative buckets, sum and count as in Prometheus)
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels values -> [counts of buckets (+Inf is the last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][position] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(tuple(labels.get(name, '') for name in self.labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> list:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, number in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += number
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(f'{self.name}_bucket{_labels_text(self.labels + ("le",), key + (le,))} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels_text(self.labels, key)} {total}')
+                lines.append(f'{self.name}_count{_labels_text(self.labels, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """
+    Metrics of process (every worker of production server has its own values)
+    """
+
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, description, labels, **kwargs):
+        name = f'{self.prefix}_{name}' if self.prefix else name
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, description, labels, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, description, labels=()) -> Counter:
+        return self._register(Counter, name, description, labels)
+
+    def histogram(self, name, description, labels=(), buckets=TIME_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Metrics in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram('stage_seconds', 'Duration of data pipeline stage', ['stage'])
+clickhouse_latency_seconds = registry.histogram('clickhouse_latency_seconds',
+                                                'Time from sending query to clickhouse until answer headers')
+clickhouse_received_bytes = registry.counter('clickhouse_received_bytes_total', 'Bytes of clickhouse answers')
+clickhouse_errors = registry.counter('clickhouse_errors_total', 'Failed clickhouse queries')
+clickhouse_probe_seconds = registry.histogram('clickhouse_probe_seconds', 'Latency of clickhouse health probes')
+clickhouse_probe_failures = registry.counter('clickhouse_probe_failures_total', 'Failed clickhouse health probes')
+clickhouse_circuit_opened = registry.counter('clickhouse_circuit_opened_total',
+                                             'Times clickhouse was considered unavailable and queries were stopped')
+query_cache_requests = registry.counter('query_cache_requests_total', 'Queries of get_from_clickhouse by result of cache '
+                                        'lookup (hit, miss)', ['result'])
+stream_messages = registry.counter('stream_messages_total', 'Server-sent events published to subscribers of process')
+stream_dropped_subscribers = registry.counter('stream_dropped_subscribers_total',
+                                              'Subscribers disconnected because they did not read events in time')
+rows_parsed = registry.counter('rows_parsed_total', 'Lines of clickhouse answers parsed to calls data', ['format'])
+request_seconds = registry.histogram('request_seconds', 'Duration of HTTP request', ['endpoint'])
+response_bytes = registry.histogram('response_bytes', 'Size of HTTP response body', ['endpoint'],
+                                    buckets=SIZE_BUCKETS)
+
+# stages of profiled request (tasks submitted to executors with contextvars.copy_context().run add their stages too)
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Measure duration of code block as data pipeline stage
+    (durations are also collected for Server-Timing header of profiled request, see instrument_server)
+    :param stage: name of stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        stage_seconds.observe(duration, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, duration))
+
+
+def dash_endpoint(request) -> str:
+    """
+    Name of endpoint of request: outputs of Dash callback or route rule (not path, so number of label values
+    does not depend on requested urls)
+    """
+    if request.path.endswith('_dash-update-component'):
+        body = request.get_json(silent=True) or {}
+        return f"callback:{body.get('output', '')}"[:200]
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def instrument_server(server, profiling=False, profile_lines=30, endpoint=dash_endpoint):
+    """
+    Add /metrics route (Prometheus format) and measurements of requests duration and responses size to Flask server
+    :param server: Flask application
+    :param profiling: requests with 'profile' argument or X-Profile header are profiled by cProfile
+                      (the most expensive functions are logged, stages durations are sent in Server-Timing header)
+    :param profile_lines: number of logged functions of profiled request
+    :param endpoint: function (request) -> endpoint label
+    """
+    from flask import Response, g, request
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    @server.before_request
+    def start_measurement():
+        g.metrics_start = time.perf_counter()
+        profiled = profiling and bool(request.args.get('profile') or request.headers.get('X-Profile'))
+        _request_timings.set([] if profiled else None)
+        if profiled:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @server.after_request
+    def finish_measurement(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            stages = list(_request_timings.get())
+            _request_timings.set(None)
+            stages.append(('total', time.perf_counter() - g.metrics_start))
+            response.headers['Server-Timing'] = ', '.join(f'{stage};dur={duration * 1000:.1f}'
+                                                          for stage, duration in stages)
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(profile_lines)
+            logging.info(f'Profile of {request.method} {request.path}:\n{report.getvalue()}')
+
+        start = g.pop('metrics_start', None)
+        if start is not None and request.path != '/metrics':
+            name = endpoint(request)
+            request_seconds.observe(time.perf_counter() - start, endpoint=name)
+            if response.is_sequence:  # streamed responses are not consumed to measure them
+                response_bytes.observe(response.calculate_content_length() or 0, endpoint=name)
+        return response
@@ -2,11 +2,21 @@ import os
 
 os.environ['OPENBLAS_NUM_THREADS'] = '1'
 
+import csv
+import io
 import logging
-import subprocess
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from .methods import system_is_linux
+from .clickhouse import get_client, ClickHouseError
+from .metrics import rows_parsed, timed
+from .queries import table_exists_query
+from .query_cache import QueryCache
+from .store import CallsStore
+
+BATCH_SIZE = 1024 * 1024  # bytes of answer which are parsed at once by parse_calls_stream
+
+# the latest answers of get_from_clickhouse queries (see QueryCache)
+query_cache = QueryCache()
 
 
 def check_database_connection(db_usr=None,
@@ -21,99 +31,196 @@ def check_database_connection(db_usr=None,
     :param database: database with data
     :return:
     """
-    connection = True
-    clickhouse_connect = os.path.join(f"{clickhouse_url}",
-                                      f"database={db_usr}?user={db_usr}&password={passwd}")
-
-    sql_query = f"SELECT table_name FROM information_schema.tables WHERE table_name LIKE '{database}'"
-    echo_substring = f"echo {sql_query}" if not system_is_linux() else f"echo \"{sql_query}\""
+    sql_query = table_exists_query(database)
 
-    ps = subprocess.Popen(
-        f"{echo_substring} | curl \"{clickhouse_connect}\" -d @-",
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL
-    )
+    try:
+        tables = get_client(clickhouse_url, db_usr=db_usr, passwd=passwd, database=db_usr).query(sql_query)
+    except ClickHouseError as error:
+        logging.error(f"wrong connection/authentication with {clickhouse_url} ({error})")
+        return False
 
-    ps_output = str(ps.communicate()[0])[2:-1]
-    ps_output = list(filter(None, ps_output.split(r'\n')))
-
-    if not ps_output:
+    if not tables or tables[0] != database:
         logging.error(f"table '{database}' does not exist")
-        connection = False
-
-    if len(ps_output) == 0 or ps_output[0] != database:
-        logging.error(f"wrong connection/authentication with ${clickhouse_url}database=${database}?user=...&password...")
-        connection = False
+        return False
 
-    return connection
+    return True
 
 
 def get_from_clickhouse(db_usr=None,
                         passwd=None,
                         clickhouse_url=None,
-                        sql_query=None) -> list:
+                        sql_query=None,
+                        strict=False,
+                        cache=True) -> list:
     """
     Get calls data from clickhouse
     :param db_usr: database user
     :param passwd: database password
     :param clickhouse_url: url to database if following format: http://db-address:db-port
     :param sql_query: SQL query (SELECT) to get necessary data
+    :param strict: raise ClickHouseError if data was not received (instead of returning empty list)
+    :param cache: answer of the same query received less than query_cache.ttl seconds ago is taken from query_cache
     :return: table from DB in list format (list_element is a call)
     """
-    clickhouse_connect = os.path.join(f"{clickhouse_url}",
-                                      f"database={db_usr}?user={db_usr}&password={passwd}")
+    try:
+        client = get_client(clickhouse_url, db_usr=db_usr, passwd=passwd, database=db_usr)
+        calls_data = query_cache.query(client, sql_query) if cache else client.query(sql_query)
+    except ClickHouseError as error:
+        logging.error(f"calls data was not received: {error}")
+        if strict:
+            raise
+        calls_data = []
 
-    echo_substring = f"echo {sql_query}" if not system_is_linux() else f"echo \"{sql_query}\""
-
-    ps = subprocess.Popen(
-        f"{echo_substring} | curl \"{clickhouse_connect}\" -d @-",
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL
-    )
+    return calls_data
 
-    ps_output = str(ps.communicate()[0])[2:-1]
-    calls_data = list(filter(None, ps_output.split(r'\n')))
 
-    return calls_data
+def stream_from_clickhouse(db_usr=None,
+                           passwd=None,
+                           clickhouse_url=None,
+                           sql_query=None):
+    """
+    Get answer of clickhouse by parts while it is received (the whole answer is not kept in memory)
+    :param db_usr: database user
+    :param passwd: database password
+    :param clickhouse_url: url to database if following format: http://db-address:db-port
+    :param sql_query: SQL query (SELECT) to get necessary data
+    :return: generator of bytes chunks (ClickHouseError is raised if data was not received)
+    """
+    try:
+        yield from get_client(clickhouse_url, db_usr=db_usr, passwd=passwd, database=db_usr).stream(sql_query)
+    except ClickHouseError as error:
+        logging.error(f"calls data was not received: {error}")
+        raise
 
 
-def parse_calls_from_db(calls_data, datetime_format='%Y-%m-%d %H:%M:%S') -> pd.DataFrame:
+def lines_batches(chunks, batch_size=BATCH_SIZE):
+    """
+    Join chunks of answer into batches of complete lines
+    :param chunks: iterable of bytes
+    :param batch_size: minimal size of batch (bytes), the last batch can be smaller
+    :return: generator of bytes
+    """
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size < batch_size:
+            continue
+        data = b''.join(buffer)
+        end = data.rfind(b'\n') + 1
+        if end:
+            yield data[:end]
+            data = data[end:]
+        buffer, size = [data], len(data)
+    data = b''.join(buffer)
+    if data:
+        yield data
+
+
+def parse_calls_stream(chunks, datetime_format='%Y-%m-%d %H:%M:%S', codes_registry=None,
+                       batch_size=BATCH_SIZE) -> CallsStore:
+    """
+    Parse calls data in long format ('datetime\tserver\tcode\tcalls' lines, see library.queries.calls_pairs_query)
+    while it is received: every batch of lines is converted to compact arrays at once,
+    so memory does not depend on size of answer text
+    :param chunks: iterable of bytes (e.g. stream_from_clickhouse(...))
+    :param datetime_format: format of datetime in database
+    :param codes_registry: CodesRegistry to collect response codes (codes columns follow its order)
+    :param batch_size: size of text parsed at once (bytes)
+    :return: CallsStore
+    """
+    servers, codes = {}, {}  # name -> number in order of appearance
+    keys, code_ids, calls = [], [], []  # key is (server number << 32 | epoch seconds)
+    for batch in lines_batches(chunks, batch_size):
+        # time of waiting for answer is not included into parse stage
+        with timed('parse_batch'):
+            table = pd.read_csv(io.BytesIO(batch), sep='\t', header=None, names=['time', 'server', 'code', 'calls'],
+                                dtype={'time': str, 'server': str, 'code': str, 'calls': float},
+                                quoting=csv.QUOTE_NONE, on_bad_lines='skip').dropna()
+            rows_parsed.inc(len(table), format='pairs')
+            if table.empty:
+                continue
+            numbers = {}
+            for column, known in (('server', servers), ('code', codes)):
+                index, uniques = pd.factorize(table[column].str.strip())
+                numbers[column] = np.array([known.setdefault(value, len(known)) for value in uniques])[index]
+            times = pd.to_datetime(table['time'], format=datetime_format).to_numpy().astype('datetime64[s]')
+            keys.append((numbers['server'].astype(np.int64) << 32) | times.astype(np.int64))
+            code_ids.append(numbers['code'].astype(np.int16))
+            calls.append(np.rint(table['calls'].to_numpy()).astype(np.int32))
+
+    codes = list(codes)
+    if codes_registry is not None:
+        codes_registry.register(codes)
+        codes_order = codes_registry.order(codes)
+    else:
+        codes_order = codes
+    if not keys:
+        return CallsStore.empty(codes_order)
+
+    servers_order = sorted(servers)
+    server_position = np.array([servers_order.index(server) for server in servers], dtype=np.int64)
+    code_position = np.array([codes_order.index(code) for code in codes], dtype=np.int64)
+
+    # rows of store are unique (server, time) pairs sorted by server and time
+    keys = np.concatenate(keys)
+    keys = (server_position[keys >> 32] << 32) | (keys & 0xFFFFFFFF)
+    keys, rows = np.unique(keys, return_inverse=True)
+    counts = np.zeros((len(keys), len(codes_order)), dtype=np.int32)
+    counts[rows, code_position[np.concatenate(code_ids)]] = np.concatenate(calls)
+    return CallsStore(servers_order, (keys >> 32).astype(np.int32), keys & 0xFFFFFFFF, counts, codes_order)
+
+
+@timed('parse_wide')
+def parse_calls_from_db(calls_data, datetime_format='%Y-%m-%d %H:%M:%S', codes_registry=None) -> pd.DataFrame:
     """
     Parse list of calls data list received from clickhouse
+    Lines are split into typed columns at once and 'code: calls;...' field is pivoted to codes columns
+    (response codes absent in a line are NaN)
     :param calls_data: list of calls data (got from get_from_clickhouse(...) method)
     :param datetime_format: format of datetime in database
-    :return: pandas.DataFrame of calls data (columns: ['datetime', 'server', 'code_1', 'code_2' ... 'code_N'])
+    :param codes_registry: CodesRegistry to collect response codes (codes columns follow its order)
+    :return: pandas.DataFrame of calls data (columns: ['code_1', 'code_2' ... 'code_N', 'server', 'time'])
             sorted by call received time
     """
-    calls_times, calls_servers, calls_codes = [], [], []
-    for call in calls_data:
-        call = call.split(r'\t')
-
-        try:
-            time, server, codes = call
-        except ValueError:
-            continue
-
-        time = datetime.strptime(time, datetime_format)
-        codes = codes.split(';')
-
-        codes_dict = {}
-        for code in codes:
-            codes_dict.update({code.split()[0][:-1]: float(code.split()[1])})
-
-        calls_times.append(time)
-        calls_servers.append(server)
-        calls_codes.append(codes_dict)
-
-    unique_codes = find_unique_codes(calls_codes)
-    calls_data = calls_responses_correction(calls_codes, unique_codes)
-    calls_data.update({'server': calls_servers, 'time': calls_times})
-    calls_df = pd.DataFrame(data=calls_data)
-    return calls_df.sort_values(by=['time'])
-
-
+    calls_table = pd.read_csv(io.StringIO('\n'.join(calls_data)), sep='\t', header=None,
+                              names=['time', 'server', 'codes'], dtype=str, quoting=csv.QUOTE_NONE,
+                              on_bad_lines='skip', skip_blank_lines=True).dropna().reset_index(drop=True)
+    rows_parsed.inc(len(calls_table), format='wide')
+    if calls_table.empty:
+        return pd.DataFrame(columns=['server', 'time'])
+
+    calls_times = pd.to_datetime(calls_table['time'], format=datetime_format)
+
+    # every 'code: calls' pair becomes a line of the second table, rows keep the number of source line
+    pairs_number = calls_table['codes'].str.count(';').to_numpy() + 1
+    rows = np.repeat(np.arange(len(calls_table)), pairs_number)
+    pairs_text = '\n'.join(calls_table['codes']).replace(';', '\n') + '\n'
+    pairs = pd.read_csv(io.StringIO(pairs_text), sep=':', header=None,
+                        names=['code', 'calls'], dtype={'code': str, 'calls': float}, quoting=csv.QUOTE_NONE,
+                        skipinitialspace=True, skip_blank_lines=False)
+    present = pairs['calls'].notna().to_numpy()
+    rows = rows[present]
+    pairs = pairs[present]
+
+    codes_index, unique_codes = pd.factorize(pairs['code'])
+    unique_codes = pd.Index(unique_codes).str.strip()
+    codes_index, unique_codes = pd.factorize(unique_codes.take(codes_index))
+    if codes_registry is not None:
+        codes_registry.register(unique_codes)
+        codes_order = pd.Index(codes_registry.order(unique_codes))
+        codes_index = codes_order.get_indexer(unique_codes)[codes_index]
+        unique_codes = codes_order
+    calls_numbers = np.full((len(calls_table), len(unique_codes)), np.nan)
+    calls_numbers[rows, codes_index] = pairs['calls'].to_numpy()
+
+    calls_df = pd.DataFrame(calls_numbers, columns=list(unique_codes))
+    calls_df['server'] = calls_table['server']
+    calls_df['time'] = calls_times
+    return calls_df.sort_values(by=['time'], kind='stable')
+
+
+@timed('split_by_servers')
 def split_dataframe_by_servers(dataframe) -> list:
     """
     Reformat dataframe to list of dataframes according to present servers
@@ -128,29 +235,3 @@ def split_dataframe_by_servers(dataframe) -> list:
         df = df.dropna(axis=1, how='all')
         output_data.append(df)
     return output_data
-
-
-def find_unique_codes(all_calls_codes) -> list:
-    """
-    Find unique response codes in analyzed time interval
-    :param all_calls_codes: list with dictionaries with calls numbers
-    :return: list of unique response codes
-    """
-    codes_dicts = list(set(sum([list(val.keys()) for val in all_calls_codes], [])))
-    return codes_dicts
-
-
-def calls_responses_correction(calls_responses, unique_codes) -> dict:
-    """
-    Corrects list of dicts of calls to fill necessary response codes with None if call existed in some time points
-    Method needs for correct visualization
-    :param calls_responses: list with dictionaries with calls numbers
-    :param unique_codes: unique codes for necessary time interval
-    :return: dictionary of calls
-    """
-    for call in calls_responses:
-        for code in unique_codes:
-            if code not in list(call.keys()):
-                call.update({code: None})
-    calls_responses = {key: [i[key] for i in calls_responses] for key in list(calls_responses[0].keys())}
-    return calls_responses
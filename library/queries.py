@@ -0,0 +1,139 @@
+DEFAULT_QUERY_PARAMETERS = {
+    'datetime_column': 'datetime',
+    'server_column': 'server',
+    'codes_column': 'codes',
+    'overlap_minutes': 5,
+    'min_points': 1000,
+    'buckets': [
+        {'max_hours': 48, 'minutes': 1},
+        {'max_hours': 336, 'minutes': 10},
+        {'max_hours': 720, 'minutes': 60},
+    ]
+}
+
+
+def bucket_minutes(hours_of_calls_data, buckets=None, min_points=None) -> int:
+    """
+    Choose size of time bucket for aggregation of calls data
+    :param hours_of_calls_data: time interval to show (in hours)
+    :param buckets: list of {'max_hours': ..., 'minutes': ...} (bucket can be used for intervals up to max_hours)
+    :param min_points: the coarsest bucket which gives at least min_points buckets in interval is used
+                       (the finest one which covers interval if there is no such bucket or min_points is not set)
+    :return: bucket size in minutes
+    """
+    buckets = sorted(buckets or DEFAULT_QUERY_PARAMETERS['buckets'], key=lambda bucket: bucket['max_hours'])
+    covering = [bucket for bucket in buckets if hours_of_calls_data <= bucket['max_hours']] or buckets[-1:]
+    if min_points:
+        enough_points = [bucket for bucket in covering
+                         if hours_of_calls_data * 60 / bucket['minutes'] >= min_points]
+        if enough_points:
+            return int(max(enough_points, key=lambda bucket: bucket['minutes'])['minutes'])
+    return int(covering[0]['minutes'])
+
+
+def codes_aggregation_query(database, table, hours_of_calls_data, bucket=1, parameters=None, since=None) -> str:
+    """
+    SQL subquery which sums calls by time buckets, servers and response codes
+    (columns: bucket, server, code, calls)
+    :param database: clickhouse database
+    :param table: table with calls data
+    :param hours_of_calls_data: time to get data (in hours)
+    :param bucket: size of time bucket (in minutes)
+    :param parameters: columns names (see DEFAULT_QUERY_PARAMETERS)
+    :param since: datetime to get only data starting from it (instead of the whole interval)
+    :return: SQL query (without FORMAT)
+    """
+    parameters = {**DEFAULT_QUERY_PARAMETERS, **(parameters or {})}
+    datetime_column = parameters['datetime_column']
+    server_column = parameters['server_column']
+    codes_column = parameters['codes_column']
+    if since is None:
+        interval_start = f"{datetime_column} > NOW() - INTERVAL {int(hours_of_calls_data * 60)} MINUTE"
+    else:
+        interval_start = f"{datetime_column} >= toDateTime('{since:%Y-%m-%d %H:%M:%S}')"
+
+    return (f"SELECT toStartOfInterval({datetime_column}, INTERVAL {int(bucket)} MINUTE) AS bucket, "
+            f"{server_column} AS server, "
+            f"trimBoth(splitByChar(':', pair)[1]) AS code, "
+            f"sum(toFloat64OrZero(trimBoth(splitByChar(':', pair)[2]))) AS calls "
+            f"FROM {database}.{table} "
+            f"ARRAY JOIN splitByChar(';', {codes_column}) AS pair "
+            f"WHERE {interval_start} "
+            f"AND {datetime_column} < NOW() AND trimBoth(pair) != '' "
+            f"GROUP BY bucket, server, code")
+
+
+def calls_query(database, table, hours_of_calls_data, bucket=1, parameters=None, since=None) -> str:
+    """
+    SQL query to get calls data aggregated by time buckets, servers and response codes
+    Answer has the same format as raw table: 'datetime\tserver\tcode_1: calls;code_2: calls...'
+    where calls is a sum of calls in bucket
+    :param database: clickhouse database
+    :param table: table with calls data
+    :param hours_of_calls_data: time to get data (in hours)
+    :param bucket: size of time bucket (in minutes)
+    :param parameters: columns names (see DEFAULT_QUERY_PARAMETERS)
+    :param since: datetime to get only data starting from it (instead of the whole interval)
+    :return: SQL query
+    """
+    sql_query = (f"SELECT bucket, server, "
+                 f"arrayStringConcat(groupArray(concat(code, ': ', toString(calls))), ';') "
+                 f"FROM ("
+                 f"{codes_aggregation_query(database, table, hours_of_calls_data, bucket, parameters, since)}"
+                 f") "
+                 f"GROUP BY bucket, server "
+                 f"ORDER BY bucket, server "
+                 f"FORMAT TabSeparated")
+    return sql_query
+
+
+def calls_pairs_query(database, table, hours_of_calls_data, bucket=1, parameters=None, since=None) -> str:
+    """
+    SQL query to get calls data aggregated by time buckets, servers and response codes in long format:
+    one line per response code 'datetime\tserver\tcode\tcalls' (lines are not ordered, so database sends them
+    as soon as they are aggregated; answer is parsed by parts while it is received, see parse_calls_stream)
+    :param database: clickhouse database
+    :param table: table with calls data
+    :param hours_of_calls_data: time to get data (in hours)
+    :param bucket: size of time bucket (in minutes)
+    :param parameters: columns names (see DEFAULT_QUERY_PARAMETERS)
+    :param since: datetime to get only data starting from it (instead of the whole interval)
+    :return: SQL query
+    """
+    sql_query = (f"SELECT bucket, server, code, calls "
+                 f"FROM ("
+                 f"{codes_aggregation_query(database, table, hours_of_calls_data, bucket, parameters, since)}"
+                 f") "
+                 f"FORMAT TabSeparated")
+    return sql_query
+
+
+def servers_query(database, table, hours_of_calls_data, parameters=None) -> str:
+    """
+    SQL query to get list of servers which have calls data in time interval
+    :param database: clickhouse database
+    :param table: table with calls data
+    :param hours_of_calls_data: time interval (in hours)
+    :param parameters: columns names (see DEFAULT_QUERY_PARAMETERS)
+    :return: SQL query
+    """
+    parameters = {**DEFAULT_QUERY_PARAMETERS, **(parameters or {})}
+    datetime_column = parameters['datetime_column']
+    server_column = parameters['server_column']
+
+    sql_query = (f"SELECT DISTINCT {server_column} "
+                 f"FROM {database}.{table} "
+                 f"WHERE {datetime_column} > NOW() - INTERVAL {int(hours_of_calls_data * 60)} MINUTE "
+                 f"AND {datetime_column} < NOW() "
+                 f"ORDER BY {server_column} "
+                 f"FORMAT TabSeparated")
+    return sql_query
+
+
+def table_exists_query(table) -> str:
+    """
+    SQL query to check that table exists (answer is the name of table or empty)
+    :param table: table with calls data
+    :return: SQL query
+    """
+    return f"SELECT table_name FROM information_schema.tables WHERE table_name LIKE '{table}'"
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import query_cache_requests
+
+MAX_BYTES = 64 * 1024 ** 2  # summary size of cached answers
+TTL = 60.0  # seconds while answer is served from cache (queries with NOW() get newer data after it)
+
+
+class QueryCache:
+    """
+    Cache of answers of queries keyed by client and query text:
+    - answer is served while it is younger than ttl (queries are sent as is, window relative to NOW() is not changed);
+    - least recently used answers are evicted when summary size of answers exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, ttl=TTL):
+        """
+        :param max_bytes: maximum summary size of cached answers (bytes)
+        :param ttl: time to live of answer (seconds)
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (client, query) -> (lines, size, time of answer)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _find(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] >= self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return list(entry[0])
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def _store(self, key, lines):
+        size = sum(len(line) for line in lines) + 64 * len(lines)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (lines, size, time.monotonic())
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def query(self, client, sql_query) -> list:
+        """
+        Answer of query from cache or database
+        :param client: ClickHouseClient
+        :param sql_query: SQL query
+        :return: list of answer lines (ClickHouseError is raised if answer was not received)
+        """
+        key = (client, sql_query)
+        with self._lock:
+            lines = self._find(key)
+            if lines is not None:
+                self.hits += 1
+                query_cache_requests.inc(result='hit')
+                return lines
+
+        lines = client.query(sql_query)
+        with self._lock:
+            self.misses += 1
+            query_cache_requests.inc(result='miss')
+            self._store(key, lines)
+        return list(lines)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .store import CallsStore
+from .window import RollingWindow
+
+
+def rollup(calls, bucket) -> CallsStore:
+    """
+    Aggregate calls data by bigger time buckets (calls numbers are summed)
+    :param calls: CallsStore
+    :param bucket: size of new time bucket (in minutes, multiple of bucket of data)
+    :return: CallsStore
+    """
+    if not len(calls):
+        return CallsStore.empty(calls.codes)
+
+    seconds = int(bucket) * 60
+    bucket_times = calls.times - calls.times % seconds
+    # rows are sorted by (server, time), so rows of one server bucket are adjacent
+    starts = np.flatnonzero(np.concatenate([[True], (np.diff(bucket_times) != 0) | (np.diff(calls.server_ids) != 0)]))
+    counts = np.add.reduceat(calls.counts, starts, axis=0, dtype=np.int64)
+    counts = np.minimum(counts, np.iinfo(np.int32).max).astype(np.int32)
+    return CallsStore(calls.servers, calls.server_ids[starts], bucket_times[starts], counts, calls.codes)
+
+
+class RollupTiers:
+    """
+    Calls data of several resolutions (tiers): the finest tier is updated with the tail of new data from database,
+    coarser tiers are updated by aggregation of the finest one (full data is requested only on resync)
+    """
+
+    def __init__(self, buckets, overlap_minutes=5):
+        """
+        :param buckets: list of {'max_hours': tier length, 'minutes': size of time bucket}
+        :param overlap_minutes: last minutes of data which are requested again on every update
+        """
+        self.windows = {}
+        self.updated_at = None
+        self.lock = threading.Lock()
+        self.configure(buckets, overlap_minutes)
+
+    def configure(self, buckets, overlap_minutes=5):
+        """
+        Set tiers (windows of unchanged tiers are kept)
+        :param buckets: list of {'max_hours': tier length, 'minutes': size of time bucket}
+        :param overlap_minutes: last minutes of data which are requested again on every update
+        """
+        windows = {}
+        for bucket in sorted(buckets, key=lambda bucket: bucket['minutes']):
+            minutes, hours = int(bucket['minutes']), bucket['max_hours']
+            window = self.windows.get(minutes)
+            if window is None or window.hours != hours:
+                window = RollingWindow(hours, bucket=minutes)
+            window.overlap_minutes = overlap_minutes
+            windows[minutes] = window
+        self.windows = windows
+
+    @property
+    def base(self) -> RollingWindow:
+        """
+        The finest tier
+        """
+        return self.windows[min(self.windows)]
+
+    def tier(self, bucket) -> RollingWindow:
+        """
+        Tier with time bucket (in minutes)
+        """
+        return self.windows[bucket]
+
+    def update(self, fetch, fingerprint, min_interval=0.0):
+        """
+        Update all tiers: the tail of the finest tier is requested from database and aggregated to coarser tiers
+        (tiers which are empty, have other query parameters or can not be aggregated are fully reloaded)
+        :param fetch: function (hours, bucket, since) -> CallsStore with data from database
+        :param fingerprint: function (bucket) -> parameters of query of tier
+        :param min_interval: tiers are not updated if they were updated less than min_interval seconds ago
+        """
+        base = self.base
+        if (self.updated_at is not None and time.monotonic() - self.updated_at < min_interval
+                and not any(window.needs_resync(fingerprint(bucket)) for bucket, window in self.windows.items())):
+            return
+
+        for bucket, window in self.windows.items():
+            tier_fingerprint = fingerprint(bucket)
+            since = None if window.needs_resync(tier_fingerprint) else window.tail_start()
+            if window is base:
+                window.update(fetch(window.hours, bucket, since), since=since, fingerprint=tier_fingerprint)
+                continue
+
+            if since is not None:
+                # the last (incomplete) bucket of tier and newer ones are aggregated again
+                since = pd.Timestamp(int(since.timestamp()) // (bucket * 60) * bucket * 60, unit='s')
+                if base.calls is None or not len(base.calls) or base.calls.times.min() > int(since.timestamp()):
+                    since = None
+            if since is None:
+                window.update(fetch(window.hours, bucket, None), since=None, fingerprint=tier_fingerprint)
+            else:
+                window.update(rollup(base.calls.since(since), bucket), since=since, fingerprint=tier_fingerprint)
+        self.updated_at = time.monotonic()
@@ -0,0 +1,136 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+STATISTICS_COLUMNS = ['server', 'code', 'max', 'median', 'mean', 'events', 'hourly_rate']
+
+
+def statistics_frame(rows) -> pd.DataFrame:
+    """
+    Statistics table from list of rows (see STATISTICS_COLUMNS)
+    """
+    statistics = pd.DataFrame(rows, columns=STATISTICS_COLUMNS)
+    return statistics.astype({'max': np.int64, 'events': np.int64, 'median': float, 'mean': float,
+                              'hourly_rate': float})
+
+
+def servers_hours(calls) -> dict:
+    """
+    Time between the first and the last data of every server
+    :param calls: CallsStore
+    :return: dictionary server -> hours
+    """
+    return {server: (calls.times[stop - 1] - calls.times[start]) / 3600
+            for server, (start, stop) in calls.offsets.items() if stop > start}
+
+
+def calls_statistics_table(calls) -> pd.DataFrame:
+    """
+    Statistics of calls numbers of all servers and response codes in one grouped pass:
+    max, median and mean of calls per bucket, number of buckets with calls (events)
+    and calls per hour of server data time interval (hourly_rate)
+    :param calls: CallsStore
+    :return: dataframe (columns: STATISTICS_COLUMNS), only codes which have calls on server are present
+    """
+    if not len(calls):
+        return statistics_frame([])
+
+    servers = [server for server in calls.servers if calls.offsets[server][1] > calls.offsets[server][0]]
+    starts = np.array([calls.offsets[server][0] for server in servers])
+    stops = np.array([calls.offsets[server][1] for server in servers])
+
+    present = calls.counts > 0
+    events = np.add.reduceat(present, starts, axis=0, dtype=np.int64)
+    sums = np.add.reduceat(calls.counts, starts, axis=0, dtype=np.int64)
+    maximums = np.maximum.reduceat(calls.counts, starts, axis=0)
+
+    # calls numbers are sorted inside (server, code) groups with one sort of (group << 32 | calls) keys
+    groups = np.repeat(np.arange(len(servers), dtype=np.int64), stops - starts)
+    rows, columns = np.nonzero(present)
+    pairs = groups[rows] * len(calls.codes) + columns
+    keys = (pairs << 32) | calls.counts[rows, columns]
+    keys.sort()
+    values = keys & 0xFFFFFFFF
+    pair_starts = (np.cumsum(events.ravel()) - events.ravel()).reshape(events.shape)
+    low = np.minimum(pair_starts + np.maximum(events - 1, 0) // 2, max(len(values) - 1, 0))
+    high = np.minimum(pair_starts + events // 2, max(len(values) - 1, 0))
+    medians = (values[low] + values[high]) / 2 if len(values) else np.zeros(events.shape)
+
+    hours = (calls.times[stops - 1] - calls.times[starts]) / 3600
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / events
+        rates = np.where(hours[:, None] > 0, sums / hours[:, None], np.nan)
+
+    server_index, code_index = np.nonzero(events)
+    return pd.DataFrame({
+        'server': np.array(servers, dtype=object)[server_index],
+        'code': np.array(calls.codes, dtype=object)[code_index],
+        'max': maximums[server_index, code_index].astype(np.int64),
+        'median': medians[server_index, code_index],
+        'mean': means[server_index, code_index],
+        'events': events[server_index, code_index],
+        'hourly_rate': rates[server_index, code_index]
+    }, columns=STATISTICS_COLUMNS).sort_values(by=['server', 'code'], kind='stable').reset_index(drop=True)
+
+
+class CallsStatistics:
+    """
+    Statistics of calls numbers of every server and response code maintained incrementally:
+    rows of CallsStore are added and removed (calls numbers are kept as counters of values,
+    so statistics do not need raw data)
+    """
+
+    def __init__(self):
+        self._values = {}  # (server, code) -> Counter of calls numbers
+
+    def clear(self):
+        self._values = {}
+
+    def add(self, calls, sign=1):
+        """
+        Take rows into account
+        :param calls: CallsStore
+        :param sign: 1 to add rows, -1 to remove them
+        """
+        rows, columns = np.nonzero(calls.counts)
+        if not len(rows):
+            return
+        # number of rows of every (server, code, calls number)
+        entries = np.stack([calls.server_ids[rows].astype(np.int64), columns, calls.counts[rows, columns]], axis=1)
+        entries, numbers = np.unique(entries, axis=0, return_counts=True)
+        for (server_id, column, value), number in zip(entries.tolist(), (numbers * sign).tolist()):
+            key = (calls.servers[server_id], calls.codes[column])
+            counter = self._values.setdefault(key, Counter())
+            counter[value] += number
+            if counter[value] <= 0:
+                del counter[value]
+                if not counter:
+                    del self._values[key]
+
+    def remove(self, calls):
+        """
+        Exclude rows which were added before
+        :param calls: CallsStore
+        """
+        self.add(calls, sign=-1)
+
+    def table(self, hours=None) -> pd.DataFrame:
+        """
+        Statistics in the same format as calls_statistics_table
+        :param hours: dictionary server -> hours of data (see servers_hours) to calculate hourly rate
+        :return: dataframe (columns: STATISTICS_COLUMNS)
+        """
+        rows = []
+        for (server, code), counter in sorted(self._values.items()):
+            values = np.array(sorted(counter), dtype=np.int64)
+            numbers = np.array([counter[value] for value in values], dtype=np.int64)
+            events = int(numbers.sum())
+            calls_sum = int((values * numbers).sum())
+            positions = np.cumsum(numbers)
+            median = (values[np.searchsorted(positions, (events - 1) // 2, side='right')]
+                      + values[np.searchsorted(positions, events // 2, side='right')]) / 2
+            server_hours = (hours or {}).get(server)
+            rows.append([server, code, int(values[-1]), median, calls_sum / events, events,
+                         calls_sum / server_hours if server_hours else np.nan])
+        return statistics_frame(rows)
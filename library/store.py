@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+STORE_FORMAT_VERSION = 1
+STORE_SCHEMA = {'server_ids': 'int32', 'times': 'int64', 'counts': 'int32'}
+
+
+class ServerView:
+    """
+    Calls data of one server: read-only views of CallsStore arrays (no data is copied)
+    """
+
+    def __init__(self, server, times, counts, codes, code_index):
+        """
+        :param server: server name
+        :param times: int64 array of epoch seconds
+        :param counts: int32 array of calls numbers (rows x codes of store)
+        :param codes: response codes which are present in view
+        :param code_index: response code -> column of counts
+        """
+        self.server = server
+        self.times = times
+        self.counts = counts
+        self.codes = list(codes)
+        self.code_index = code_index
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.counts.nbytes
+
+    @property
+    def last_time(self):
+        """
+        Time of the newest data
+        """
+        return pd.Timestamp(self.times[-1], unit='s') if len(self.times) else None
+
+    def datetimes(self) -> np.ndarray:
+        """
+        Times as datetime64 array (view of times)
+        """
+        return self.times.view('datetime64[s]')
+
+    def values(self, code) -> np.ndarray:
+        """
+        Calls numbers of response code (view, 0 if there were no calls)
+        :param code: response code
+        """
+        return self.counts[:, self.code_index[code]]
+
+    def series(self, code) -> np.ndarray:
+        """
+        Calls numbers of response code as float array with NaN where there were no calls (for plots)
+        :param code: response code
+        """
+        values = self.values(code)
+        return np.where(values > 0, values, np.nan)
+
+    def without(self, codes):
+        """
+        View without some response codes
+        :param codes: list of response codes to hide
+        :return: ServerView
+        """
+        return ServerView(self.server, self.times, self.counts,
+                          [code for code in self.codes if code not in codes], self.code_index)
+
+
+class CallsStore:
+    """
+    Calls data in compact columnar form:
+    server ids (index in sorted list of servers), int64 epoch seconds and int32 calls numbers of every response code
+    Rows are sorted by (server, time), so data of every server is a contiguous slice
+    """
+
+    def __init__(self, servers, server_ids, times, counts, codes):
+        """
+        :param servers: sorted list of servers names
+        :param server_ids: int32 array of servers indexes
+        :param times: int64 array of epoch seconds
+        :param counts: int32 array of calls numbers (rows x codes)
+        :param codes: response codes (columns of counts)
+        """
+        self.servers = list(servers)
+        self.server_ids = server_ids
+        self.times = times
+        self.counts = counts
+        self.codes = list(codes)
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+
+        bounds = np.searchsorted(server_ids, np.arange(len(self.servers) + 1))
+        self.offsets = {server: (int(bounds[i]), int(bounds[i + 1])) for i, server in enumerate(self.servers)}
+
+    @classmethod
+    def empty(cls, codes=()):
+        return cls([], np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64),
+                   np.empty((0, len(codes)), dtype=np.int32), codes)
+
+    @classmethod
+    def from_frame(cls, calls_dataframe, codes=None):
+        """
+        Store from dataframe in format of parse_calls_from_db
+        :param calls_dataframe: dataframe (columns: codes, 'server', 'time')
+        :param codes: order of response codes (codes absent in dataframe are skipped)
+        :return: CallsStore
+        """
+        frame_codes = [column for column in calls_dataframe.columns if column not in ('server', 'time')]
+        codes = [code for code in codes if code in frame_codes] if codes is not None else frame_codes
+        codes += [code for code in frame_codes if code not in codes]
+        if calls_dataframe.empty:
+            return cls.empty(codes)
+
+        servers = pd.Categorical(calls_dataframe['server'])
+        server_ids = servers.codes.astype(np.int32)
+        times = calls_dataframe['time'].to_numpy().astype('datetime64[s]').astype(np.int64)
+        counts = np.rint(calls_dataframe[codes].fillna(0).to_numpy(dtype=float)).astype(np.int32)
+
+        order = np.lexsort((times, server_ids))
+        return cls(list(servers.categories), server_ids[order], times[order], counts[order], codes)
+
+    @classmethod
+    def concat(cls, stores):
+        """
+        Join stores (servers and response codes are united)
+        :param stores: list of CallsStore
+        :return: CallsStore
+        """
+        stores = [store for store in stores if store is not None]
+        codes = list(dict.fromkeys(code for store in stores for code in store.codes))
+        servers = sorted(set(server for store in stores for server in store.servers))
+        if not stores or not any(len(store) for store in stores):
+            return cls.empty(codes)
+
+        server_position = {server: i for i, server in enumerate(servers)}
+        server_ids, times, counts = [], [], []
+        for store in stores:
+            mapping = np.array([server_position[server] for server in store.servers] or [0], dtype=np.int32)
+            server_ids.append(mapping[store.server_ids])
+            times.append(store.times)
+            store_counts = np.zeros((len(store), len(codes)), dtype=np.int32)
+            store_counts[:, [codes.index(code) for code in store.codes]] = store.counts
+            counts.append(store_counts)
+
+        server_ids = np.concatenate(server_ids)
+        times = np.concatenate(times)
+        order = np.lexsort((times, server_ids))
+        return cls(servers, server_ids[order], times[order], np.concatenate(counts)[order], codes)
+
+    @classmethod
+    def from_views(cls, views):
+        """
+        Store with data of servers views
+        :param views: list of ServerView
+        :return: CallsStore
+        """
+        stores = []
+        for view in views:
+            codes = sorted(view.code_index, key=view.code_index.get)
+            stores.append(cls([view.server], np.zeros(len(view), dtype=np.int32), view.times, view.counts, codes))
+        return cls.concat(stores)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self.server_ids.nbytes + self.times.nbytes + self.counts.nbytes
+
+    @property
+    def last_time(self):
+        """
+        Time of the newest data (None if store is empty)
+        """
+        return pd.Timestamp(self.times.max(), unit='s') if len(self.times) else None
+
+    def select(self, mask):
+        """
+        Store with rows where mask is True
+        :param mask: boolean array
+        :return: CallsStore
+        """
+        return CallsStore(self.servers, self.server_ids[mask], self.times[mask], self.counts[mask], self.codes)
+
+    def since(self, time_point):
+        """
+        Rows not older than time point
+        :param time_point: pd.Timestamp
+        :return: CallsStore
+        """
+        return self.select(self.times >= int(time_point.timestamp()))
+
+    def before(self, time_point):
+        """
+        Rows older than time point
+        :param time_point: pd.Timestamp
+        :return: CallsStore
+        """
+        return self.select(self.times < int(time_point.timestamp()))
+
+    def view(self, server, since=None) -> ServerView:
+        """
+        Calls data of server (zero-copy slice)
+        :param server: server name
+        :param since: pd.Timestamp to get only data starting from it
+        :return: ServerView (only codes with calls are present)
+        """
+        start, stop = self.offsets[server]
+        if since is not None:
+            start += int(np.searchsorted(self.times[start:stop], int(since.timestamp())))
+        counts = self.counts[start:stop]
+        present = counts.any(axis=0)
+        return ServerView(server, self.times[start:stop], counts,
+                          [code for code, is_present in zip(self.codes, present) if is_present], self.code_index)
+
+    def views(self, since=None) -> list:
+        """
+        Calls data of every server which has data
+        :param since: pd.Timestamp to get only data starting from it
+        :return: list of ServerView sorted by server
+        """
+        views = [self.view(server, since=since) for server in self.servers]
+        return [view for view in views if len(view)]
+
+
+def save_store(store, directory, metadata=None) -> bool:
+    """
+    Write store to directory: one .npy file per column (can be memory-mapped) and metadata.json
+    Metadata file is replaced atomically, so readers never see partially written store
+    :param store: CallsStore
+    :param directory: directory path (it is created if necessary)
+    :param metadata: json-serializable dictionary saved with store (e.g. query fingerprint)
+    :return: True if store was saved
+    """
+    generation = uuid.uuid4().hex[:12]
+    try:
+        os.makedirs(directory, exist_ok=True)
+        files = {}
+        for column in STORE_SCHEMA:
+            files[column] = f'{column}-{generation}.npy'
+            with open(os.path.join(directory, files[column]), 'wb') as f:
+                np.save(f, getattr(store, column))
+
+        description = {
+            'version': STORE_FORMAT_VERSION,
+            'schema': STORE_SCHEMA,
+            'files': files,
+            'rows': len(store),
+            'servers': store.servers,
+            'codes': store.codes,
+            'saved_at': time.time(),
+            'metadata': metadata or {}
+        }
+        temporary_path = os.path.join(directory, f'metadata-{generation}.tmp')
+        with open(temporary_path, 'w') as f:
+            json.dump(description, f)
+        os.replace(temporary_path, os.path.join(directory, 'metadata.json'))
+    except (OSError, TypeError, ValueError) as error:
+        logging.error(f'Calls data was not saved to {directory}: {error}')
+        return False
+
+    # files of previous generations
+    for file_name in os.listdir(directory):
+        if file_name.endswith('.npy') and file_name not in files.values():
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                pass
+    return True
+
+
+def load_store(directory, mmap=True) -> tuple:
+    """
+    Read store which was written by save_store
+    :param directory: directory path
+    :param mmap: map columns to memory instead of reading them
+    :return: (CallsStore, description with 'saved_at' and 'metadata') or (None, None)
+             if there is no store or it was written in other format
+    """
+    try:
+        with open(os.path.join(directory, 'metadata.json')) as f:
+            description = json.load(f)
+        if description.get('version') != STORE_FORMAT_VERSION or description.get('schema') != STORE_SCHEMA:
+            logging.warning(f'Calls data in {directory} has other format and is ignored')
+            return None, None
+
+        columns = {column: np.load(os.path.join(directory, description['files'][column]),
+                                   mmap_mode='r' if mmap else None, allow_pickle=False)
+                   for column in STORE_SCHEMA}
+        rows, codes, servers = description['rows'], description['codes'], description['servers']
+        if (any(str(columns[column].dtype) != dtype for column, dtype in STORE_SCHEMA.items())
+                or len(columns['server_ids']) != rows or len(columns['times']) != rows
+                or columns['counts'].shape != (rows, len(codes))
+                or (rows and not 0 <= columns['server_ids'].min() <= columns['server_ids'].max() < len(servers))):
+            logging.warning(f'Calls data in {directory} is inconsistent and is ignored')
+            return None, None
+    except FileNotFoundError:
+        return None, None
+    except (OSError, KeyError, TypeError, ValueError) as error:
+        logging.warning(f'Calls data in {directory} was not loaded: {error}')
+        return None, None
+
+    store = CallsStore(servers, columns['server_ids'], columns['times'], columns['counts'], codes)
+    return store, description
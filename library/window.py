@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pandas as pd
+
+from .statistics import CallsStatistics
+from .store import CallsStore
+
+
+class RollingWindow:
+    """
+    Calls data of the last hours kept in memory (CallsStore) and updated with the tail of new data
+    """
+
+    def __init__(self, hours, bucket=1, overlap_minutes=5):
+        """
+        :param hours: window length (in hours)
+        :param bucket: size of time bucket of data (in minutes)
+        :param overlap_minutes: last minutes of data which are requested again on every update
+                                (last bucket may be incomplete and late data may be inserted to database)
+        """
+        self.hours = hours
+        self.bucket = bucket
+        self.overlap_minutes = overlap_minutes
+        self.calls = None
+        self.statistics = CallsStatistics()  # statistics of window data (updated with added and removed rows)
+        self.fingerprint = None
+        self.updated_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def last_seen(self):
+        """
+        Time of the newest data in window (None if window is empty)
+        """
+        if self.calls is None:
+            return None
+        return self.calls.last_time
+
+    def needs_resync(self, fingerprint) -> bool:
+        """
+        Checks if window should be fully reloaded: it is empty, query parameters have changed
+        or window was not updated for longer than its length (all data is expired)
+        :param fingerprint: parameters of query which produced data
+        :return: True if full reload is necessary
+        """
+        return (self.last_seen is None
+                or fingerprint != self.fingerprint
+                or self.updated_at is None
+                or time.monotonic() - self.updated_at > self.hours * 3600)
+
+    def tail_start(self):
+        """
+        Start of time interval which should be requested to update window: start of bucket which contains
+        the first of the last overlap_minutes (it may be the bucket before the last one)
+        """
+        first_minute = int((self.last_seen - pd.Timedelta(minutes=max(0, self.overlap_minutes - 1))).timestamp())
+        return pd.Timestamp(first_minute - first_minute % (self.bucket * 60), unit='s')
+
+    def restore(self, calls, fingerprint=None, age=0.0):
+        """
+        Fill window with data which was saved earlier (e.g. before restart), the next update requests only the tail
+        :param calls: saved data (CallsStore)
+        :param fingerprint: parameters of query which produced data
+        :param age: seconds since data was saved
+        """
+        self.calls = calls
+        self.statistics.clear()
+        self.statistics.add(calls)
+        self.fingerprint = fingerprint
+        self.updated_at = time.monotonic() - max(0.0, age)
+
+    def update(self, calls, since=None, fingerprint=None):
+        """
+        Merge new data into window and evict expired data
+        :param calls: new data (CallsStore)
+        :param since: start of requested interval (None means full reload)
+        :param fingerprint: parameters of query which produced data
+        """
+        if since is None or self.calls is None:
+            merged = calls
+        else:
+            merged = CallsStore.concat([self.calls.before(since), calls])
+
+        expired = None
+        if len(merged):
+            expired = int((merged.last_time - pd.Timedelta(hours=self.hours)).timestamp())
+            if merged.times.min() <= expired:
+                merged = merged.select(merged.times > expired)
+
+        # statistics: replaced and expired rows are removed, new rows are added
+        if since is None or self.calls is None:
+            self.statistics.clear()
+            self.statistics.add(merged)
+        else:
+            old = self.calls
+            since_seconds = int(since.timestamp())
+            self.statistics.remove(old.select((old.times >= since_seconds) if expired is None else
+                                              (old.times >= since_seconds) | (old.times <= expired)))
+            self.statistics.add(calls if expired is None else calls.select(calls.times > expired))
+
+        self.calls = merged
+        self.fingerprint = fingerprint
+        self.updated_at = time.monotonic()
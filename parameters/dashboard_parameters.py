@@ -4,4 +4,16 @@ replace_plots = True
 configfile = 'application.yml'
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
-config_file_path = os.path.join(dir_path, configfile)
+# parameters file can be replaced by environment variable (e.g. for benchmarks), data is saved next to it
+config_file_path = os.environ.get('CALLS_VISUALIZER_CONFIG') or os.path.join(dir_path, configfile)
+
+# time intervals of dropdown menu (value -> hours), only these intervals are refreshed for browsers
+time_intervals = {'1d': 24, '2d': 48, '7d': 168, '14d': 336, '30d': 720}
+default_time_interval = '2d'
+refresh_period = 60  # seconds between auto-refreshes of dashboard (and time to live of cached data)
+cache_max_entries = 8  # time intervals kept in data cache
+refresher_idle_timeout = 600  # seconds to refresh time interval in background after the last request of it
+cache_max_bytes = 1024 ** 3  # memory limit of data cache
+window_cache_dir = os.path.join(os.path.dirname(config_file_path), 'cache')  # calls data saved for warm restarts (None to disable)
+window_persist_period = 300  # minimal seconds between saves of time interval data
+source_timeout = 20  # seconds to wait for data of slow source (its previous data is shown, update continues)
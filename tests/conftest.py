@@ -0,0 +1,130 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from library.store import CallsStore
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST requests with server.answer(handler, body) -> (status, body bytes, delay in seconds)
+    and keeps requests in server.requests as (client port, body)
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive connections
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests.append((self.client_address[1], body.decode('utf-8'), dict(self.headers)))
+        status, answer, delay = self.server.answer(self, body.decode('utf-8'))
+        if delay:
+            threading.Event().wait(delay)
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # client closed connection (e.g. after read timeout)
+
+
+@pytest.fixture
+def http_stub():
+    """
+    Local HTTP server: set http_stub.answer to change its answers, http_stub.url is its address
+    """
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.answer = lambda handler, body: (200, b'', 0)
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def refused_url():
+    """
+    Address where connections are refused
+    """
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+class CallsDatabase:
+    """
+    Calls data of database with several servers and response codes for every minute since START:
+    calls of minute are inserted during late_minutes (the last minutes of answers change), one server appears later
+    """
+    START = 1704067200  # 2024-01-01 00:00:00
+    SERVERS = ['server-1', 'server-2', 'server-3']
+    CODES = ['200', '404', '503']
+
+    def __init__(self, minutes=3000, late_minutes=3, seed=0):
+        rng = np.random.default_rng(seed)
+        shape = (len(self.SERVERS), minutes, len(self.CODES))
+        self.calls_numbers = rng.integers(1, 10, size=shape) * (rng.random(shape) < 0.7)
+        self.calls_numbers[2, :100] = 0
+        self.late_minutes = late_minutes
+
+    def calls(self, now, hours, bucket=1, since=None) -> CallsStore:
+        """
+        Answer of calls query sent at the end of minute now (see library.queries.calls_pairs_query)
+        :param now: minutes since START
+        :param hours: time interval of query
+        :param bucket: size of time bucket (in minutes)
+        :param since: pd.Timestamp to get data starting from it instead of the whole interval
+        """
+        first = now - int(hours * 60) + 1
+        if since is not None:
+            first = -(-(int(since.timestamp()) - self.START) // 60)
+        first = max(first, 0)
+        minutes = np.arange(first, now + 1)
+        inserted = np.minimum(self.late_minutes, now - minutes + 1) / self.late_minutes
+        numbers = np.floor(self.calls_numbers[:, first:now + 1] * inserted[None, :, None]).astype(np.int64)
+
+        buckets = minutes // bucket
+        bucket_numbers = {}
+        for minute_bucket in np.unique(buckets):
+            bucket_numbers[minute_bucket] = numbers[:, buckets == minute_bucket].sum(axis=1)
+        servers = [server for i, server in enumerate(self.SERVERS)
+                   if any(values[i].any() for values in bucket_numbers.values())]
+        server_ids, times, counts = [], [], []
+        for server_id, server in enumerate(servers):
+            i = self.SERVERS.index(server)
+            for minute_bucket, values in bucket_numbers.items():
+                if values[i].any():
+                    server_ids.append(server_id)
+                    times.append(self.START + int(minute_bucket) * bucket * 60)
+                    counts.append(values[i])
+        if not times:
+            return CallsStore.empty(self.CODES)
+        return CallsStore(servers, np.array(server_ids, dtype=np.int32), np.array(times, dtype=np.int64),
+                          np.array(counts, dtype=np.int32), self.CODES)
+
+    @staticmethod
+    def rows(calls) -> list:
+        """
+        Content of store for comparisons: (server, time, ((code, calls), ...)) of every row
+        """
+        return [(calls.servers[server_id], int(time_point),
+                 tuple(sorted((code, int(number)) for code, number in zip(calls.codes, row) if number)))
+                for server_id, time_point, row in zip(calls.server_ids, calls.times, calls.counts)]
+
+
+@pytest.fixture
+def calls_database():
+    return CallsDatabase()
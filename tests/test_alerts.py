@@ -0,0 +1,138 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from library.alerts import AlertsEngine, ErrorRatioRule, FileSink, MemorySink, ThresholdRule, WebhookSink, \
+    ZScoreRule, make_rule
+from library.store import CallsStore
+
+START = 1704067200  # 2024-01-01 00:00:00
+
+
+def calls_store(counts, server='server-1'):
+    """
+    Store of one server with calls per minute
+    :param counts: {code: list of calls numbers}
+    """
+    codes = list(counts)
+    rows = len(counts[codes[0]])
+    return CallsStore([server], np.zeros(rows, dtype=np.int32), START + 60 * np.arange(rows, dtype=np.int64),
+                      np.array([counts[code] for code in codes], dtype=np.int32).T.copy(), codes)
+
+
+def states(alerts):
+    return [(alert.rule, alert.code, alert.state, alert.value) for alert in alerts]
+
+
+def test_threshold_fires_once_and_resolves():
+    sink = MemorySink()
+    engine = AlertsEngine([ThresholdRule('503 rate', ['503'], max_calls=50)], sinks=[sink])
+    history = [0, 0, 0, 0, 0]
+
+    assert engine.process(calls_store({'200': [100] * 5, '503': history})) == []
+    # the last point is incomplete bucket and is not evaluated
+    alerts = engine.process(calls_store({'200': [100] * 10, '503': history + [60, 70, 80, 10, 90]}))
+
+    assert states(alerts) == [('503 rate', '503', 'firing', 60.0), ('503 rate', '503', 'resolved', 10.0)]
+    assert list(sink.alerts) == alerts
+    assert engine.firing() == []
+
+
+def test_alerts_of_history_are_not_sent():
+    sink = MemorySink()
+    engine = AlertsEngine([ThresholdRule('503 rate', ['503'], max_calls=50)], sinks=[sink])
+
+    assert engine.process(calls_store({'503': [0, 60, 70, 0]})) == []
+    assert [alert.state for alert in engine.firing()] == ['firing']
+    assert list(sink.alerts) == []
+    assert engine.process(calls_store({'503': [0, 60, 70, 80, 0]})) == []  # already firing
+
+
+def test_zscore_waits_for_warmup():
+    rule = ZScoreRule('5xx spike', ['5xx'], z=4, alpha=0.1, warmup=10)
+    values = [1, 3, 1, 3, 100]
+
+    assert [rule.evaluate(('server-1', '500'), value, 0)[0] for value in values] == [False] * 5
+
+
+def test_zscore_fires_on_spike_and_resolves():
+    engine = AlertsEngine([ZScoreRule('5xx spike', ['5xx'], z=4, alpha=0.1, min_calls=5, warmup=10)])
+    history = [1, 3] * 10
+
+    assert engine.process(calls_store({'500': history})) == []
+    alerts = engine.process(calls_store({'500': history + [50, 2, 0]}))
+
+    assert [(alert.code, alert.state) for alert in alerts] == [('500', 'firing'), ('500', 'resolved')]
+    assert '5xx spike' in alerts[0].message
+
+
+def test_zscore_ignores_spike_below_min_calls():
+    engine = AlertsEngine([ZScoreRule('5xx spike', ['5xx'], z=4, alpha=0.1, min_calls=5, warmup=10)])
+    history = [0, 0, 0, 1] * 5
+
+    engine.process(calls_store({'502': history}))
+    assert engine.process(calls_store({'502': history + [4, 0]})) == []
+
+
+def test_error_ratio_fires_and_resolves():
+    engine = AlertsEngine([ErrorRatioRule('4xx/5xx ratio', ['4xx', '5xx'], max_ratio=0.5, min_calls=20)])
+    ok, errors = [100] * 3, [0] * 3
+
+    engine.process(calls_store({'200': ok, '404': errors, '302': errors}))
+    alerts = engine.process(calls_store({'200': ok + [100, 100, 100, 100], '404': errors + [60, 55, 10, 0],
+                                         '302': errors + [90, 90, 90, 0]}))
+
+    assert states(alerts) == [('4xx/5xx ratio', '404', 'firing', 0.6), ('4xx/5xx ratio', '404', 'resolved', 0.1)]
+
+
+def test_wrong_rule_is_ignored():
+    assert make_rule({'type': 'unknown', 'name': 'rule'}) is None
+    assert make_rule({'type': 'threshold', 'name': 'rule', 'codes': ['503']}) is None
+    assert isinstance(make_rule({'type': 'threshold', 'name': 'rule', 'codes': [503], 'max_calls': 1}),
+                      ThresholdRule)
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / 'alerts.log'
+    engine = AlertsEngine([ThresholdRule('503 rate', ['503'], max_calls=50)], sinks=[FileSink(str(path))])
+
+    engine.process(calls_store({'503': [0, 0]}))
+    engine.process(calls_store({'503': [0, 0, 60, 0, 0]}))
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line['state'], line['server'], line['code'], line['time']) for line in lines] == \
+           [('firing', 'server-1', '503', '2024-01-01 00:02:00'), ('resolved', 'server-1', '503', '2024-01-01 00:03:00')]
+
+
+def test_webhook_sink(http_stub):
+    engine = AlertsEngine([ThresholdRule('503 rate', ['503'], max_calls=50)],
+                          sinks=[WebhookSink(http_stub.url + '/alerts', timeout=1.0)])
+
+    engine.process(calls_store({'503': [0, 0]}))
+    alerts = engine.process(calls_store({'503': [0, 0, 60, 0]}))
+
+    deadline = time.monotonic() + 5
+    while not http_stub.requests and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(http_stub.requests) == 1
+    _, body, headers = http_stub.requests[0]
+    assert headers['Content-Type'] == 'application/json'
+    assert json.loads(body) == [alert.to_dict() for alert in alerts]
+
+
+@pytest.mark.parametrize('status', [200, 500])
+def test_webhook_sink_does_not_raise(http_stub, status):
+    http_stub.answer = lambda handler, body: (status, b'', 0)
+    sink = WebhookSink(http_stub.url, timeout=1.0)
+    engine = AlertsEngine([ThresholdRule('503 rate', ['503'], max_calls=50)], sinks=[sink])
+
+    engine.process(calls_store({'503': [0, 0]}))
+    engine.process(calls_store({'503': [0, 0, 60, 0]}))
+    engine.process(calls_store({'503': [0, 0, 60, 0, 0]}))
+
+    deadline = time.monotonic() + 5
+    while len(http_stub.requests) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [json.loads(body)[0]['state'] for _, body, _ in http_stub.requests] == ['firing', 'resolved']
@@ -0,0 +1,71 @@
+import pytest
+
+from library import clickhouse
+from library.clickhouse import ClickHouseClient, ClickHouseError
+from library.parsing import check_database_connection
+
+
+def test_connection_is_reused(http_stub):
+    http_stub.answer = lambda handler, body: (200, b'1\n', 0)
+    client = ClickHouseClient(http_stub.url)
+
+    assert client.query('SELECT 1') == ['1']
+    assert client.query('SELECT 1') == ['1']
+    assert len(http_stub.requests) == 2
+    assert http_stub.requests[0][0] == http_stub.requests[1][0]  # the same client port
+    client.close()
+
+
+def test_refused_connection_is_retried(refused_url, monkeypatch):
+    delays = []
+    monkeypatch.setattr(clickhouse.time, 'sleep', delays.append)
+    client = ClickHouseClient(refused_url, retries=2, retry_delay=0.1)
+
+    with pytest.raises(ClickHouseError, match='is not available'):
+        client.query('SELECT 1')
+    assert delays == [0.1, 0.2]
+
+
+def test_error_answer(http_stub):
+    http_stub.answer = lambda handler, body: (500, b'Code: 60. Table calls does not exist\n', 0)
+    client = ClickHouseClient(http_stub.url, retries=0)
+
+    with pytest.raises(ClickHouseError, match='500: Code: 60. Table calls does not exist'):
+        client.query('SELECT * FROM calls')
+
+
+def test_read_timeout(http_stub):
+    http_stub.answer = lambda handler, body: (200, b'1\n', 1.0)
+    client = ClickHouseClient(http_stub.url, read_timeout=0.2, retries=0)
+
+    with pytest.raises(ClickHouseError):
+        client.query('SELECT 1')
+
+
+def test_lines_split_across_chunks(http_stub):
+    http_stub.answer = lambda handler, body: (200, b'2024-01-01 00:00:00\t200\t5\nlast\tline', 0)
+    client = ClickHouseClient(http_stub.url, chunk_size=4)
+
+    assert list(client.lines('SELECT')) == ['2024-01-01 00:00:00\t200\t5', 'last\tline']
+
+
+def test_user_headers(http_stub):
+    http_stub.answer = lambda handler, body: (200, b'', 0)
+    ClickHouseClient(http_stub.url, db_usr='user', passwd='secret', database='db').query('SELECT 1')
+
+    headers = http_stub.requests[0][2]
+    assert (headers['X-ClickHouse-User'], headers['X-ClickHouse-Key'], headers['X-ClickHouse-Database']) == \
+           ('user', 'secret', 'db')
+
+
+@pytest.mark.parametrize('tables, available', [(b'calls\n', True), (b'', False)])
+def test_check_database_connection(http_stub, tables, available):
+    http_stub.answer = lambda handler, body: (200, tables, 0)
+
+    assert check_database_connection(db_usr='user', clickhouse_url=http_stub.url, database='calls') is available
+
+
+def test_check_database_connection_refused(refused_url, monkeypatch):
+    monkeypatch.setattr(clickhouse.time, 'sleep', lambda delay: None)
+
+    assert check_database_connection(db_usr='user', clickhouse_url=refused_url, database='calls') is False
@@ -0,0 +1,105 @@
+import pytest
+
+from library import query_cache as query_cache_module
+from library.clickhouse import ClickHouseClient, ClickHouseError
+from library.parsing import get_from_clickhouse, query_cache
+from library.query_cache import QueryCache
+
+WINDOW_QUERY = "SELECT DISTINCT server FROM db.calls WHERE datetime > NOW() - INTERVAL 1440 MINUTE " \
+               "AND datetime < NOW() FORMAT TabSeparated"
+
+
+def answer_with_lines(lines):
+    return lambda handler, body: (200, ''.join(f'{line}\n' for line in lines).encode(), 0)
+
+
+def test_hit(http_stub):
+    http_stub.answer = answer_with_lines(['server-1', 'server-2'])
+    client, cache = ClickHouseClient(http_stub.url), QueryCache()
+
+    assert cache.query(client, WINDOW_QUERY) == ['server-1', 'server-2']
+    assert cache.query(client, WINDOW_QUERY) == ['server-1', 'server-2']
+    assert (cache.hits, cache.misses, len(http_stub.requests)) == (1, 1, 1)
+
+
+def test_query_is_sent_unchanged(http_stub):
+    http_stub.answer = answer_with_lines(['server-1'])
+    client, cache = ClickHouseClient(http_stub.url), QueryCache()
+
+    cache.query(client, WINDOW_QUERY)
+    cache.query(client, WINDOW_QUERY.replace('1440', '2880'))
+    assert [body for _, body, _ in http_stub.requests] == [WINDOW_QUERY, WINDOW_QUERY.replace('1440', '2880')]
+
+
+def test_answer_expires(http_stub, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache_module.time, 'monotonic', lambda: now[0])
+    http_stub.answer = answer_with_lines(['server-1'])
+    client, cache = ClickHouseClient(http_stub.url), QueryCache(ttl=60)
+
+    cache.query(client, WINDOW_QUERY)
+    now[0] += 59
+    cache.query(client, WINDOW_QUERY)
+    assert len(http_stub.requests) == 1
+    now[0] += 1
+    cache.query(client, WINDOW_QUERY)
+    assert len(http_stub.requests) == 2
+    assert cache.size == 64 + len('server-1')
+
+
+def test_eviction_by_size(http_stub):
+    http_stub.answer = lambda handler, body: (200, f'{body[-1]}\n'.encode(), 0)
+    client = ClickHouseClient(http_stub.url)
+    cache = QueryCache(max_bytes=2 * 65)  # two answers of one line with one character
+
+    for query in ('SELECT 1', 'SELECT 2', 'SELECT 1', 'SELECT 3'):
+        cache.query(client, query)
+    assert cache.size == 2 * 65
+    assert len(http_stub.requests) == 3
+
+    cache.query(client, 'SELECT 1')  # the most recently used answers are kept
+    cache.query(client, 'SELECT 3')
+    assert len(http_stub.requests) == 3
+    cache.query(client, 'SELECT 2')
+    assert len(http_stub.requests) == 4
+
+
+def test_large_answer_is_not_cached(http_stub):
+    http_stub.answer = answer_with_lines(['x' * 100])
+    client, cache = ClickHouseClient(http_stub.url), QueryCache(max_bytes=100)
+
+    assert cache.query(client, 'SELECT 1') == ['x' * 100]
+    assert cache.query(client, 'SELECT 1') == ['x' * 100]
+    assert (len(http_stub.requests), cache.size) == (2, 0)
+
+
+def test_error_is_not_cached(http_stub):
+    answers = iter([(500, b'Code: 241. Memory limit exceeded', 0), (200, b'server-1\n', 0)])
+    http_stub.answer = lambda handler, body: next(answers)
+    client, cache = ClickHouseClient(http_stub.url, retries=0), QueryCache()
+
+    with pytest.raises(ClickHouseError):
+        cache.query(client, WINDOW_QUERY)
+    assert cache.query(client, WINDOW_QUERY) == ['server-1']
+    assert len(http_stub.requests) == 2
+
+
+def test_answers_of_different_databases(http_stub):
+    http_stub.answer = lambda handler, body: (200, f"{handler.headers['X-ClickHouse-Database']}\n".encode(), 0)
+    cache = QueryCache()
+
+    assert cache.query(ClickHouseClient(http_stub.url, database='first'), WINDOW_QUERY) == ['first']
+    assert cache.query(ClickHouseClient(http_stub.url, database='second'), WINDOW_QUERY) == ['second']
+
+
+def test_get_from_clickhouse_cache(http_stub):
+    http_stub.answer = answer_with_lines(['server-1'])
+    query_cache.clear()
+    parameters = {'db_usr': 'test_query_cache', 'clickhouse_url': http_stub.url, 'sql_query': WINDOW_QUERY}
+
+    assert get_from_clickhouse(**parameters) == ['server-1']
+    assert get_from_clickhouse(**parameters) == ['server-1']
+    assert len(http_stub.requests) == 1
+    assert get_from_clickhouse(cache=False, **parameters) == ['server-1']
+    assert len(http_stub.requests) == 2
+    query_cache.clear()
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from library.queries import DEFAULT_QUERY_PARAMETERS, bucket_minutes
+from library.rollup import RollupTiers, rollup
+from library.store import CallsStore
+from parameters.dashboard_parameters import time_intervals
+
+BUCKETS = [{'max_hours': 2, 'minutes': 1}, {'max_hours': 6, 'minutes': 10}]
+
+
+def tier_data(calls_database, tier, now):
+    """
+    Data which tier should keep: database data aggregated by tier buckets, the last hours before the newest data
+    """
+    calls = calls_database.calls(now, hours=100, bucket=tier.bucket)
+    return calls.select(calls.times > int((calls.last_time - pd.Timedelta(hours=tier.hours)).timestamp()))
+
+
+def test_coarse_tier_is_aggregated_from_base(calls_database):
+    tiers = RollupTiers(BUCKETS, overlap_minutes=3)
+    requests = []
+
+    def fetch(hours, bucket, since):
+        requests.append((hours, bucket, since))
+        return calls_database.calls(now, hours, bucket=bucket, since=since)
+
+    now = 400
+    tiers.update(fetch, fingerprint=lambda bucket: bucket)
+    assert [(hours, bucket, since) for hours, bucket, since in requests] == [(2, 1, None), (6, 10, None)]
+
+    for _ in range(19):
+        now += 7
+        requests.clear()
+        tiers.update(fetch, fingerprint=lambda bucket: bucket)
+        assert [(hours, bucket) for hours, bucket, since in requests] == [(2, 1)]  # only the tail of base tier
+        for tier in tiers.windows.values():
+            assert calls_database.rows(tier.calls) == calls_database.rows(tier_data(calls_database, tier, now))
+
+
+def test_coarse_tier_is_fetched_if_base_does_not_cover_it(calls_database):
+    tiers = RollupTiers([{'max_hours': 0.25, 'minutes': 1}, {'max_hours': 6, 'minutes': 60}], overlap_minutes=3)
+    requests = []
+
+    def fetch(hours, bucket, since):
+        requests.append((hours, bucket, since is None))
+        return calls_database.calls(now, hours, bucket=bucket, since=since)
+
+    now = 400
+    tiers.update(fetch, fingerprint=lambda bucket: bucket)
+    now += 5
+    requests.clear()
+    tiers.update(fetch, fingerprint=lambda bucket: bucket)
+
+    # the last hour bucket starts before the oldest data of base tier (15 minutes)
+    assert requests == [(0.25, 1, False), (6, 60, True)]
+    assert calls_database.rows(tiers.tier(60).calls) == \
+           calls_database.rows(tier_data(calls_database, tiers.tier(60), now))
+
+
+def test_tiers_are_not_updated_more_often_than_min_interval(calls_database):
+    tiers = RollupTiers(BUCKETS)
+    requests = []
+
+    def fetch(hours, bucket, since):
+        requests.append(bucket)
+        return calls_database.calls(400, hours, bucket=bucket, since=since)
+
+    tiers.update(fetch, fingerprint=lambda bucket: bucket, min_interval=60)
+    tiers.update(fetch, fingerprint=lambda bucket: bucket, min_interval=60)
+    assert requests == [1, 10]
+    tiers.update(fetch, fingerprint=lambda bucket: ('other', bucket), min_interval=60)  # resync is not delayed
+    assert requests == [1, 10, 1, 10]
+
+
+def test_configure_keeps_unchanged_tiers(calls_database):
+    tiers = RollupTiers(BUCKETS)
+    base = tiers.base
+    tiers.configure(BUCKETS + [{'max_hours': 24, 'minutes': 60}], overlap_minutes=10)
+
+    assert tiers.base is base and base.overlap_minutes == 10
+    assert sorted(tiers.windows) == [1, 10, 60]
+
+
+def test_rollup_partial_first_bucket():
+    times = 1704067200 + 60 * np.array([7, 8, 9, 10, 25, 3, 12], dtype=np.int64)
+    calls = CallsStore(['server-1', 'server-2'], np.array([0, 0, 0, 0, 0, 1, 1], dtype=np.int32), times,
+                       np.array([[1, 0], [2, 1], [3, 0], [4, 0], [5, 5], [6, 0], [7, 1]], dtype=np.int32),
+                       ['200', '503'])
+
+    rolled = rollup(calls, 10)
+
+    assert rolled.servers == ['server-1', 'server-2']
+    assert ((rolled.times - 1704067200) // 60).tolist() == [0, 10, 20, 0, 10]
+    assert rolled.server_ids.tolist() == [0, 0, 0, 1, 1]
+    assert rolled.counts.tolist() == [[6, 1], [4, 0], [5, 5], [6, 0], [7, 1]]
+
+
+def test_rollup_of_empty_store():
+    rolled = rollup(CallsStore.empty(['200']), 10)
+    assert len(rolled) == 0 and rolled.codes == ['200']
+
+
+@pytest.mark.parametrize('interval, bucket', [('1d', 1), ('2d', 1), ('7d', 10), ('14d', 10), ('30d', 60)])
+def test_bucket_minutes_of_dropdown_intervals(interval, bucket):
+    assert bucket_minutes(time_intervals[interval], DEFAULT_QUERY_PARAMETERS['buckets'],
+                          DEFAULT_QUERY_PARAMETERS['min_points']) == bucket
+
+
+def test_bucket_minutes_without_min_points():
+    assert [bucket_minutes(hours, DEFAULT_QUERY_PARAMETERS['buckets']) for hours in (24, 168, 720, 1000)] == \
+           [1, 10, 60, 60]
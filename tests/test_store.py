@@ -0,0 +1,185 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from library.store import CallsStore, STORE_FORMAT_VERSION, STORE_SCHEMA, load_store, save_store
+from library.window import RollingWindow
+
+START = 1704067200  # 2024-01-01 00:00:00
+
+
+def small_store() -> CallsStore:
+    frame = pd.DataFrame({
+        'server': ['server-2', 'server-1', 'server-1', 'server-2', 'server-1'],
+        'time': pd.to_datetime([START + 60, START, START + 60, START, START + 120], unit='s'),
+        '200': [5, 1, 2, np.nan, 3],
+        '503': [np.nan, np.nan, 4, 7, np.nan],
+    })
+    return CallsStore.from_frame(frame)
+
+
+def test_from_frame_sorts_rows_by_server_and_time():
+    calls = small_store()
+
+    assert calls.servers == ['server-1', 'server-2']
+    assert calls.offsets == {'server-1': (0, 3), 'server-2': (3, 5)}
+    assert (calls.times - START).tolist() == [0, 60, 120, 0, 60]
+    assert calls.counts.tolist() == [[1, 0], [2, 4], [3, 0], [0, 7], [5, 0]]
+    assert (calls.times.dtype, calls.counts.dtype, calls.server_ids.dtype) == (np.int64, np.int32, np.int32)
+
+
+def test_views_share_memory_with_store():
+    calls = small_store()
+    views = calls.views()
+
+    assert [view.server for view in views] == ['server-1', 'server-2']
+    for view in views:
+        assert np.shares_memory(view.times, calls.times)
+        assert np.shares_memory(view.counts, calls.counts)
+        assert np.shares_memory(view.values('200'), calls.counts)
+    assert views[0].codes == ['200', '503'] and views[1].codes == ['200', '503']
+    assert views[0].values('503').tolist() == [0, 4, 0]
+    assert np.isnan(views[0].series('503')).tolist() == [True, False, True]  # no markers where there were no calls
+
+
+def test_view_since():
+    calls = small_store()
+    view = calls.view('server-1', since=pd.Timestamp(START + 60, unit='s'))
+
+    assert (view.times - START).tolist() == [60, 120]
+    assert view.last_time == pd.Timestamp(START + 120, unit='s')
+    assert np.shares_memory(view.times, calls.times)
+    # codes without calls since time point are not shown
+    assert calls.view('server-1', since=pd.Timestamp(START + 120, unit='s')).codes == ['200']
+    assert calls.views(since=pd.Timestamp(START + 180, unit='s')) == []
+
+
+def test_view_without_codes():
+    view = small_store().view('server-1').without(['200'])
+    assert view.codes == ['503']
+
+
+def test_since_and_before_split_store():
+    calls = small_store()
+    time_point = pd.Timestamp(START + 60, unit='s')
+    since, before = calls.since(time_point), calls.before(time_point)
+
+    assert (since.times - START).tolist() == [60, 120, 60]
+    assert (before.times - START).tolist() == [0, 0]
+    assert len(since) + len(before) == len(calls)
+    assert since.servers == calls.servers and since.offsets == {'server-1': (0, 2), 'server-2': (2, 3)}
+
+
+def test_concat_unites_servers_and_codes():
+    first = small_store()
+    second = CallsStore(['server-0'], np.zeros(1, dtype=np.int32), np.array([START], dtype=np.int64),
+                        np.array([[9]], dtype=np.int32), ['404'])
+    calls = CallsStore.concat([first, None, second])
+
+    assert calls.servers == ['server-0', 'server-1', 'server-2']
+    assert calls.codes == ['200', '503', '404']
+    assert calls.counts[calls.offsets['server-0'][0]].tolist() == [0, 0, 9]
+    assert len(calls) == len(first) + 1
+    assert len(CallsStore.concat([])) == 0
+
+
+def test_from_views_restores_store():
+    calls = small_store()
+    restored = CallsStore.from_views(calls.views())
+
+    assert restored.servers == calls.servers
+    assert restored.times.tolist() == calls.times.tolist()
+    assert restored.counts.tolist() == calls.counts.tolist()
+
+
+def edit_metadata(directory, **changes):
+    path = directory / 'metadata.json'
+    description = json.loads(path.read_text())
+    description.update(changes)
+    path.write_text(json.dumps(description))
+    return description
+
+
+def test_save_and_load(tmp_path):
+    calls = small_store()
+    assert save_store(calls, str(tmp_path / 'window'), metadata={'fingerprint': ['query', 1]})
+
+    loaded, description = load_store(str(tmp_path / 'window'))
+    assert isinstance(loaded.counts, np.memmap)
+    assert loaded.servers == calls.servers and loaded.codes == calls.codes
+    for column in STORE_SCHEMA:
+        assert getattr(loaded, column).tolist() == getattr(calls, column).tolist()
+    assert description['metadata'] == {'fingerprint': ['query', 1]}
+
+    loaded, _ = load_store(str(tmp_path / 'window'), mmap=False)
+    assert not isinstance(loaded.counts, np.memmap)
+
+
+def test_save_removes_previous_generation(tmp_path):
+    save_store(small_store(), str(tmp_path))
+    save_store(CallsStore.empty(['200']), str(tmp_path))
+
+    assert len(list(tmp_path.glob('*.npy'))) == len(STORE_SCHEMA)
+    loaded, _ = load_store(str(tmp_path))
+    assert len(loaded) == 0 and loaded.codes == ['200']
+
+
+def test_absent_store(tmp_path):
+    assert load_store(str(tmp_path / 'absent')) == (None, None)
+
+
+def test_other_format_version(tmp_path):
+    save_store(small_store(), str(tmp_path))
+    edit_metadata(tmp_path, version=STORE_FORMAT_VERSION + 1)
+    assert load_store(str(tmp_path)) == (None, None)
+
+
+def test_other_schema(tmp_path):
+    save_store(small_store(), str(tmp_path))
+    edit_metadata(tmp_path, schema={**STORE_SCHEMA, 'counts': 'int64'})
+    assert load_store(str(tmp_path)) == (None, None)
+
+
+def test_column_of_other_dtype(tmp_path):
+    calls = small_store()
+    save_store(calls, str(tmp_path))
+    description = json.loads((tmp_path / 'metadata.json').read_text())
+    np.save(tmp_path / description['files']['times'], calls.times.astype(np.int32))
+    assert load_store(str(tmp_path)) == (None, None)
+
+
+def test_truncated_column(tmp_path):
+    calls = small_store()
+    save_store(calls, str(tmp_path))
+    description = json.loads((tmp_path / 'metadata.json').read_text())
+
+    np.save(tmp_path / description['files']['counts'], calls.counts[:-1])  # fewer rows
+    assert load_store(str(tmp_path)) == (None, None)
+
+    path = tmp_path / description['files']['times']
+    path.write_bytes(path.read_bytes()[:-8])  # file is cut
+    assert load_store(str(tmp_path)) == (None, None)
+
+
+def test_server_ids_out_of_range(tmp_path):
+    save_store(small_store(), str(tmp_path))
+    edit_metadata(tmp_path, servers=['server-1'])
+    assert load_store(str(tmp_path)) == (None, None)
+
+
+def test_restore_window_checks_fingerprint(tmp_path, monkeypatch):
+    from dashboard import methods
+    monkeypatch.setattr(methods, 'window_directory', lambda bucket, source: str(tmp_path / f'{source}-{bucket}m'))
+    calls = small_store()
+    fingerprint = ('http://clickhouse:8123', 'user', 'calls', 1, (('datetime_column', 'datetime'),))
+    save_store(calls, methods.window_directory(1, 'default'), metadata={'fingerprint': fingerprint})
+
+    window = RollingWindow(48)
+    methods.restore_window(window, bucket=1, fingerprint=fingerprint[:-1] + ((('datetime_column', 'dt'),),))
+    assert window.calls is None
+
+    methods.restore_window(window, bucket=1, fingerprint=fingerprint)
+    assert window.calls.times.tolist() == calls.times.tolist()
+    assert window.fingerprint == fingerprint
+    assert not window.needs_resync(fingerprint)
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from library import window as window_module
+from library.statistics import calls_statistics_table, servers_hours
+from library.window import RollingWindow
+
+HOURS = 2
+
+
+def window_data(calls_database, window, now):
+    """
+    Data which window should keep: all data of the last hours before the newest data
+    """
+    calls = calls_database.calls(now, hours=100, bucket=window.bucket)
+    return calls.select(calls.times > int((calls.last_time - pd.Timedelta(hours=window.hours)).timestamp()))
+
+
+def assert_statistics(window):
+    assert_frame_equal(window.statistics.table(hours=servers_hours(window.calls)),
+                       calls_statistics_table(window.calls))
+
+
+def test_tail_updates(calls_database):
+    window = RollingWindow(HOURS, bucket=1, overlap_minutes=3)
+    now = 150
+    window.update(calls_database.calls(now, HOURS), fingerprint='query')
+    assert calls_database.rows(window.calls) == calls_database.rows(calls_database.calls(now, HOURS))
+
+    for _ in range(10):
+        now += 7
+        since = window.tail_start()
+        assert not window.needs_resync('query')
+        window.update(calls_database.calls(now, HOURS, since=since), since=since, fingerprint='query')
+
+        assert calls_database.rows(window.calls) == calls_database.rows(window_data(calls_database, window, now))
+        # statistics maintained incrementally are the same as calculated from window data
+        assert_statistics(window)
+
+
+@pytest.mark.parametrize('bucket, overlap_minutes, tail_minutes', [(1, 5, 4), (2, 5, 4), (10, 3, 10), (10, 1, 0),
+                                                                   (60, 5, 60)])
+def test_tail_start_covers_incomplete_buckets(calls_database, bucket, overlap_minutes, tail_minutes):
+    window = RollingWindow(HOURS, bucket=bucket, overlap_minutes=overlap_minutes)
+    window.update(calls_database.calls(150, HOURS, bucket=bucket))
+
+    assert window.last_seen - window.tail_start() == pd.Timedelta(minutes=tail_minutes)
+
+
+def test_tail_updates_of_coarse_window(calls_database):
+    # late data of the first minutes of the last bucket changes the previous bucket
+    window = RollingWindow(HOURS, bucket=10, overlap_minutes=3)
+    now = 400
+    window.update(calls_database.calls(now, HOURS, bucket=10), fingerprint='query')
+
+    for _ in range(10):
+        now += 7
+        since = window.tail_start()
+        window.update(calls_database.calls(now, HOURS, bucket=10, since=since), since=since, fingerprint='query')
+        assert calls_database.rows(window.calls) == calls_database.rows(window_data(calls_database, window, now))
+        assert_statistics(window)
+
+
+def test_gap_forces_resync(calls_database, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(window_module.time, 'monotonic', lambda: now[0])
+    window = RollingWindow(HOURS, bucket=1)
+    assert window.needs_resync('query')
+
+    window.update(calls_database.calls(150, HOURS), fingerprint='query')
+    now[0] += HOURS * 3600
+    assert not window.needs_resync('query')
+    now[0] += 1  # all data of window is expired
+    assert window.needs_resync('query')
+
+    window.update(calls_database.calls(400, HOURS), since=None, fingerprint='query')
+    assert calls_database.rows(window.calls) == calls_database.rows(calls_database.calls(400, HOURS))
+    assert_statistics(window)
+    assert not window.needs_resync('query')
+
+
+def test_fingerprint_change_forces_full_reload(calls_database):
+    window = RollingWindow(HOURS, bucket=1)
+    window.update(calls_database.calls(150, HOURS), fingerprint='query')
+    assert window.needs_resync('other query')
+
+    other_database = type(calls_database)(seed=1)
+    window.update(other_database.calls(160, HOURS), since=None, fingerprint='other query')
+    assert calls_database.rows(window.calls) == calls_database.rows(other_database.calls(160, HOURS))
+    assert_statistics(window)
+    assert window.fingerprint == 'other query'
+
+
+def test_restore(calls_database, monkeypatch):
+    monkeypatch.setattr(window_module.time, 'monotonic', lambda: 100000.0)
+    window = RollingWindow(HOURS, bucket=1)
+    window.restore(calls_database.calls(150, HOURS), fingerprint='query', age=600)
+
+    assert window.updated_at == 100000.0 - 600
+    assert not window.needs_resync('query')
+    assert_statistics(window)
@@ -1,11 +1,17 @@
 import dash
-from dash import html, callback, Output, Input, State
+from dash import html, callback, clientside_callback, ctx, no_update, Output, Input, State, ALL, ClientsideFunction
 import dash_bootstrap_components as dbc
+from flask import Response, request
 
-from dashboard.methods import user_interface, plots_initialization, page_auto_refresh, get_data, \
-    figure_constructor, get_webapp_connection_parameters
+from dashboard.methods import user_interface, plots_initialization, page_auto_refresh, get_snapshot, \
+    figures_update, get_webapp_connection_parameters, data_status, data_refresher, get_servers, server_plot, \
+    alerts_panel_content, statistics_panel_content, get_section_parameters, health_monitors, database_health_content, \
+    broadcaster, snapshot_id
 from library.methods import system_is_linux
+from library.metrics import instrument_server, DEFAULT_METRICS_PARAMETERS
+from parameters.dashboard_parameters import refresh_period, time_intervals, default_time_interval
 
+import json
 import logging
 
 logging.basicConfig(level=logging.INFO,
@@ -21,7 +27,7 @@ free_space = [
     dbc.Row([html.Br()], style={'backgroundColor': '#303030'})
 ]
 plots = plots_initialization()
-page_refresh = page_auto_refresh(seconds=60)
+page_refresh = page_auto_refresh(seconds=refresh_period)
 dash_interface = interface + free_space + plots + page_refresh
 
 app = dash.Dash(__name__,
@@ -30,33 +36,152 @@ app = dash.Dash(__name__,
 app.layout = html.Div(dash_interface)
 app.title = 'Calls Monitoring'
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
-
-figures_output = [Output(component_id=f'plot_{n}', component_property='figure') for n in
-                  range(len(plots_initialization()))]
+metrics_parameters = get_section_parameters('metrics', DEFAULT_METRICS_PARAMETERS)
+if metrics_parameters['enabled']:
+    instrument_server(app.server, profiling=metrics_parameters['profiling'],
+                      profile_lines=metrics_parameters['profile_lines'])
+data_refresher.start()
+for health_monitor in health_monitors.values():
+    health_monitor.start()
+
+figures_output = [Output(component_id={'type': 'calls-plot', 'index': ALL}, component_property='figure')]
 response_button_output = [Output('response-code-button', 'outline'),
                           Output('response-code-button', 'children'),
                           Output('response-code-button', 'color')]
-all_output = figures_output + response_button_output
+data_status_output = [Output('data-status', 'children'),
+                      Output('data-status', 'color')]
+all_output = figures_output + response_button_output + data_status_output + [Output('plots-state', 'data'),
+                                                                              Output('stream-snapshot', 'children')]
+# figures are resynced by browser when it missed pushed points (see assets/stream.js), polled without stream
+refresh_input = Input(component_id='stream-resync', component_property='n_clicks') if broadcaster is not None \
+    else Input(component_id='interval-component', component_property='n_intervals')
+
+
+@app.server.route('/stream')
+def stream():
+    """
+    New data points of time interval as server-sent events
+    """
+    hours = request.args.get('hours', type=int)
+    # only intervals of dropdown menu are refreshed for browsers
+    if broadcaster is None or hours not in time_intervals.values():
+        return Response('stream is not available', status=404)
+    subscriber = broadcaster.subscribe(str(hours))
+    if subscriber is None:
+        return Response('too many subscribers', status=503)
+
+    def events():
+        for message in broadcaster.stream(str(hours), subscriber):
+            # interval is refreshed while dashboard is opened (callbacks are not requested by it)
+            data_refresher.watch(hours)
+            yield message
+
+    data_refresher.watch(hours)
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def chosen_time_interval(chosen_interval_value) -> int:
+    # values which are absent in dropdown menu are not accepted (interval is refreshed while it is requested)
+    return time_intervals.get(chosen_interval_value, time_intervals[default_time_interval])
+
+
+@callback(
+    Output('plots-container', 'children'),
+    Output('servers-list', 'data'),
+    Input(component_id='time-interval-dropdown-menu', component_property='value'),
+    Input(component_id='interval-component', component_property='n_intervals'),
+    State(component_id='servers-list', component_property='data'),
+)
+def plots_layout(chosen_interval_value, n_intervals, shown_servers):
+    # plots are created for servers from the cheap servers list query, new servers appear without restart
+    servers = get_servers(hours_of_calls_data=chosen_time_interval(chosen_interval_value))
+    if servers is None or servers == shown_servers:
+        return no_update, no_update
+    if not servers:
+        logging.warning("Dashboard plots were not created")
+    return [server_plot(server) for server in servers], servers
 
 
 @callback(
     all_output,
     Input(component_id='response-code-button', component_property='n_clicks'),
     Input(component_id='time-interval-dropdown-menu', component_property='value'),
-    Input(component_id='interval-component', component_property='n_intervals'),
+    refresh_input,
+    Input(component_id='servers-list', component_property='data'),
+    State(component_id={'type': 'calls-plot', 'index': ALL}, component_property='id'),
+    State(component_id='plots-state', component_property='data'),
 )
-def plots_and_response_code_button(n_clicks, chosen_interval_value, n_intervals):
-    time_interval = 24 * int(chosen_interval_value[:-1]) if chosen_interval_value is not None else 48
-    servers_data = get_data(hours_of_calls_data=time_interval)
+def plots_and_response_code_button(n_clicks, chosen_interval_value, n_refresh, servers, plots_ids, plots_state):
+    time_interval = chosen_time_interval(chosen_interval_value)
+    # callback only reads the latest snapshot, data is refreshed by data_refresher in background
+    snapshot = get_snapshot(hours_of_calls_data=time_interval)
+    servers_data = list(snapshot.servers_data) if snapshot else None
     if n_clicks % 2 == 0:
         button_params = [False, '200 <OK> Enabled', 'success']
     else:
-        servers_data = [df.drop(['200'], axis=1) for df in servers_data]
+        servers_data = [data.without(['200']) for data in servers_data or []]
         button_params = [True, '200 <OK> Disabled', 'secondary']
 
-    figures = [figure_constructor(df) for df in servers_data] if servers_data else []
+    # figures follow order of plots in layout, plots without data are left empty
+    plots_servers = [plot_id['index'] for plot_id in plots_ids]
+    figures = [{} for _ in plots_servers]
+    if servers_data:
+        servers_views = {data.server: data for data in servers_data}
+        shown = [server for server in plots_servers if server in servers_views]
+        # on auto-refresh only new points are sent to figures which are already shown
+        view = {'hours': time_interval, 'ok_hidden': bool(n_clicks % 2), 'refreshed_at': str(snapshot.refreshed_at)}
+        previous_state = (plots_state or {}) if ctx.triggered_id in ('interval-component', 'stream-resync') else {}
+        shown_figures, shown_states = figures_update([servers_views[server] for server in shown], view=view,
+                                                     plots_state=[previous_state.get(server) for server in shown])
+        plots_state = dict(zip(shown, shown_states))
+        for server, figure in zip(shown, shown_figures):
+            figures[plots_servers.index(server)] = figure
+
+    shown_snapshot = json.dumps({'id': snapshot_id(snapshot), 'ok_hidden': bool(n_clicks % 2)}) if snapshot else ''
+    return [figures] + button_params + list(data_status(snapshot)) + [plots_state, shown_snapshot]
+
+
+if broadcaster is not None:
+    clientside_callback(
+        ClientsideFunction(namespace='stream', function_name='connect'),
+        Output('stream-connection', 'data'),
+        Input(component_id='time-interval-dropdown-menu', component_property='value'),
+        Input(component_id='interval-component', component_property='disabled'),
+        State(component_id='interval-component', component_property='interval'),
+    )
+
+
+@callback(
+    Output('alerts-panel', 'children'),
+    Input(component_id='interval-component', component_property='n_intervals'),
+)
+def alerts_panel_update(n_intervals):
+    return alerts_panel_content()
+
+
+@callback(
+    Output('statistics-panel', 'is_open'),
+    Output('statistics-panel', 'children'),
+    Output('statistics-button', 'outline'),
+    Input(component_id='statistics-button', component_property='n_clicks'),
+    Input(component_id='time-interval-dropdown-menu', component_property='value'),
+    Input(component_id='interval-component', component_property='n_intervals'),
+)
+def statistics_panel_update(n_clicks, chosen_interval_value, n_intervals):
+    # statistics are calculated only while panel is shown
+    if n_clicks % 2 == 0:
+        return False, no_update, True
+    return True, statistics_panel_content(hours_of_calls_data=chosen_time_interval(chosen_interval_value)), False
+
 
-    return figures + button_params
+@callback(
+    Output('database-health', 'children'),
+    Output('database-health', 'color'),
+    Input(component_id='interval-component', component_property='n_intervals'),
+)
+def database_health_update(n_intervals):
+    return database_health_content()
 
 
 @app.callback(
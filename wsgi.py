@@ -0,0 +1,6 @@
+"""
+Entry point of production WSGI server: gunicorn -c gunicorn.conf.py wsgi:server
+"""
+from webapp import app
+
+server = app.server